@@ -1,5 +1,5 @@
 import os
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
 from supabase import create_client, Client
 from backend.config import Config
@@ -8,6 +8,18 @@ from backend.config import Config
 # Global Supabase client
 supabase: Client = None
 
+
+def create_supabase_client():
+    """The Supabase client, or its local stand-in when FAKE_BACKENDS includes "supabase"."""
+    from .fakes import fake_backend_enabled
+    if fake_backend_enabled("supabase"):
+        from .fakes.supabase import FakeSupabaseClient
+        print("Using the local fake Supabase backend")
+        return FakeSupabaseClient()
+    if Config.SUPABASE_URL and Config.SUPABASE_KEY:
+        return create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+    return None
+
 #creating Flask app instance
 def create_app():
     global supabase
@@ -21,25 +33,24 @@ def create_app():
     app.config.from_object(Config)
     
     # Production-aware CORS configuration
+    # (X-Audio-Url from /api/audio/stream must be readable by the frontend)
+    expose_headers = ["X-Audio-Url"]
     is_production = os.environ.get('FLASK_ENV', 'development') == 'production'
     if is_production:
         # In production, specify allowed origins
         allowed_origins = os.environ.get('CORS_ORIGINS', '').split(',')
         if allowed_origins and allowed_origins[0]:
-            CORS(app, origins=allowed_origins, supports_credentials=True)
+            CORS(app, origins=allowed_origins, supports_credentials=True, expose_headers=expose_headers)
         else:
-            CORS(app)  # Fallback to allow all (configure CORS_ORIGINS in production!)
+            CORS(app, expose_headers=expose_headers)  # Fallback to allow all (configure CORS_ORIGINS in production!)
     else:
-        CORS(app)  # Allow all origins in development
+        CORS(app, expose_headers=expose_headers)  # Allow all origins in development
     
     
     # Initialize Supabase
     try:
-        if app.config['SUPABASE_URL'] and app.config['SUPABASE_KEY']:
-            supabase = create_client(
-                app.config['SUPABASE_URL'],
-                app.config['SUPABASE_KEY']
-            )
+        supabase = create_supabase_client()
+        if supabase is not None:
             print("Supabase client initialized")
         else:
             print("Warning: Supabase credentials not found in environment variables")
@@ -61,6 +72,32 @@ def create_app():
 
     from .api.folders import folders_bp
     app.register_blueprint(folders_bp, url_prefix='/api')
+
+    from .api.jobs import jobs_bp
+    app.register_blueprint(jobs_bp, url_prefix='/api')
+
+    from .api.cache import cache_bp
+    app.register_blueprint(cache_bp, url_prefix='/api')
+
+    from .api.audio import audio_bp
+    app.register_blueprint(audio_bp, url_prefix='/api')
+
+    from .fakes import fake_backend_enabled
+    if fake_backend_enabled("supabase"):
+        from .api.fake_storage import fake_storage_bp
+        app.register_blueprint(fake_storage_bp, url_prefix='/api')
+
+    # X-LLM-Cache: bypass skips cached Gemini responses for this request
+    from .services.llm_cache import bypass_requested, set_bypass
+
+    @app.before_request
+    def apply_llm_cache_bypass():
+        set_bypass(bypass_requested(request.headers))
+
+    # Background workers for asynchronous uploads (POST /api/upload?async=true)
+    from .services.job_queue import start_job_workers
+    from .services.upload_service import process_upload_job
+    start_job_workers(process_upload_job)
     
     @app.route('/health')
     def health_check():
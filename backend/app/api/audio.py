@@ -0,0 +1,65 @@
+from itertools import chain
+from flask import Blueprint, Response, request, jsonify
+from ..utils.text_extractor import extract_text_from_file
+from ..utils.text_normalizer import normalize_text
+from ..utils.uploads import spool_upload, remove_spooled
+from ..services.content_store import get_or_extract_text
+from ..services.audio_stream import start_podcast_stream, PodcastStreamError
+from backend.config import Config
+
+audio_bp = Blueprint('audio', __name__)
+
+@audio_bp.route('/audio/stream', methods=['POST'])
+def stream_podcast_audio():
+    """
+    Generate a podcast and stream it as audio/mpeg while it is still being synthesized.
+
+    Takes a PDF/DOCX "file" or a "text" field (form data or JSON), plus optional
+    host_voice_id / guest_voice_id. A JSON "dialogue" list of {"text", "voice_id"}
+    skips script generation. Playback can start after the first line; the complete
+    MP3 is stored in the background at the URL given in the X-Audio-Url header.
+    """
+    body = request.get_json(silent=True) or {}
+    fields = {**body, **request.form.to_dict()}
+
+    if 'file' in request.files:
+        file = request.files['file']
+        if not file.filename.lower().endswith(('.pdf', '.docx')):
+            return jsonify({"error": "Unsupported file type. Use PDF or DOCX."}), 415
+        file_path, file_hash = spool_upload(file)
+        try:
+            text_content = get_or_extract_text(file_hash, lambda: extract_text_from_file(file_path, file.filename))
+        finally:
+            remove_spooled(file_path)
+    else:
+        text_content = fields.get('text', '')
+
+    dialogue = body.get('dialogue')
+    if dialogue is not None and not (
+        isinstance(dialogue, list) and all(isinstance(line, dict) and line.get('text') and line.get('voice_id')
+                                           for line in dialogue)
+    ):
+        return jsonify({"error": "dialogue must be a list of {\"text\", \"voice_id\"} objects"}), 400
+    if not dialogue:
+        if not text_content or not text_content.strip():
+            return jsonify({"error": "Provide a file, text or dialogue to narrate."}), 400
+        text_content, _ = normalize_text(text_content)
+
+    host_voice_id = fields.get('host_voice_id') or Config.ELEVENLABS_HOST_VOICE
+    guest_voice_id = fields.get('guest_voice_id') or Config.ELEVENLABS_GUEST_VOICE
+
+    public_url, chunks = start_podcast_stream(text_content, host_voice_id, guest_voice_id, dialogue=dialogue)
+
+    # Wait for the first line so failures before any audio still get a proper error response
+    try:
+        first = next(chunks)
+    except StopIteration:
+        return jsonify({"error": "The podcast script had no lines to narrate."}), 500
+    except PodcastStreamError as e:
+        return jsonify({"error": f"Failed to generate podcast audio: {e}"}), 500
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if public_url:
+        headers["X-Audio-Url"] = public_url
+    # A failure after this point aborts the response, so the client sees an incomplete transfer
+    return Response(chain([first], chunks), mimetype='audio/mpeg', headers=headers)
@@ -0,0 +1,23 @@
+from flask import Blueprint, jsonify
+from ..services.llm_cache import cache_stats
+from ..services.tts_cache import cache_stats as tts_cache_stats
+from ..services.llm_schemas import structured_output_stats
+
+cache_bp = Blueprint('cache', __name__)
+
+@cache_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """
+    Hit/miss counters and size of the persistent LLM response and TTS line caches, plus
+    how often structured responses needed local repair or a full retry.
+    """
+    try:
+        return jsonify({
+            "llm": cache_stats(),
+            "tts": tts_cache_stats(),
+            "structured_output": structured_output_stats()
+        }), 200
+
+    except Exception as e:
+        print(f"Error fetching cache stats: {e}")
+        return jsonify({"error": f"Failed to fetch cache stats: {str(e)}"}), 500
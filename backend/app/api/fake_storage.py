@@ -0,0 +1,13 @@
+from flask import Blueprint, Response, jsonify
+from ..fakes.supabase import get_object
+
+# Serves files stored through the fake Supabase client (FAKE_BACKENDS=supabase)
+fake_storage_bp = Blueprint('fake_storage', __name__)
+
+
+@fake_storage_bp.route('/fake-storage/<bucket>/<path:path>', methods=['GET'])
+def get_fake_object(bucket, path):
+    row = get_object(bucket, path)
+    if row is None:
+        return jsonify({"error": "Object not found"}), 404
+    return Response(bytes(row["data"]), mimetype=row["content_type"])
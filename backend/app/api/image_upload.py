@@ -1,18 +1,13 @@
-from flask import Blueprint, request, jsonify, current_app
-from supabase import create_client
+from flask import Blueprint, request, jsonify
 import uuid
 import os
 
 image_upload_bp = Blueprint('image_upload', __name__)
 
 def get_supabase_client():
-    # Use the global client if available, or create a new one
-    # In this app structure, we might need to access it from app config or create a new one
-    url = current_app.config.get('SUPABASE_URL')
-    key = current_app.config.get('SUPABASE_KEY')
-    if not url or not key:
-        return None
-    return create_client(url, key)
+    # The app-wide client created in create_app (the local stand-in when FAKE_BACKENDS is set)
+    from .. import supabase
+    return supabase
 
 @image_upload_bp.route('/upload-image', methods=['POST'])
 def upload_image():
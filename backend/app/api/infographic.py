@@ -8,8 +8,11 @@ import random
 import re
 
 import matplotlib.pyplot as plt
-from ..utils.text_extractor import extract_text_from_pdf, extract_text_from_docx
+from ..utils.text_extractor import extract_text_from_file
+from ..utils.text_normalizer import normalize_text
+from ..utils.uploads import spool_upload, remove_spooled
 from ..services.ai_service import generate_infographic_data_from_text
+from ..services.content_store import hash_bytes, get_or_extract_text, get_artifact, put_artifact
 matplotlib.use('Agg')
 infographic_bp = Blueprint('infographic', __name__)
 
@@ -658,23 +661,41 @@ def create_infographic_image(data, theme):
     # Final Crop
     return img.crop((0, 0, width, int(y_pos)))
 
+def _extract_uploaded_text(file):
+    """Extract text from an uploaded PDF/DOCX, reusing the stored text for identical bytes."""
+    file_path, file_hash = spool_upload(file)
+    try:
+        text_content = get_or_extract_text(file_hash, lambda: extract_text_from_file(file_path, file.filename))
+        return text_content, file_hash
+    finally:
+        remove_spooled(file_path)
+
+def _get_infographic_data(text_content, source_hash):
+    """Infographic data for a document, shared by /generate and /generate-data via the content store."""
+    cached = get_artifact(source_hash, "infographic")
+    if cached is not None:
+        print("Reusing cached infographic data")
+        return cached
+    text_content, _ = normalize_text(text_content)
+    infographic_data = generate_infographic_data_from_text(text_content)
+    put_artifact(source_hash, "infographic", infographic_data)
+    return infographic_data
+
 @infographic_bp.route('/generate', methods=['POST'])
 def generate_infographic():
     try:
         text_content = ""
         if 'file' in request.files:
             file = request.files['file']
-            filename = file.filename.lower()
-            if filename.endswith('.pdf'):
-                text_content = extract_text_from_pdf(file.stream.read())
-            elif filename.endswith('.docx'):
-                text_content = extract_text_from_docx(file)
-            else:
+            if not file.filename.lower().endswith(('.pdf', '.docx')):
                 return jsonify({"error": "Unsupported file type"}), 400
+            text_content, source_hash = _extract_uploaded_text(file)
         elif 'text' in request.form:
             text_content = request.form['text']
+            source_hash = hash_bytes(text_content)
         else:
             text_content = "Placeholder text."
+            source_hash = None
 
         # Get optional theme parameter from request
         requested_theme = request.form.get('theme', None)
@@ -683,7 +704,7 @@ def generate_infographic():
         theme = select_theme(text_content=text_content, theme_name=requested_theme)
         print(f"Selected theme: {theme['name']}")
 
-        infographic_data = generate_infographic_data_from_text(text_content)
+        infographic_data = _get_infographic_data(text_content, source_hash)
         img = create_infographic_image(infographic_data, theme)
         
         buf = io.BytesIO()
@@ -691,17 +712,13 @@ def generate_infographic():
         buf.seek(0)
         
         # Upload logic (Supabase)
-        from flask import current_app
-        from supabase import create_client
+        from .. import supabase
         import uuid
 
-        url = current_app.config.get('SUPABASE_URL')
-        key = current_app.config.get('SUPABASE_KEY')
         public_url = ""
         
-        if url and key:
+        if supabase is not None:
             try:
-                supabase = create_client(url, key)
                 filename = f"infographic-{uuid.uuid4()}.jpg"
                 bucket_name = "generated-content"
                 
@@ -758,20 +775,17 @@ def generate_infographic_data():
         text_content = ""
         if 'file' in request.files:
             file = request.files['file']
-            filename = file.filename.lower()
-            if filename.endswith('.pdf'):
-                text_content = extract_text_from_pdf(file.stream.read())
-            elif filename.endswith('.docx'):
-                text_content = extract_text_from_docx(file)
-            else:
+            if not file.filename.lower().endswith(('.pdf', '.docx')):
                 return jsonify({"error": "Unsupported file type"}), 400
+            text_content, source_hash = _extract_uploaded_text(file)
         elif 'text' in request.form:
             text_content = request.form['text']
+            source_hash = hash_bytes(text_content)
         else:
             return jsonify({"error": "No text content provided"}), 400
 
         # Generate structured data for React component
-        infographic_data = generate_infographic_data_from_text(text_content)
+        infographic_data = _get_infographic_data(text_content, source_hash)
         
         return jsonify({
             "message": "Success",
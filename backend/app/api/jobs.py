@@ -0,0 +1,20 @@
+from flask import Blueprint, jsonify
+from ..services.job_queue import get_job
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """
+    Get the status of a background upload job, including per-format progress.
+    Once the job has completed, "result" holds the same object the synchronous upload returns.
+    """
+    try:
+        job = get_job(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job), 200
+
+    except Exception as e:
+        print(f"Error fetching job status: {e}")
+        return jsonify({"error": f"Failed to fetch job status: {str(e)}"}), 500
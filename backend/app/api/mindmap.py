@@ -1,7 +1,11 @@
 import json
 from flask import Blueprint, request, jsonify
-from ..utils.text_extractor import extract_text_from_pdf, extract_text_from_docx
+from ..utils.text_extractor import extract_text_from_file
+from ..utils.text_normalizer import normalize_text
 from ..services.ai_service import generate_mindmap_from_text
+from ..utils.uploads import spool_upload, remove_spooled
+from ..services.content_store import get_or_extract_text, get_artifact, put_artifact
+from ..services.format_service import mindmap_payload
 
 
 mindmap_bp = Blueprint('mindmap', __name__)
@@ -32,25 +36,32 @@ def generate_mindmap_only():
     if file.filename == '':
         return jsonify({"error": "No file selected"}), 400
 
-    text_content = ""
     filename = file.filename.lower()
-    
-    if filename.endswith('.pdf'):
-        text_content = extract_text_from_pdf(file.stream.read())
-    elif filename.endswith('.docx'):
-        text_content = extract_text_from_docx(file)
-    else:
+    if not filename.endswith(('.pdf', '.docx')):
         return jsonify({"error": "Unsupported file type. Use PDF or DOCX."}), 415
 
+    file_path, file_hash = spool_upload(file)
+    try:
+        # Same document already mapped (here or via /upload) - return the stored mind map
+        cached = get_artifact(file_hash, "mindmap")
+        if cached is not None:
+            return jsonify(cached["data"]), 200
+
+        text_content = get_or_extract_text(file_hash, lambda: extract_text_from_file(file_path, filename))
+    finally:
+        remove_spooled(file_path)
+
     if not text_content or not text_content.strip():
         return jsonify({"error": "Could not extract text from the document."}), 500
-        
+    text_content, _ = normalize_text(text_content)
+
     #calls ai service with the extracted text
     mindmap_json_string = generate_mindmap_from_text(text_content)
 
     #makes sure data returned is json for the frontend to render it
     try:
         mindmap_data = json.loads(mindmap_json_string)
+        put_artifact(file_hash, "mindmap", mindmap_payload(mindmap_data))
         return jsonify(mindmap_data), 200
     except json.JSONDecodeError:
         return jsonify({
@@ -1,10 +1,14 @@
 import json
 import uuid
 import traceback
-from flask import Blueprint, request, jsonify
-from ..utils.text_extractor import extract_text_from_pdf, extract_text_from_docx
-from ..services.ai_service import generate_mindmap_from_text, generate_summary_from_text, generate_quiz_from_text
-from ..services.audio_service import generate_podcast_audio
+from flask import Blueprint, Response, request, jsonify
+from ..utils.uploads import spool_upload, remove_spooled
+from ..services.job_queue import enqueue_job, upload_spool_dir
+from ..services.llm_cache import is_bypassed
+from ..services.upload_service import (
+    run_upload_pipeline, stream_upload_events, is_supported_upload, initial_job_progress,
+    NoTextExtractedError, UNSUPPORTED_FILE_MESSAGE, NO_TEXT_MESSAGE
+)
 from .. import supabase
 from backend.config import Config
 
@@ -13,7 +17,10 @@ upload_bp = Blueprint('upload', __name__)
 @upload_bp.route('/upload', methods=['POST'])
 def upload_and_process():
     """
-    Unified upload endpoint that processes files and generates requested formats
+    Unified upload endpoint that processes files and generates requested formats.
+
+    Pass async=true (query string or form field) to queue the work in the background;
+    the response is then a job id whose progress can be polled at /api/jobs/<job_id>.
     """
     print("=== UPLOAD ENDPOINT CALLED ===")
     
@@ -39,231 +46,164 @@ def upload_and_process():
         requested_formats = ["visual", "audio", "quiz"]
         print(f"JSON decode error, using defaults: {requested_formats}")
 
-    # Extract text from the uploaded file
-    text_content = ""
-    filename = file.filename.lower()
-    
-    if filename.endswith('.pdf'):
-        text_content = extract_text_from_pdf(file.stream.read())
-    elif filename.endswith('.docx'):
-        text_content = extract_text_from_docx(file)
-    else:
-        return jsonify({"error": "This file type isn't supported yet. For best results, please convert your file to a PDF or DOCX before uploading."}), 415
-
-    if not text_content or not text_content.strip():
-        return jsonify({"error": "Could not extract text from the document. Please ensure your file contains readable text."}), 500
-
-    # Generate the requested formats
-    results_content = {
-        "formats": {}
-    }
+    options = _parse_generation_options()
 
-    # Generate visual format (mind map) - only when 'mindmap' is explicitly requested
-    if "mindmap" in requested_formats:
-        print("=== Generating MINDMAP format ===")
-        try:
-            mindmap_json_string = generate_mindmap_from_text(text_content)
-            print(f"Mind map JSON string: {mindmap_json_string[:200]}...")
-            mindmap_data = json.loads(mindmap_json_string)
-            print(f"Mind map data parsed successfully")
-            results_content["formats"]["visual"] = {
-                "type": "Mind Map",
-                "description": "Interactive mind map showing key concepts and relationships",
-                "data": mindmap_data,
-                "icon": "🗺️"
-            }
-            print(f"Visual format added to results")
-        except Exception as e:
-            print(f"Error generating mind map: {e}")
-            traceback.print_exc()
-            results_content["formats"]["visual"] = {
-                "type": "Mind Map",
-                "description": "Error generating mind map",
-                "error": str(e),
-                "icon": "🗺️"
-            }
-    else:
-        print(f"Mindmap NOT in requested formats: {requested_formats}")
-
-    # Generate audio format (podcast)
-    if "audio" in requested_formats:
-        print("=== Generating AUDIO format ===")
-        try:
-            # Get voice IDs from request, fallback to config defaults if not provided or empty
-            host_voice_id = request.form.get('host_voice_id')
-            if not host_voice_id or host_voice_id.strip() == '':
-                host_voice_id = Config.ELEVENLABS_HOST_VOICE
-            
-            guest_voice_id = request.form.get('guest_voice_id')
-            if not guest_voice_id or guest_voice_id.strip() == '':
-                guest_voice_id = Config.ELEVENLABS_GUEST_VOICE
-            
-            print(f"Generating podcast audio with Host: {host_voice_id}, Guest: {guest_voice_id}")
-            
-            # Generate podcast audio
-            audio_bytes = generate_podcast_audio(text_content, host_voice_id, guest_voice_id)
-            
-            # Upload to Supabase Storage
-            filename = f"audio-{uuid.uuid4()}.mp3"
-            bucket_name = "generated-content"
-            
-            print(f"Uploading audio to Supabase Storage: {filename}")
-            supabase.storage.from_(bucket_name).upload(
-                path=filename,
-                file=audio_bytes,
-                file_options={"content-type": "audio/mpeg"}
-            )
-            
-            # Get public URL
-            public_url = supabase.storage.from_(bucket_name).get_public_url(filename)
-            print(f"Audio uploaded successfully: {public_url}")
-            
-            # Calculate actual duration from audio bytes using mutagen
-            duration_str = "Unknown"
-            try:
-                from mutagen.mp3 import MP3
-                from io import BytesIO
-                audio_file = BytesIO(audio_bytes)
-                audio_info = MP3(audio_file)
-                actual_duration = audio_info.info.length  # Duration in seconds
-                minutes = int(actual_duration // 60)
-                seconds = int(actual_duration % 60)
-                duration_str = f"{minutes}:{seconds:02d}"
-                print(f"Actual audio duration: {duration_str}")
-            except Exception as duration_error:
-                print(f"Could not determine audio duration: {duration_error}")
-                # Fallback to rough estimate
-                estimated_duration = len(text_content.split()) * 0.5
-                minutes = int(estimated_duration // 60)
-                seconds = int(estimated_duration % 60)
-                duration_str = f"{minutes}:{seconds:02d}" if minutes > 0 else f"0:{seconds:02d}"
-            
-            results_content["formats"]["audio"] = {
-                "type": "Podcast Audio",
-                "description": "Two-speaker podcast conversation",
-                "url": public_url,
-                "duration": duration_str,
-                "host_voice_id": host_voice_id,
-                "guest_voice_id": guest_voice_id,
-                "icon": "🎙️"
-            }
-            print(f"Audio format added to results")
-        except Exception as e:
-            print(f"Error generating audio content: {e}")
-            traceback.print_exc()
-            results_content["formats"]["audio"] = {
-                "type": "Podcast Audio",
-                "description": "Error generating audio content",
-                "error": str(e),
-                "icon": "🎙️"
-            }
-
-    # Generate quiz format
-    if "quiz" in requested_formats:
-        print("=== Generating QUIZ format ===")
-        try:
-            # Get number of questions from request, default to 5
-            num_questions = request.form.get('num_questions', 5)
-            try:
-                num_questions = int(num_questions)
-            except (ValueError, TypeError):
-                num_questions = 5
-            
-            quiz_data = generate_quiz_from_text(text_content, num_questions)
-            print(f"Quiz data generated: {json.dumps(quiz_data, indent=2)[:200]}...")
-            results_content["formats"]["quiz"] = {
-                "type": "Interactive Quiz",
-                "description": "Test your understanding with AI-generated questions",
-                "data": quiz_data,
-                "questionCount": len(quiz_data.get('questions', [])),
-                "icon": "❓"
-            }
-            print(f"Quiz format added to results")
-        except Exception as e:
-            print(f"Error generating quiz: {e}")
-            traceback.print_exc()
-            results_content["formats"]["quiz"] = {
-                "type": "Interactive Quiz",
-                "description": "Error generating quiz",
-                "error": str(e),
-                "icon": "❓"
-            }
-
-    # Generate reports/summary format
-    if "reports" in requested_formats:
-        print("=== Generating REPORTS/SUMMARY format ===")
-        try:
-            summary_data = generate_summary_from_text(text_content)
-            print(f"Summary data generated successfully")
-            results_content["formats"]["reports"] = {
-                "type": "Summary Report",
-                "description": "Comprehensive summary with key points and examples",
-                "data": summary_data,
-                "icon": "📄"
-            }
-            print(f"Reports format added to results")
-        except Exception as e:
-            print(f"Error generating summary: {e}")
-            traceback.print_exc()
-            results_content["formats"]["reports"] = {
-                "type": "Summary Report",
-                "description": "Error generating summary",
-                "error": str(e),
-                "icon": "📄"
-            }
+    if not is_supported_upload(file.filename):
+        return jsonify({"error": UNSUPPORTED_FILE_MESSAGE}), 415
 
-    # Get folder_id if present
-    folder_id = request.form.get('folder_id')
-    if folder_id == 'null' or folder_id == 'undefined':
-        folder_id = None
+    payload = {
+        "filename": file.filename,
+        "title": title,
+        "requested_formats": requested_formats,
+        **options
+    }
 
-    # Get user_id from request
-    user_id = request.form.get('user_id')
-    if user_id == 'null' or user_id == 'undefined':
-        user_id = None
+    # Asynchronous mode: hand the work to the background job queue and return immediately
+    if _is_async_request():
+        if Config.JOB_WORKERS <= 0:
+            return jsonify({"error": "Asynchronous uploads are disabled on this server"}), 503
+        return _enqueue_upload(file, payload)
 
-    # --- Store the results in Supabase ---
+    # Spool the upload to disk and extract from the file, so large uploads never sit in memory whole
+    file_path, payload["file_hash"] = spool_upload(file)
     try:
-        data_to_insert = {
-            "title": title,
-            "content": results_content,
-            "folder_id": folder_id,
-            "user_id": user_id
-        }
-        
-        print(f"Inserting into Supabase with folder_id: {folder_id}...")
-        response = supabase.table("results").insert(data_to_insert).execute()
-    
-        if not response.data:
-             raise Exception("No data returned from Supabase insert")
-             
-        inserted_record = response.data[0]
-        result_id = inserted_record['id']
-        
-        # Construct the response object expected by frontend
-        # The frontend expects the full object including 'id' and 'formats' at top level?
-        # Looking at previous code:
-        # results = { "id": ..., "title": ..., "formats": ... }
-        # So we should reconstruct that structure
-        
-        final_result = {
-            "id": result_id,
-            "title": inserted_record['title'],
-            "status": "completed",
-            "formats": inserted_record['content']['formats'],
-            "created_at": inserted_record['created_at']
-        }
+        final_result = run_upload_pipeline(file_path, payload)
 
         print(f"=== FINAL RESULTS ===")
         print(f"Results ID: {final_result['id']}")
         
         return jsonify(final_result), 200
 
+    except NoTextExtractedError:
+        return jsonify({"error": NO_TEXT_MESSAGE}), 500
+
     except Exception as e:
         print(f"Error saving to Supabase: {e}")
         traceback.print_exc()
         return jsonify({"error": f"Failed to save results: {str(e)}"}), 500
 
+    finally:
+        remove_spooled(file_path)
+
+
+@upload_bp.route('/upload/stream', methods=['POST'])
+def upload_and_stream():
+    """
+    Streaming variant of /upload. Accepts the same form fields and responds with
+    Server-Sent Events as each stage finishes, so the frontend can render a format as
+    soon as it is ready instead of waiting for the slowest one:
+
+    - stage: {"stage": "extracting" | "generating" | "storing"}
+    - extracted: {"characters": n}
+    - format: {"format", "key", "status", "data"} (data is present once the format is finished)
+    - audio_line: {"line": n, "total": m} (total is null while the podcast script is still
+      being written; the last audio_line event always carries the final count)
+    - stored: {"result": <same object /upload returns>}
+    - done / error
+    """
+    if 'file' not in request.files:
+        return jsonify({"error": "No file part in the request"}), 400
+
+    file = request.files['file']
+
+    if file.filename == '':
+        return jsonify({"error": "No file selected"}), 400
+
+    if not is_supported_upload(file.filename):
+        return jsonify({"error": UNSUPPORTED_FILE_MESSAGE}), 415
+
+    title = request.form.get('title', file.filename)
+    try:
+        requested_formats = json.loads(request.form.get('formats', '["visual", "audio", "quiz"]'))
+    except json.JSONDecodeError:
+        requested_formats = ["visual", "audio", "quiz"]
+
+    payload = {
+        "filename": file.filename,
+        "title": title,
+        "requested_formats": requested_formats,
+        **_parse_generation_options()
+    }
+
+    # Save the upload before the request ends; the pipeline runs after this view returns
+    file_path, payload["file_hash"] = spool_upload(file, upload_spool_dir(), prefix='stream-')
+
+    def event_stream():
+        for event, data in stream_upload_events(file_path, payload):
+            if event == "heartbeat":
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return Response(
+        event_stream(),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _parse_generation_options():
+    """Read the per-upload generation options from the form, applying defaults."""
+    # Get voice IDs from request, fallback to config defaults if not provided or empty
+    host_voice_id = request.form.get('host_voice_id')
+    if not host_voice_id or host_voice_id.strip() == '':
+        host_voice_id = Config.ELEVENLABS_HOST_VOICE
+
+    guest_voice_id = request.form.get('guest_voice_id')
+    if not guest_voice_id or guest_voice_id.strip() == '':
+        guest_voice_id = Config.ELEVENLABS_GUEST_VOICE
+
+    # Get number of questions from request, default to 5
+    num_questions = request.form.get('num_questions', 5)
+    try:
+        num_questions = int(num_questions)
+    except (ValueError, TypeError):
+        num_questions = 5
+
+    # Get folder_id if present
+    folder_id = request.form.get('folder_id')
+    if folder_id == 'null' or folder_id == 'undefined':
+        folder_id = None
+
+    # Get user_id from request
+    user_id = request.form.get('user_id')
+    if user_id == 'null' or user_id == 'undefined':
+        user_id = None
+
+    return {
+        "host_voice_id": host_voice_id,
+        "guest_voice_id": guest_voice_id,
+        "num_questions": num_questions,
+        "folder_id": folder_id,
+        "user_id": user_id
+    }
+
+
+def _is_async_request():
+    value = request.args.get('async') or request.form.get('async') or ''
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def _enqueue_upload(file, payload):
+    """Spool the upload to the job spool directory and queue a background job for it."""
+    job_id = str(uuid.uuid4())
+    file_path, file_hash = spool_upload(file, upload_spool_dir(), prefix=f"{job_id}-")
+    # Jobs run outside this request, so carry the LLM cache bypass header along
+    payload = {**payload, "file_path": file_path, "file_hash": file_hash, "cache_bypass": is_bypassed()}
+    try:
+        enqueue_job(payload, progress=initial_job_progress(payload["requested_formats"]), job_id=job_id)
+    except Exception:
+        # No job will ever pick the file up
+        remove_spooled(file_path)
+        raise
+    print(f"Queued upload job {job_id}")
+
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/jobs/{job_id}"
+    }), 202
+
 
 @upload_bp.route('/results/<result_id>')
 def get_results(result_id):
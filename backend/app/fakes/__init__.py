@@ -0,0 +1,33 @@
+"""
+Local stand-ins for the external services, for offline load and latency testing.
+
+Set FAKE_BACKENDS to a comma-separated list of "gemini", "elevenlabs" and "supabase" (or
+"all") and the app talks to these fakes instead of the real APIs:
+
+- gemini: canned JSON shaped by the requested response schema, after FAKE_GEMINI_LATENCY_MS
+- elevenlabs: silent MP3 frames, streamed after FAKE_ELEVENLABS_LATENCY_MS per line
+- supabase: tables and storage kept in a local SQLite file, shared by all workers
+
+Responses and latencies are derived from a hash of the input, so a benchmark run is
+repeatable.
+"""
+import hashlib
+from backend.config import Config
+
+BACKENDS = ("gemini", "elevenlabs", "supabase")
+
+
+def fake_backend_enabled(name):
+    return name in Config.FAKE_BACKENDS or "all" in Config.FAKE_BACKENDS
+
+
+def seed_for(*parts):
+    """Deterministic integer seed from the given strings."""
+    digest = hashlib.sha256("\0".join(str(part) for part in parts).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def latency_seconds(base_ms, seed):
+    """base_ms, varied by up to ±FAKE_LATENCY_JITTER depending on seed, in seconds."""
+    spread = (seed % 2001) / 1000.0 - 1.0  # -1 .. 1
+    return max(0.0, base_ms * (1 + Config.FAKE_LATENCY_JITTER * spread) / 1000.0)
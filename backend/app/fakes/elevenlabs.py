@@ -0,0 +1,42 @@
+"""
+ElevenLabs stand-in: text_to_speech returns silent MP3 audio as a stream of chunks.
+
+The audio is made of valid MPEG-1 Layer III frames (128 kbps, 44.1 kHz, mono) whose
+length follows the text at a normal speaking rate, so merged podcasts have realistic
+sizes and mutagen reports a sensible duration.
+"""
+import math
+import time
+from . import seed_for, latency_seconds
+from backend.config import Config
+
+# Frame header: sync, MPEG-1 Layer III without CRC, 128 kbps, 44.1 kHz, mono. An all-zero
+# side info and main data section decodes to silence.
+_FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0xC4])
+_FRAME_BYTES = 417  # 144 * 128000 / 44100, no padding
+SILENT_FRAME = _FRAME_HEADER + bytes(_FRAME_BYTES - len(_FRAME_HEADER))
+FRAME_SECONDS = 1152 / 44100
+
+_CHARACTERS_PER_SECOND = 15
+_FRAMES_PER_CHUNK = 16
+
+
+def silent_mp3(seconds):
+    return SILENT_FRAME * max(1, math.ceil(seconds / FRAME_SECONDS))
+
+
+class _TextToSpeech:
+    def convert(self, voice_id, text, model_id=None, output_format=None, **_):
+        """Yield silent MP3 chunks for text, the first one after the configured latency."""
+        time.sleep(latency_seconds(Config.FAKE_ELEVENLABS_LATENCY_MS, seed_for(voice_id, text)))
+        audio = silent_mp3(len(text) / _CHARACTERS_PER_SECOND)
+        chunk_bytes = _FRAME_BYTES * _FRAMES_PER_CHUNK
+        for start in range(0, len(audio), chunk_bytes):
+            yield audio[start:start + chunk_bytes]
+
+    stream = convert
+
+
+class FakeElevenLabs:
+    def __init__(self, **_):
+        self.text_to_speech = _TextToSpeech()
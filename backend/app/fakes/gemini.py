@@ -0,0 +1,124 @@
+"""
+Gemini stand-in with the subset of the google.genai Client API that llm_gateway uses.
+
+JSON-mode requests get an instance of their response_schema built from it, so every
+format (including the combined call and the podcast script) parses and validates like a
+real response. Plain-text requests (chunk condensing) get short notes.
+"""
+import re
+import json
+import time
+import random
+import asyncio
+from types import SimpleNamespace
+from . import seed_for, latency_seconds
+from backend.config import Config
+
+# Items generated for each array; top-level arrays (the podcast script) get more
+_ARRAY_ITEMS = 4
+_TOP_LEVEL_ITEMS = 12
+_WORDS = (
+    "energy light plants cells water carbon oxygen process system model theory example cause effect "
+    "structure function growth change balance pattern evidence result method concept student learn"
+).split()
+# Streamed responses: characters per piece, and the share of the latency before the first
+_STREAM_PIECE = 64
+_STREAM_FIRST_PIECE = 0.2
+_VOICE = re.compile(r'(?:HOST|GUEST) voice_id: "([^"]+)"')
+_QUESTION_COUNT = re.compile(r"exactly (\d+) (?:multiple-choice )?questions")
+
+
+def _sentence(seed, words):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def sample(schema, name="value", index=0, seed=0, voices=(), questions=None):
+    """
+    Build a value matching a Gemini response schema (uppercase types, as in llm_schemas).
+    A "questions" array gets the number of questions the prompt asked for, when given.
+    """
+    kind = schema["type"]
+    if "enum" in schema:
+        return schema["enum"][index % len(schema["enum"])]
+    if kind == "OBJECT":
+        value = {
+            key: sample(field, key, index, seed + position, voices, questions)
+            for position, (key, field) in enumerate(schema.get("properties", {}).items())
+        }
+        # Keep cross-field rules the real model follows, so responses survive validation
+        if "answer" in value and value.get("options"):
+            value["answer"] = value["options"][index % len(value["options"])]
+        if "voice_id" in value and voices:
+            value["voice_id"] = voices[index % len(voices)]
+        return value
+    if kind == "ARRAY":
+        count = _TOP_LEVEL_ITEMS if name == "value" else _ARRAY_ITEMS
+        if name == "questions" and questions:
+            count = questions
+        return [sample(schema["items"], name, i, seed + i * 7919, voices, questions) for i in range(count)]
+    if kind in ("INTEGER", "NUMBER"):
+        return index + 1
+    if kind == "BOOLEAN":
+        return index % 2 == 0
+    if name in ("text", "summary", "description", "detailed_explanation", "definition", "content"):
+        return _sentence(seed, 18)
+    return f"{name.replace('_', ' ').capitalize()} {index + 1}"
+
+
+def _response_text(contents, config):
+    config = config or {}
+    seed = seed_for(contents)
+    schema = config.get("response_schema")
+    if schema is not None:
+        questions = _QUESTION_COUNT.search(contents)
+        return json.dumps(sample(
+            schema, seed=seed, voices=tuple(_VOICE.findall(contents)),
+            questions=int(questions.group(1)) if questions else None
+        ))
+    return "\n".join(f"- {_sentence(seed + i, 12)}" for i in range(8))
+
+
+def _latency(contents):
+    return latency_seconds(Config.FAKE_GEMINI_LATENCY_MS, seed_for("latency", contents))
+
+
+class _Models:
+    def generate_content(self, model, contents, config=None):
+        time.sleep(_latency(contents))
+        return SimpleNamespace(text=_response_text(contents, config))
+
+    def generate_content_stream(self, model, contents, config=None):
+        """
+        Yield the response in pieces spread over the configured latency, the first after
+        a fifth of it, like a model writing its answer - the whole response takes as long
+        as generate_content.
+        """
+        text = _response_text(contents, config)
+        latency = _latency(contents)
+        pieces = [text[start:start + _STREAM_PIECE] for start in range(0, len(text), _STREAM_PIECE)]
+        time.sleep(latency * _STREAM_FIRST_PIECE)
+        interval = latency * (1 - _STREAM_FIRST_PIECE) / max(1, len(pieces) - 1)
+        for index, piece in enumerate(pieces):
+            if index:
+                time.sleep(interval)
+            yield SimpleNamespace(text=piece)
+
+
+class _AsyncModels:
+    async def generate_content(self, model, contents, config=None):
+        await asyncio.sleep(_latency(contents))
+        return SimpleNamespace(text=_response_text(contents, config))
+
+
+class _Caches:
+    def create(self, model, config=None):
+        contents = (config or {}).get("contents", "")
+        return SimpleNamespace(name=f"cachedContents/fake-{seed_for(contents):x}", model=model)
+
+
+class FakeGeminiClient:
+    def __init__(self):
+        self.models = _Models()
+        self.aio = SimpleNamespace(models=_AsyncModels())
+        self.caches = _Caches()
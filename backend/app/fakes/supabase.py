@@ -0,0 +1,177 @@
+"""
+Supabase stand-in covering the table and storage calls the app makes.
+
+Rows and stored files are kept in a SQLite file under DATA_DIR rather than in process
+memory, so every gunicorn worker sees the same results - a result stored by one worker
+can be fetched through another, as with the real database. Stored files are served at
+/api/fake-storage/<bucket>/<path>.
+"""
+import os
+import json
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from ..utils.sqlite_store import get_connection
+from backend.config import Config
+
+_schema_ready = set()
+
+
+def _conn():
+    path = os.path.join(Config.DATA_DIR, 'fake_supabase.sqlite3')
+    conn = get_connection(path)
+    if path not in _schema_ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS fake_rows (
+                table_name TEXT NOT NULL,
+                id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (table_name, id)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS fake_objects (
+                bucket TEXT NOT NULL,
+                path TEXT NOT NULL,
+                content_type TEXT,
+                data BLOB NOT NULL,
+                PRIMARY KEY (bucket, path)
+            )
+        """)
+        _schema_ready.add(path)
+    return conn
+
+
+class _Query:
+    """Chainable query builder in the style of supabase-py: table(...).select(...).eq(...).execute()."""
+
+    def __init__(self, table):
+        self._table = table
+        self._action = "select"
+        self._columns = None
+        self._payload = None
+        self._filters = []
+        self._order = None
+        self._limit = None
+
+    def select(self, columns="*"):
+        self._action = "select"
+        self._columns = None if columns.strip() == "*" else [column.strip() for column in columns.split(",")]
+        return self
+
+    def insert(self, data):
+        self._action = "insert"
+        self._payload = data if isinstance(data, list) else [data]
+        return self
+
+    def update(self, data):
+        self._action = "update"
+        self._payload = data
+        return self
+
+    def delete(self):
+        self._action = "delete"
+        return self
+
+    def eq(self, column, value):
+        self._filters.append((column, value))
+        return self
+
+    def order(self, column, desc=False):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def _matches(self, row):
+        return all(str(row.get(column)) == str(value) for column, value in self._filters)
+
+    def execute(self):
+        conn = _conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            data = self._run(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return SimpleNamespace(data=data, count=len(data))
+
+    def _run(self, conn):
+        if self._action == "insert":
+            rows = []
+            for item in self._payload:
+                row = {"id": str(uuid.uuid4()), "created_at": datetime.now(timezone.utc).isoformat(), **item}
+                conn.execute(
+                    "INSERT INTO fake_rows (table_name, id, data) VALUES (?, ?, ?)",
+                    (self._table, str(row["id"]), json.dumps(row))
+                )
+                rows.append(row)
+            return rows
+
+        stored = conn.execute("SELECT data FROM fake_rows WHERE table_name = ?", (self._table,)).fetchall()
+        rows = [row for row in (json.loads(item["data"]) for item in stored) if self._matches(row)]
+
+        if self._action == "update":
+            for row in rows:
+                row.update(self._payload)
+                conn.execute(
+                    "UPDATE fake_rows SET data = ? WHERE table_name = ? AND id = ?",
+                    (json.dumps(row), self._table, str(row["id"]))
+                )
+            return rows
+        if self._action == "delete":
+            conn.executemany(
+                "DELETE FROM fake_rows WHERE table_name = ? AND id = ?",
+                [(self._table, str(row["id"])) for row in rows]
+            )
+            return rows
+
+        if self._order is not None:
+            column, desc = self._order
+            rows.sort(key=lambda row: (row.get(column) is not None, row.get(column) or ""), reverse=desc)
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        if self._columns is not None:
+            rows = [{column: row.get(column) for column in self._columns} for row in rows]
+        return rows
+
+
+class _Bucket:
+    def __init__(self, name):
+        self._name = name
+
+    def upload(self, path, file, file_options=None):
+        content_type = (file_options or {}).get("content-type", "application/octet-stream")
+        data = file.read() if hasattr(file, "read") else file
+        _conn().execute(
+            "INSERT OR REPLACE INTO fake_objects (bucket, path, content_type, data) VALUES (?, ?, ?, ?)",
+            (self._name, path, content_type, data)
+        )
+        return SimpleNamespace(path=path, full_path=f"{self._name}/{path}")
+
+    def download(self, path):
+        row = get_object(self._name, path)
+        if row is None:
+            raise FileNotFoundError(f"{self._name}/{path}")
+        return row["data"]
+
+    def get_public_url(self, path):
+        return f"/api/fake-storage/{self._name}/{path}"
+
+
+def get_object(bucket, path):
+    """The stored row (content_type, data) for bucket/path, or None."""
+    return _conn().execute(
+        "SELECT content_type, data FROM fake_objects WHERE bucket = ? AND path = ?", (bucket, path)
+    ).fetchone()
+
+
+class FakeSupabaseClient:
+    def __init__(self):
+        self.storage = SimpleNamespace(from_=_Bucket)
+
+    def table(self, name):
+        return _Query(name)
@@ -1,119 +1,368 @@
-import os
-import re
 import json
-import google.generativeai as genai
+import hashlib
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
 from dotenv import load_dotenv
+from ..utils.text_chunker import split_into_chunks
+from ..utils.text_normalizer import estimate_tokens
+from ..utils.llm_json import extract_json
+from .llm_cache import cached_generate
+from .llm_gateway import DEFAULT_MODEL, generate
+from .document_context import get_document_context
+from .llm_schemas import (
+    STRUCTURED_OUTPUTS, combined_schema, json_generation_config, validate_output, is_usable, record_retry
+)
+from backend.config import Config
 
 load_dotenv()
 
-try:
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY environment variable is not set")
-    genai.configure(api_key=api_key)
-except Exception as e:
-    print(f"Failed to configure Gemini API: {e}")
-    raise
-
 
 def clean_json_response(response_text: str) -> str:
-    if not response_text:
-        return ''
+    """Extract the JSON object from a Gemini response, repairing fences, trailing commas and truncation."""
+    return extract_json(response_text, start_chars='{')
 
-    text = response_text.strip()
 
-    
-    text = re.sub(r'```\s*json', '```', text, flags=re.IGNORECASE)
-    text = text.replace('```', '').strip()
+def _is_json_response(text):
+    try:
+        json.loads(clean_json_response(text))
+        return True
+    except ValueError:
+        return False
 
-    
-    start = text.find('{')
-    if start == -1:
-        return text.strip()
 
-    
-    depth = 0
-    end = None
-    for i in range(start, len(text)):
-        ch = text[i]
-        if ch == '{':
-            depth += 1
-        elif ch == '}':
-            depth -= 1
-            if depth == 0:
-                end = i
-                break
-
-    if end is not None:
-        return text[start:end + 1].strip()
-    
-    return text[start:].strip()
+def _generate_text(prompt, json_response=True, generation_config=None, document=None, model=DEFAULT_MODEL,
+                   is_valid=None):
+    """
+    Call Gemini (through the shared llm_gateway client and the persistent response cache)
+    and return the response text.
 
+    With a document (a DocumentContext), prompt holds only the format's instructions: the
+    document is sent from Gemini's context cache when available, otherwise as the shared
+    prefix of the prompt. Responses expected to be JSON are only cached when they parse
+    (and pass is_valid, when given).
+    """
+    full_prompt = document.prompt(prompt) if document is not None else prompt
 
-def generate_mindmap_from_text(text_content):
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    def generate_uncached():
+        cached = document.cached_content() if document is not None else None
+        if cached is not None:
+            return generate(prompt, model=model, config=generation_config, cached_content=cached)
+        return generate(full_prompt, model=model, config=generation_config)
 
-    
-    prompt = f"""
-    Analyze the following text and generate a structured JSON object for a mind map visualization.
-    The structure should be lateral (horizontal flow), with the main root having 3-5 major branches (children).
-    
-    The JSON must follow this structure **exactly**:
-    - A single root object with a key named "root".
-    - Nodes can optionally have the "summary" and "definition" fields.
-    - IMPORTANT: For any node representing a core concept, include an optional property named "definition" which contains a short, single-sentence string explanation of that term. This definition will be visualized as a child node in the UI.
-    - Ensure the output is only the raw JSON, without any surrounding text, explanations, or markdown formatting like ```json.
+    return cached_generate(
+        model,
+        full_prompt,
+        generate_uncached,
+        config=generation_config,
+        is_valid=is_valid or (_is_json_response if json_response else None)
+    )
 
-    **JSON Structure Example:**
-    {{
-        "root": {{
+
+def _generate_json(prompt, kind, document=None, **context):
+    """
+    Request schema-constrained JSON (Gemini JSON mode) of the given kind (see
+    llm_schemas.STRUCTURED_OUTPUTS) and return it parsed, validated and locally repaired.
+
+    The prompt is only re-sent when the response isn't parseable JSON at all; that retry
+    is counted. Raises ValueError if no usable result comes back. Only usable responses
+    are cached, so an unusable one is not replayed on the next upload.
+    """
+    generation_config = json_generation_config(STRUCTURED_OUTPUTS[kind][0])
+
+    def is_valid(text):
+        try:
+            return is_usable(kind, json.loads(clean_json_response(text)), **context)
+        except ValueError:
+            return False
+
+    for attempt in range(2):
+        raw_response = _generate_text(prompt, generation_config=generation_config, document=document, is_valid=is_valid)
+        try:
+            data = json.loads(clean_json_response(raw_response))
+            break
+        except ValueError:
+            if attempt:
+                raise ValueError(f"Gemini returned unparseable JSON for {kind}")
+            record_retry(kind)
+
+    data = validate_output(kind, data, **context)
+    if data is None:
+        raise ValueError(f"Gemini response has no usable {kind}")
+    return data
+
+
+# --- Response structures, shared by the per-format and combined prompts ---
+_MINDMAP_STRUCTURE = """{
+        "root": {
             "topic": "Main Topic",
             "children": [
-                {{
+                {
                     "topic": "Core Concept",
                     "summary": "o`ptional detailed summary string (e.g., key points from the text).",
                     "definition": "optional short, single-sentence definition string for key terms.",
                     "children": [
-                        {{
+                        {
                             "topic": "Further Detail or Sub-topic",
                             "summary": "another optional summary",
                             "children": []
-                        }}
+                        }
                     ]
-                }}
+                }
             ]
-        }}
-    }}
-    Important: Return ONLY valid JSON that matches the schema above. Do NOT include any explanation, markdown, or additional text. The output must be a single JSON object and nothing else.
+        }
+    }"""
+
+_SUMMARY_STRUCTURE = """{
+        "title": "Brief title for the content",
+        "summary": "2-3 paragraph overview in simple language with proper markdown formatting. Use **bold** for important terms, *italics* for emphasis, and proper paragraphs.",
+        "key_points": [
+            "Key point 1 - clear and concise",
+            "Key point 2 - clear and concise", 
+            "Key point 3 - clear and concise",
+            "Key point 4 - clear and concise"
+        ],
+        "detailed_explanation": "A longer, more detailed explanation broken into multiple paragraphs. Use markdown formatting including:\\n\\n- **Bold** for key concepts\\n- *Italics* for emphasis\\n- Proper paragraph breaks\\n- Bullet points where appropriate\\n\\nThis should be educational and easy to understand.",
+        "example": "A simple, relatable example or analogy to help understand the main concept. Use markdown formatting here too.",
+        "conclusion": "A brief concluding thought or key takeaway in 1-2 sentences."
+    }"""
+
+_QUIZ_STRUCTURE = """{
+        "quiz_type": "mcq",
+        "questions": [
+            {
+                "question": "Question text here?",
+                "options": ["Option A", "Option B", "Option C", "Option D"],
+                "answer": "Option B"
+            }
+        ]
+    }"""
+
+_INFOGRAPHIC_STRUCTURE = """{
+        "theme": "modern_educational",
+        "title": "Main Topic Title",
+        "subtitle": "Brief context or tagline",
+        "progressSteps": ["Concept 1", "Concept 2", "Concept 3"],
+        "blocks": [
+            {
+                "type": "hero",
+                "title": "Main Concept Name",
+                "content": "Short 1-2 sentence definition or key insight",
+                "icon": "Lightbulb"
+            },
+            {
+                "type": "split-stat",
+                "stat1": {"label": "Category A", "value": "40%", "description": "Brief context"},
+                "stat2": {"label": "Category B", "value": "60%", "description": "Brief context"}
+            },
+            {
+                "type": "key-point",
+                "title": "Important Point",
+                "description": "2-3 sentence explanation of this key concept",
+                "icon": "Target"
+            },
+            {
+                "type": "key-point",
+                "title": "Another Point",
+                "description": "2-3 sentence explanation",
+                "icon": "BookOpen"
+            },
+            {
+                "type": "key-point",
+                "title": "Third Point",
+                "description": "2-3 sentence explanation",
+                "icon": "Sparkles"
+            },
+            {
+                "type": "comparison",
+                "title": "Compare & Contrast",
+                "left": {"label": "Option A", "points": ["Point 1", "Point 2"]},
+                "right": {"label": "Option B", "points": ["Point 1", "Point 2"]}
+            },
+            {
+                "type": "conclusion",
+                "content": "Key takeaway or summary sentence",
+                "icon": "CheckCircle"
+            }
+        ],
+        "stats": [
+            {"label": "Stat Label", "value": "Value"}
+        ],
+        "key_points": [
+            {"title": "Point 1", "description": "Short description"},
+            {"title": "Point 2", "description": "Short description"},
+            {"title": "Point 3", "description": "Short description"}
+        ],
+        "conclusion": "Short concluding sentence"
+    }"""
 
-    Text to Analyze:
+_INFOGRAPHIC_RULES = """1. Always include a "hero" block first with the main concept
+    2. Include 2-4 "key-point" blocks for important concepts
+    3. Include "split-stat" ONLY if numerical data exists in text, otherwise omit
+    4. Include "comparison" ONLY if there are contrasting concepts, otherwise omit
+    5. Always end with a "conclusion" block
+    6. Icons must be one of: Lightbulb, Target, BookOpen, Sparkles, CheckCircle, Brain, Zap, Award, TrendingUp, Users
+    7. progressSteps should show the logical flow of concepts (3-5 steps)
+    8. Also include legacy "stats" and "key_points" arrays for backward compatibility
+    9. Keep all text concise, student-friendly, and educational"""
+
+
+# --- Map-reduce for long documents ---
+# Documents over LLM_SINGLE_PASS_TOKENS are split into chunks along section boundaries;
+# each chunk is condensed into study notes by its own Gemini call (concurrently), and the
+# format prompt then runs once over the combined notes.
+_llm_executor = None
+_llm_executor_lock = threading.Lock()
+# Recently condensed documents, shared by the formats generated for the same upload
+_condensed = OrderedDict()
+_condensed_lock = threading.Lock()
+_CONDENSED_CACHE_SIZE = 16
+# Per-format regeneration after a combined call, kept off the chunk pool so a fallback
+# never waits on work queued behind it in the pool it occupies
+_fallback_executor = None
+_fallback_executor_lock = threading.Lock()
+
+
+class CondensedText(str):
+    """Text already through condense_long_text - notes that must not be mapped again."""
+
+
+def _get_llm_executor():
+    global _llm_executor
+    if _llm_executor is None:
+        with _llm_executor_lock:
+            if _llm_executor is None:
+                _llm_executor = ThreadPoolExecutor(
+                    max_workers=max(1, Config.LLM_CHUNK_WORKERS),
+                    thread_name_prefix="llm-call"
+                )
+    return _llm_executor
+
+
+def _get_fallback_executor():
+    global _fallback_executor
+    if _fallback_executor is None:
+        with _fallback_executor_lock:
+            if _fallback_executor is None:
+                _fallback_executor = ThreadPoolExecutor(
+                    max_workers=len(COMBINED_FORMATS),
+                    thread_name_prefix="llm-fallback"
+                )
+    return _fallback_executor
+
+
+def _condense_chunk(chunk, index, total, max_words):
+
+    prompt = f"""
+    You are preparing study notes from part {index} of {total} of a longer document.
+    Condense the text below into dense notes of at most {max_words} words that keep:
+    - section and chapter headings, in their original order
+    - key concepts and their definitions
+    - facts, figures, statistics and dates exactly as written
+    - examples, comparisons and cause/effect relationships
+
+    Use only information present in the text. Return plain text notes with headings and
+    bullet points, no introduction or closing remarks.
+
+    Text:
     ---
-    {text_content}
+    {chunk}
     ---
     """
 
     try:
-        def _attempt(p):
-            resp = model.generate_content(p)
-            raw = resp.text or ''
-            return clean_json_response(raw)
+        notes = _generate_text(prompt, json_response=False).strip()
+        if notes:
+            return notes
+    except Exception as e:
+        print(f"Error condensing chunk {index}/{total}: {e}")
+    # Keep the start of the raw chunk rather than dropping this part of the document
+    return chunk[:max_words * 6]
+
+
+def _map_chunks(text_content):
+    chunks = split_into_chunks(text_content, Config.LLM_CHUNK_TOKENS)
+    total = len(chunks)
+    # Size the notes so the combined result fits a single prompt again
+    max_words = max(150, int(Config.LLM_SINGLE_PASS_TOKENS * 0.75 / total))
+    print(f"Condensing {estimate_tokens(text_content)}-token document in {total} chunks")
+
+    executor = _get_llm_executor()
+    futures = [
+        executor.submit(contextvars.copy_context().run, _condense_chunk, chunk, index, total, max_words)
+        for index, chunk in enumerate(chunks, start=1)
+    ]
+    return "\n\n".join(
+        f"[Part {index} of {total}]\n{future.result()}"
+        for index, future in enumerate(futures, start=1)
+    )
+
+
+def condense_long_text(text_content):
+    """
+    Return text_content unchanged if it fits in a single prompt, otherwise the combined
+    per-chunk notes (the map step) for the format prompt to reduce.
 
-        cleaned = _attempt(prompt)
+    Concurrent calls for the same text - e.g. the formats of one upload - share a single
+    map run. The result is a CondensedText, which is returned unchanged if passed back in.
+    """
+    if not text_content or isinstance(text_content, CondensedText):
+        return text_content
+    if estimate_tokens(text_content) <= Config.LLM_SINGLE_PASS_TOKENS:
+        return CondensedText(text_content)
+
+    key = hashlib.sha256(text_content.encode('utf-8')).hexdigest()
+    with _condensed_lock:
+        future = _condensed.get(key)
+        owner = future is None
+        if owner:
+            future = Future()
+            _condensed[key] = future
+            while len(_condensed) > _CONDENSED_CACHE_SIZE:
+                _condensed.popitem(last=False)
+        else:
+            _condensed.move_to_end(key)
+
+    if owner:
         try:
-            parsed = json.loads(cleaned)
-            return json.dumps(parsed, ensure_ascii=False)
-        except Exception:
-            strict_prompt = (
-                prompt
-                + "\nIMPORTANT: Return ONLY valid JSON exactly as specified above. No text, no markdown, no explanation. If you cannot produce valid JSON, respond with an object like {\"error\": \"description\"}."
-            )
-            cleaned2 = _attempt(strict_prompt)
-            try:
-                parsed2 = json.loads(cleaned2)
-                return json.dumps(parsed2, ensure_ascii=False)
-            except Exception:
-                return json.dumps({"error": "Invalid JSON received from AI"})
+            notes = CondensedText(_map_chunks(text_content))
+            future.set_result(notes)
+            with _condensed_lock:
+                # Already condensed - never map the notes themselves again
+                _condensed[hashlib.sha256(notes.encode('utf-8')).hexdigest()] = future
+        except Exception as e:
+            with _condensed_lock:
+                _condensed.pop(key, None)
+            future.set_exception(e)
+    return future.result()
+
+
+def generate_mindmap_from_text(text_content):
+    document = get_document_context(condense_long_text(text_content))
+
+    
+    prompt = f"""
+    Analyze the document above and generate a structured JSON object for a mind map visualization.
+    The structure should be lateral (horizontal flow), with the main root having 3-5 major branches (children).
+    
+    The JSON must follow this structure **exactly**:
+    - A single root object with a key named "root".
+    - Nodes can optionally have the "summary" and "definition" fields.
+    - IMPORTANT: For any node representing a core concept, include an optional property named "definition" which contains a short, single-sentence string explanation of that term. This definition will be visualized as a child node in the UI.
+    - Ensure the output is only the raw JSON, without any surrounding text, explanations, or markdown formatting like ```json.
 
+    **JSON Structure Example:**
+    {_MINDMAP_STRUCTURE}
+    Important: Return ONLY valid JSON that matches the schema above. Do NOT include any explanation, markdown, or additional text. The output must be a single JSON object and nothing else.
+    """
+
+    try:
+        parsed = _generate_json(prompt, "mindmap", document=document)
+        return json.dumps(parsed, ensure_ascii=False)
+    except ValueError as e:
+        print(f"Invalid mind map from Gemini: {e}")
+        return json.dumps({"error": "Invalid JSON received from AI"})
     except Exception as e:
         print(f"Error calling Gemini API: {e}")
         return '{"error": "Failed to generate mind map due to an API error."}'
@@ -121,25 +370,13 @@ def generate_mindmap_from_text(text_content):
 
 def generate_summary_from_text(text_content):
     """Generate a student-friendly summary from text content with markdown formatting"""
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    document = get_document_context(condense_long_text(text_content))
     
     prompt = f"""
-    You are an educational assistant helping students understand complex topics. Create a clear, comprehensive summary of the following text.
+    You are an educational assistant helping students understand complex topics. Create a clear, comprehensive summary of the document above.
 
     Format your response as a JSON object with this exact structure:
-    {{
-        "title": "Brief title for the content",
-        "summary": "2-3 paragraph overview in simple language with proper markdown formatting. Use **bold** for important terms, *italics* for emphasis, and proper paragraphs.",
-        "key_points": [
-            "Key point 1 - clear and concise",
-            "Key point 2 - clear and concise", 
-            "Key point 3 - clear and concise",
-            "Key point 4 - clear and concise"
-        ],
-        "detailed_explanation": "A longer, more detailed explanation broken into multiple paragraphs. Use markdown formatting including:\\n\\n- **Bold** for key concepts\\n- *Italics* for emphasis\\n- Proper paragraph breaks\\n- Bullet points where appropriate\\n\\nThis should be educational and easy to understand.",
-        "example": "A simple, relatable example or analogy to help understand the main concept. Use markdown formatting here too.",
-        "conclusion": "A brief concluding thought or key takeaway in 1-2 sentences."
-    }}
+    {_SUMMARY_STRUCTURE}
 
     Important formatting guidelines:
     - Use **bold** (double asterisks) for important terms and concepts
@@ -148,33 +385,22 @@ def generate_summary_from_text(text_content):
     - Keep the language simple and engaging for students
     - Avoid jargon, or explain it when necessary
     - Focus on the most important concepts
-
-    Text to summarize:
-    ---
-    {text_content}
-    ---
     
     Return ONLY the JSON object, no additional text or formatting.
     """
 
     try:
-        response = model.generate_content(prompt)
-        raw_response = response.text or ''
-        cleaned_response = clean_json_response(raw_response)
-        
-        try:
-            parsed_data = json.loads(cleaned_response)
-            return parsed_data
-        except json.JSONDecodeError:
-            return {
-                "error": "Failed to parse AI response",
-                "title": "Summary Error",
-                "summary": "Unable to generate summary at this time.",
-                "key_points": ["Please try again with a different document"],
-                "detailed_explanation": "There was an error processing your document. Please try again.",
-                "example": "Technical error occurred",
-                "conclusion": "Please try uploading your document again."
-            }
+        return _generate_json(prompt, "summary", document=document)
+    except ValueError:
+        return {
+            "error": "Failed to parse AI response",
+            "title": "Summary Error",
+            "summary": "Unable to generate summary at this time.",
+            "key_points": ["Please try again with a different document"],
+            "detailed_explanation": "There was an error processing your document. Please try again.",
+            "example": "Technical error occurred",
+            "conclusion": "Please try uploading your document again."
+        }
     except Exception as e:
         print(f"Error generating summary: {e}")
         return {
@@ -190,22 +416,13 @@ def generate_summary_from_text(text_content):
 
 def generate_quiz_from_text(text_content, num_questions=5):
     """Generate an interactive quiz from text content"""
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    document = get_document_context(condense_long_text(text_content))
     
     prompt = f"""
-    You are an educational assistant creating a quiz for students. Generate {num_questions} multiple-choice questions based on the following text.
+    You are an educational assistant creating a quiz for students. Generate {num_questions} multiple-choice questions based on the document above.
 
     Format your response as a JSON object with this exact structure:
-    {{
-        "quiz_type": "mcq",
-        "questions": [
-            {{
-                "question": "Question text here?",
-                "options": ["Option A", "Option B", "Option C", "Option D"],
-                "answer": "Option B"
-            }}
-        ]
-    }}
+    {_QUIZ_STRUCTURE}
 
     IMPORTANT:
     - Generate exactly {num_questions} questions
@@ -213,42 +430,28 @@ def generate_quiz_from_text(text_content, num_questions=5):
     - The "answer" field must be the exact text of the correct option (not an index)
     - Questions should test understanding, not just memorization
     - Keep language clear and appropriate for students
-
-    Text for quiz creation:
-    ---
-    {text_content}
-    ---
     
     Return ONLY the JSON object, no additional text or formatting.
     """
 
     try:
-        response = model.generate_content(prompt)
-        raw_response = response.text or ''
-        cleaned_response = clean_json_response(raw_response)
-        
-        try:
-            parsed_data = json.loads(cleaned_response)
-            # Ensure the format is correct
-            if "questions" not in parsed_data:
-                parsed_data = {"quiz_type": "mcq", "questions": []}
-            if "quiz_type" not in parsed_data:
-                parsed_data["quiz_type"] = "mcq"
-            return parsed_data
-        except json.JSONDecodeError:
-            return {
-                "quiz_type": "mcq",
-                "questions": [
-                    {
-                        "question": "Please try uploading your document again.",
-                        "options": ["Try again", "Upload different file", "Contact support", "Check file format"],
-                        "answer": "Try again"
-                    }
-                ]
-            }
+        return _generate_json(prompt, "quiz", document=document, num_questions=num_questions)
+    except ValueError:
+        return {
+            "error": "Failed to parse AI response",
+            "quiz_type": "mcq",
+            "questions": [
+                {
+                    "question": "Please try uploading your document again.",
+                    "options": ["Try again", "Upload different file", "Contact support", "Check file format"],
+                    "answer": "Try again"
+                }
+            ]
+        }
     except Exception as e:
         print(f"Error generating quiz: {e}")
         return {
+            "error": f"Failed to generate quiz: {str(e)}",
             "quiz_type": "mcq",
             "questions": [
                 {
@@ -262,132 +465,46 @@ def generate_quiz_from_text(text_content, num_questions=5):
 
 def generate_infographic_data_from_text(text_content):
     """Generate structured data for a modern Bento Box infographic layout"""
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    document = get_document_context(condense_long_text(text_content))
     
     prompt = f"""
-    Analyze this text for an educational infographic. Act as an instructional designer.
+    Analyze the document above for an educational infographic. Act as an instructional designer.
     Break it into a 'Bento Box' grid layout with visual hierarchy and layout metadata.
     
     CRITICAL INSTRUCTION: 
-    - You must ONLY use the information present in the "Text to analyze" section below. 
+    - You must ONLY use the information present in the document above. 
     - Do NOT use your own external knowledge or hallucinate facts not present in the text.
     - If a specific piece of information (like stats) is not in the text, do NOT invent it.
     
     Return JSON with this exact structure:
-    {{
-        "theme": "modern_educational",
-        "title": "Main Topic Title",
-        "subtitle": "Brief context or tagline",
-        "progressSteps": ["Concept 1", "Concept 2", "Concept 3"],
-        "blocks": [
-            {{
-                "type": "hero",
-                "title": "Main Concept Name",
-                "content": "Short 1-2 sentence definition or key insight",
-                "icon": "Lightbulb"
-            }},
-            {{
-                "type": "split-stat",
-                "stat1": {{"label": "Category A", "value": "40%", "description": "Brief context"}},
-                "stat2": {{"label": "Category B", "value": "60%", "description": "Brief context"}}
-            }},
-            {{
-                "type": "key-point",
-                "title": "Important Point",
-                "description": "2-3 sentence explanation of this key concept",
-                "icon": "Target"
-            }},
-            {{
-                "type": "key-point",
-                "title": "Another Point",
-                "description": "2-3 sentence explanation",
-                "icon": "BookOpen"
-            }},
-            {{
-                "type": "key-point",
-                "title": "Third Point",
-                "description": "2-3 sentence explanation",
-                "icon": "Sparkles"
-            }},
-            {{
-                "type": "comparison",
-                "title": "Compare & Contrast",
-                "left": {{"label": "Option A", "points": ["Point 1", "Point 2"]}},
-                "right": {{"label": "Option B", "points": ["Point 1", "Point 2"]}}
-            }},
-            {{
-                "type": "conclusion",
-                "content": "Key takeaway or summary sentence",
-                "icon": "CheckCircle"
-            }}
-        ],
-        "stats": [
-            {{"label": "Stat Label", "value": "Value"}}
-        ],
-        "key_points": [
-            {{"title": "Point 1", "description": "Short description"}},
-            {{"title": "Point 2", "description": "Short description"}},
-            {{"title": "Point 3", "description": "Short description"}}
-        ],
-        "conclusion": "Short concluding sentence"
-    }}
+    {_INFOGRAPHIC_STRUCTURE}
 
     IMPORTANT RULES:
-    1. Always include a "hero" block first with the main concept
-    2. Include 2-4 "key-point" blocks for important concepts
-    3. Include "split-stat" ONLY if numerical data exists in text, otherwise omit
-    4. Include "comparison" ONLY if there are contrasting concepts, otherwise omit
-    5. Always end with a "conclusion" block
-    6. Icons must be one of: Lightbulb, Target, BookOpen, Sparkles, CheckCircle, Brain, Zap, Award, TrendingUp, Users
-    7. progressSteps should show the logical flow of concepts (3-5 steps)
-    8. Also include legacy "stats" and "key_points" arrays for backward compatibility
-    9. Keep all text concise, student-friendly, and educational
-
-    Text to analyze:
-    ---
-    {text_content}
-    ---
+    {_INFOGRAPHIC_RULES}
     
     Return ONLY the JSON object, no additional text.
     """
 
     try:
-        response = model.generate_content(prompt)
-        raw_response = response.text or ''
-        cleaned_response = clean_json_response(raw_response)
-        
-        try:
-            data = json.loads(cleaned_response)
-            # Ensure required fields exist for backward compatibility
-            if "title" not in data:
-                data["title"] = "Infographic"
-            if "subtitle" not in data:
-                data["subtitle"] = "Generated Summary"
-            if "blocks" not in data:
-                data["blocks"] = []
-            if "stats" not in data:
-                data["stats"] = []
-            if "key_points" not in data:
-                data["key_points"] = []
-            if "progressSteps" not in data:
-                data["progressSteps"] = []
-            return data
-        except json.JSONDecodeError:
-            return {
-                "theme": "modern_educational",
-                "title": "Infographic Generation Failed",
-                "subtitle": "Could not parse data",
-                "blocks": [
-                    {"type": "hero", "title": "Error", "content": "Please try again", "icon": "Lightbulb"}
-                ],
-                "stats": [],
-                "key_points": [{"title": "Error", "description": "Please try again."}],
-                "progressSteps": [],
-                "conclusion": ""
-            }
+        return _generate_json(prompt, "infographic", document=document)
+    except ValueError:
+        return {
+            "error": "Failed to parse AI response",
+            "theme": "modern_educational",
+            "title": "Infographic Generation Failed",
+            "subtitle": "Could not parse data",
+            "blocks": [
+                {"type": "hero", "title": "Error", "content": "Please try again", "icon": "Lightbulb"}
+            ],
+            "stats": [],
+            "key_points": [{"title": "Error", "description": "Please try again."}],
+            "progressSteps": [],
+            "conclusion": ""
+        }
     except Exception as e:
         print(f"Error generating infographic data: {e}")
         return {
+            "error": f"Failed to generate infographic data: {str(e)}",
             "theme": "modern_educational",
             "title": "Error",
             "subtitle": "System error",
@@ -401,61 +518,44 @@ def generate_infographic_data_from_text(text_content):
 
 def generate_flashcards_from_text(text_content):
     """Generate structured flashcard data from text content"""
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    document = get_document_context(condense_long_text(text_content))
 
-    prompt = f"""
+    prompt = """
     You are an educational assistant creating flashcards for students.
-    Analyze the following text and generate flashcards in a clean JSON format.
+    Analyze the document above and generate flashcards in a clean JSON format.
 
     Structure the JSON EXACTLY like this:
-    {{
+    {
         "flashcards": [
-            {{
+            {
                 "term": "Important concept",
                 "definition": "Short, simple explanation in 1–2 sentences."
-            }},
-            {{
+            },
+            {
                 "term": "Another key idea",
                 "definition": "Clear and concise explanation."
-            }}
+            }
         ]
-    }}
+    }
 
     Requirements:
     - Generate 5–10 flashcards depending on the density of the input text.
-    - ONLY use information present in the provided text.
+    - ONLY use information present in the provided document.
     - Definitions must be short, simple, and student-friendly.
     - Return ONLY the JSON. No markdown, no extra text.
-
-    Text to analyze:
-    ---
-    {text_content}
-    ---
     """
 
     try:
-        response = model.generate_content(prompt)
-        raw_response = response.text or ""
-        cleaned_response = clean_json_response(raw_response)
-
-        try:
-            parsed_data = json.loads(cleaned_response)
-
-            # Ensure format
-            if "flashcards" not in parsed_data:
-                parsed_data = {"flashcards": []}
-
-            return parsed_data
-
-        except json.JSONDecodeError:
-            return {
-                "flashcards": [
-                    {
-                        "term": "Flashcard generation error",
-                        "definition": "The system could not parse the flashcard data. Please try again."
-                    }
-                ]
-            }
+        return _generate_json(prompt, "flashcards", document=document)
+    except ValueError:
+        return {
+            "flashcards": [
+                {
+                    "term": "Flashcard generation error",
+                    "definition": "The system could not parse the flashcard data. Please try again."
+                }
+            ]
+        }
 
     except Exception as e:
         print(f"Error generating flashcards: {e}")
@@ -467,3 +567,92 @@ def generate_flashcards_from_text(text_content):
                 }
             ]
         }
+
+
+# --- Combined generation: several formats from one call ---
+# name -> (structure shown in the prompt, individual generator used when the section is unusable)
+COMBINED_FORMATS = {
+    "mindmap": (_MINDMAP_STRUCTURE, lambda text, n: json.loads(generate_mindmap_from_text(text))),
+    "summary": (_SUMMARY_STRUCTURE, lambda text, n: generate_summary_from_text(text)),
+    "quiz": (_QUIZ_STRUCTURE, lambda text, n: generate_quiz_from_text(text, n)),
+    "infographic": (_INFOGRAPHIC_STRUCTURE, lambda text, n: generate_infographic_data_from_text(text)),
+}
+
+
+def _combined_prompt(formats, num_questions):
+    sections = []
+    rules = []
+    for name in formats:
+        sections.append(f'''"{name}": {COMBINED_FORMATS[name][0]}''')
+    if "mindmap" in formats:
+        rules.append('mindmap: lateral structure with 3-5 major branches; give core concepts a short, single-sentence "definition"')
+    if "summary" in formats:
+        rules.append("summary: simple, student-friendly language; markdown **bold** for key terms, *italics* for emphasis, \\n\\n between paragraphs")
+    if "quiz" in formats:
+        rules.append(f'quiz: exactly {num_questions} multiple-choice questions with 4 options each; "answer" is the exact text of the correct option; test understanding, not memorization')
+    if "infographic" in formats:
+        rules.append("infographic:\n    " + _INFOGRAPHIC_RULES)
+    section_text = ",\n    ".join(sections)
+    rule_text = "\n    - ".join(rules)
+
+    return f"""
+    You are an educational assistant turning the document above into several study formats at once.
+    Return a single JSON object with exactly these top-level keys, each following its structure:
+    {{
+    {section_text}
+    }}
+
+    Rules:
+    - {rule_text}
+    - Use ONLY information present in the document; do not invent facts or statistics.
+
+    Return ONLY the JSON object, no additional text or formatting.
+    """
+
+
+def generate_formats_from_text(text_content, formats, num_questions=5):
+    """
+    Generate several formats ("mindmap", "summary", "quiz", "infographic") with a single
+    Gemini call, so the document is only sent (and paid for) once.
+
+    Returns {name: data} with data shaped like the matching individual generator's result
+    (the mind map as a parsed dict). Each section is validated and repaired on its own;
+    one that is missing or unusable is regenerated with that format's individual call.
+    """
+    formats = [name for name in formats if name in COMBINED_FORMATS]
+    text_content = condense_long_text(text_content)
+    schema = combined_schema({name: STRUCTURED_OUTPUTS[name][0] for name in formats})
+    sections = {}
+    try:
+        raw_response = _generate_text(
+            _combined_prompt(formats, num_questions),
+            generation_config=json_generation_config(schema),
+            document=get_document_context(text_content)
+        )
+        parsed = json.loads(clean_json_response(raw_response))
+        if isinstance(parsed, dict):
+            sections = parsed
+    except Exception as e:
+        print(f"Combined generation failed, generating formats individually: {e}")
+
+    results = {}
+    fallbacks = []
+    for name in formats:
+        # A quiz with fewer questions than requested is regenerated, extra ones are dropped
+        data = validate_output(name, sections.get(name), num_questions=num_questions)
+        if data is None:
+            fallbacks.append(name)
+        else:
+            results[name] = data
+
+    if fallbacks:
+        print(f"Regenerating invalid combined sections individually: {', '.join(fallbacks)}")
+        # text_content is a CondensedText here, so the fallbacks never run the map step again
+        executor = _get_fallback_executor()
+        futures = {
+            name: executor.submit(contextvars.copy_context().run, COMBINED_FORMATS[name][1], text_content, num_questions)
+            for name in fallbacks
+        }
+        for name, future in futures.items():
+            results[name] = future.result()
+    return results
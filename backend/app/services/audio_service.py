@@ -2,44 +2,47 @@ import json
 import time
 import io
 import os
-import re
+import queue
+import tempfile
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from google import genai
 from elevenlabs import ElevenLabs
 from dotenv import load_dotenv
+from .llm_cache import cached_generate, cached_generate_stream
+from .llm_gateway import generate, generate_stream
+from .rate_limiter import call_with_retries
+from .tts_cache import cached_synthesize
+from ..fakes import fake_backend_enabled
+from .document_context import get_document_context
+from ..utils.llm_json import extract_json, JsonStreamDecoder
+from .llm_schemas import (
+    PODCAST_DIALOGUE_SCHEMA, json_generation_config, validate_output, record_retry, iter_valid_dialogue
+)
+from backend.config import Config
 
 load_dotenv()
 
-# Initialize clients
-genai_client = None
+# Initialize clients (Gemini calls go through the shared llm_gateway client)
 el_client = None
 
-def _init_clients():
-    """Initialize API clients if not already initialized."""
-    global genai_client, el_client
-    
-    if genai_client is None:
-        gemini_api_key = os.getenv("GEMINI_API_KEY")
-        if not gemini_api_key:
-            raise ValueError("GEMINI_API_KEY not configured")
-        genai_client = genai.Client(api_key=gemini_api_key)
-    
-    if el_client is None:
-        elevenlabs_api_key = os.getenv("ELEVENLABS_API_KEY")
-        if not elevenlabs_api_key:
-            raise ValueError("ELEVENLABS_API_KEY not configured")
-        el_client = ElevenLabs(
-            api_key=elevenlabs_api_key,
-            base_url="https://api.elevenlabs.io/"
-        )
+TTS_MODEL_ID = "eleven_turbo_v2_5"
+TTS_OUTPUT_FORMAT = "mp3_44100_128"
 
+# Process-wide pool for per-line TTS, so the podcasts being generated in a worker never
+# have more than TTS_WORKERS ElevenLabs requests in flight between them.
+_tts_executor = None
+_tts_executor_lock = threading.Lock()
 
-def _init_eleven_client():
-    """Initialize ElevenLabs client only (no Gemini dependency).
 
-    Use this when you already have dialogue JSON and only need TTS.
-    """
+def _init_eleven_client():
+    """Initialize the ElevenLabs client if not already initialized."""
     global el_client
+    if el_client is None and fake_backend_enabled("elevenlabs"):
+        from ..fakes.elevenlabs import FakeElevenLabs
+        log("Using the local fake ElevenLabs backend")
+        el_client = FakeElevenLabs()
     if el_client is None:
         elevenlabs_api_key = os.getenv("ELEVENLABS_API_KEY")
         if not elevenlabs_api_key:
@@ -50,6 +53,18 @@ def _init_eleven_client():
         )
 
 
+def _get_tts_executor():
+    global _tts_executor
+    if _tts_executor is None:
+        with _tts_executor_lock:
+            if _tts_executor is None:
+                _tts_executor = ThreadPoolExecutor(
+                    max_workers=max(1, Config.TTS_WORKERS),
+                    thread_name_prefix="tts-line"
+                )
+    return _tts_executor
+
+
 def log(msg):
     """Timestamped logging."""
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}")
@@ -58,73 +73,27 @@ def log(msg):
 def clean_json(raw_text: str) -> str:
     """
     Robustly extract and clean JSON from response.
-    Handles markdown, trailing commas, and basic syntax errors.
+    Handles markdown, prose around the JSON, trailing commas and truncated output.
     """
-    if not raw_text:
-        return ''
-    
-    cleaned = raw_text.strip()
-    
-    # 1. Remove Markdown Code Blocks (```json ... ```)
-    # Using regex to capture content inside code fences
-    md_pattern = r'```(?:json)?\s*(.*?)```'
-    match = re.search(md_pattern, cleaned, re.DOTALL | re.IGNORECASE)
-    if match:
-        cleaned = match.group(1).strip()
-    else:
-        # Fallback: simple strip if no regex match but stars with ```
-        if cleaned.startswith("```"):
-            cleaned = re.sub(r'^```(?:json)?', '', cleaned, flags=re.MULTILINE | re.IGNORECASE)
-            cleaned = cleaned.rstrip('`').strip()
-
-    # 2. Extract strictly from first [ or { to last ] or }
-    # Find start
-    start_bracket = cleaned.find('[')
-    start_brace = cleaned.find('{')
-    
-    start_index = -1
-    end_char = ''
-    
-    if start_bracket != -1 and (start_brace == -1 or start_bracket < start_brace):
-        start_index = start_bracket
-        end_char = ']'
-    elif start_brace != -1:
-        start_index = start_brace
-        end_char = '}'
-        
-    if start_index != -1:
-        # Find the LAST occurrence of the matching end char
-        end_index = cleaned.rfind(end_char)
-        if end_index != -1 and end_index > start_index:
-            cleaned = cleaned[start_index:end_index+1]
-        else:
-            # Fallback if no closing char found, take everything from start
-            cleaned = cleaned[start_index:]
-            
-    # 3. Remove trailing commas using Regex
-    # Matches a comma followed by whitespace and a closing bracket/brace
-    # re.X allows for verbose regex (comments), but we'll stick to simple inline
-    # Pattern: , followed by optional whitespace, followed by ] or }
-    # Repace with just the bracket/brace
-    cleaned = re.sub(r',\s*([\]}])', r'\1', cleaned)
-
-    return cleaned
+    return extract_json(raw_text)
 
 
-def text_to_podcast_json(text: str, host_voice_id: str, guest_voice_id: str) -> list:
-    """Convert text to podcast dialogue JSON using Gemini."""
-    _init_clients()
-    
-    log("Sending text to Gemini for podcast transformation...")
-    start = time.time()
+def _is_dialogue_json(raw_text: str) -> bool:
+    try:
+        return isinstance(json.loads(clean_json(raw_text)), list)
+    except ValueError:
+        return False
+
 
-    prompt = f"""
+def _podcast_script_prompt(host_voice_id: str, guest_voice_id: str) -> str:
+    """Script instructions; the document itself is sent through its DocumentContext."""
+    return f"""
 You are a professional podcast scriptwriter.
 
-Convert the document below into a natural, high-quality, two-speaker podcast conversation.
+Convert the document above into a natural, high-quality, two-speaker podcast conversation.
 
-HOST voice_id: "{HOST_VOICE}"
-GUEST voice_id: "{GUEST_VOICE}"
+HOST voice_id: "{host_voice_id}"
+GUEST voice_id: "{guest_voice_id}"
 
 ================= HARD RULES =================
 
@@ -137,12 +106,12 @@ No text outside the JSON.
 Each element must be exactly:
 {{
   "text": "spoken podcast dialogue",
-  "voice_id": "{HOST_VOICE}" or "{GUEST_VOICE}"
+  "voice_id": "{host_voice_id}" or "{guest_voice_id}"
 }}
 
 2. VOICE RULES (CRITICAL)
-- HOST always uses "{HOST_VOICE}"
-- GUEST always uses "{GUEST_VOICE}"
+- HOST always uses "{host_voice_id}"
+- GUEST always uses "{guest_voice_id}"
 - Never swap voices
 - Never invent or introduce other voices
 - Each line belongs to exactly one speaker
@@ -187,81 +156,248 @@ If rules conflict, follow this order:
 3. Length & timing constraints
 4. Content coverage
 5. Conversational quality
-
-================= DOCUMENT =================
-{text}
 """
 
 
-    response = genai_client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt
+def text_to_podcast_json(text: str, host_voice_id: str, guest_voice_id: str) -> list:
+    """Convert text to podcast dialogue JSON using Gemini."""
+    
+    log("Sending text to Gemini for podcast transformation...")
+    start = time.time()
+
+    prompt = _podcast_script_prompt(host_voice_id, guest_voice_id)
+
+    # The document goes out once per upload; only the script instructions are specific to this call
+    document = get_document_context(text)
+    generation_config = json_generation_config(PODCAST_DIALOGUE_SCHEMA)
+
+    def generate_uncached():
+        cached = document.cached_content()
+        if cached is not None:
+            return generate(prompt, model="gemini-2.5-flash", config=generation_config, cached_content=cached)
+        return generate(document.prompt(prompt), model="gemini-2.5-flash", config=generation_config)
+
+    for attempt in range(2):
+        raw_response = cached_generate(
+            "gemini-2.5-flash",
+            document.prompt(prompt),
+            generate_uncached,
+            config=generation_config,
+            is_valid=_is_dialogue_json
+        )
+        log(f"Gemini raw response length: {len(raw_response)} chars")
+
+        cleaned = clean_json(raw_response)
+        log(f"Cleaned JSON length: {len(cleaned)} chars")
+        log(f"Cleaned JSON preview (first 300 chars): {cleaned[:300]}...")
+
+        try:
+            parsed = json.loads(cleaned)
+            break
+        except json.JSONDecodeError as e:
+            log(f"❌ JSON parsing failed at position {e.pos}: {str(e)}")
+            log(f"Cleaned JSON around error (chars {max(0, e.pos-100)} to {min(len(cleaned), e.pos+100)}):")
+            log(f"{cleaned[max(0, e.pos-100):min(len(cleaned), e.pos+100)]}")
+            if attempt:
+                raise ValueError(f"Failed to parse Gemini response as JSON: {str(e)}")
+            record_retry("podcast_dialogue")
+
+    # Lines with no text or an unknown voice are fixed here rather than re-prompting
+    dialogue = validate_output("podcast_dialogue", parsed, host_voice_id=host_voice_id, guest_voice_id=guest_voice_id)
+    if dialogue is None:
+        raise ValueError("Gemini returned no usable podcast dialogue")
+    log(f"Gemini JSON parsed successfully: {len(dialogue)} items in {time.time() - start:.2f} sec")
+    return dialogue
+
+
+class PodcastScriptInterrupted(RuntimeError):
+    """Raised when a streamed script fails after some of its lines were already yielded."""
+
+
+def stream_podcast_script(text: str, host_voice_id: str, guest_voice_id: str):
+    """
+    text_to_podcast_json() with a streamed Gemini response: yields each dialogue line,
+    validated, as soon as its closing brace arrives, so speech synthesis can start on the
+    first line while the rest of the script is still being written.
+
+    A response with no usable lines, or a stream that fails before the first line, falls
+    back to text_to_podcast_json (which retries). A stream that fails after lines were
+    yielded raises PodcastScriptInterrupted: a new script would not continue the old one,
+    so the caller has to discard that audio and start over from a single script.
+    """
+    log("Streaming podcast script from Gemini...")
+    start = time.time()
+    prompt = _podcast_script_prompt(host_voice_id, guest_voice_id)
+    document = get_document_context(text)
+    generation_config = json_generation_config(PODCAST_DIALOGUE_SCHEMA)
+
+    def stream_uncached():
+        cached = document.cached_content()
+        if cached is not None:
+            return generate_stream(prompt, model="gemini-2.5-flash", config=generation_config, cached_content=cached)
+        return generate_stream(document.prompt(prompt), model="gemini-2.5-flash", config=generation_config)
+
+    pieces = cached_generate_stream(
+        "gemini-2.5-flash",
+        document.prompt(prompt),
+        stream_uncached,
+        config=generation_config,
+        is_valid=_is_dialogue_json
     )
 
-    raw_response = response.text
-    log(f"Gemini raw response length: {len(raw_response)} chars")
-    
-    cleaned = clean_json(raw_response)
-    log(f"Cleaned JSON length: {len(cleaned)} chars")
-    log(f"Cleaned JSON preview (first 300 chars): {cleaned[:300]}...")
-    
-    if not cleaned:
-        log(f"❌ Cleaned JSON is empty. Raw response: {raw_response[:500]}")
-        raise ValueError("Gemini returned empty response after cleaning")
+    def items():
+        decoder = JsonStreamDecoder("[")
+        # Read to the end even after the array closes, so the full response gets cached
+        for piece in pieces:
+            yield from decoder.feed(piece)
 
+    count = 0
     try:
-        parsed = json.loads(cleaned)
-        log(f"Gemini JSON parsed successfully: {len(parsed)} items in {time.time() - start:.2f} sec")
-        return parsed
-    except json.JSONDecodeError as e:
-        log(f"❌ JSON parsing failed at position {e.pos}: {str(e)}")
-        log(f"Cleaned JSON around error (chars {max(0, e.pos-100)} to {min(len(cleaned), e.pos+100)}):")
-        log(f"{cleaned[max(0, e.pos-100):min(len(cleaned), e.pos+100)]}")
-        log(f"Full cleaned JSON (first 2000 chars): {cleaned[:2000]}")
-        raise ValueError(f"Failed to parse Gemini response as JSON: {str(e)}")
-
-
-def generate_dialogue_audio(dialogue_json: list, output: str = 'podcast_full.mp3', cleanup: bool = False) -> bytes:
-    """Generate audio from dialogue JSON using ElevenLabs per-line TTS.
+        for line in iter_valid_dialogue(items(), host_voice_id=host_voice_id, guest_voice_id=guest_voice_id):
+            if count == 0:
+                log(f"First podcast line streamed after {time.time() - start:.2f} sec")
+            count += 1
+            yield line
+    except Exception as e:
+        if count:
+            raise PodcastScriptInterrupted(f"Podcast script stream failed after {count} lines: {e}") from e
+        log(f"Podcast script stream failed before the first line ({e}), using a blocking call")
+        yield from text_to_podcast_json(text, host_voice_id, guest_voice_id)
+        return
+
+    if count:
+        log(f"Podcast script streamed: {count} lines in {time.time() - start:.2f} sec")
+        return
+    record_retry("podcast_dialogue")
+    yield from text_to_podcast_json(text, host_voice_id, guest_voice_id)
+
+
+def podcast_script(text: str, host_voice_id: str, guest_voice_id: str):
+    """The dialogue for text: lines as they stream in (PODCAST_SCRIPT_STREAMING), else the full list."""
+    if Config.PODCAST_SCRIPT_STREAMING:
+        return stream_podcast_script(text, host_voice_id, guest_voice_id)
+    return text_to_podcast_json(text, host_voice_id, guest_voice_id)
+
+
+def _synthesize_line(line: dict) -> bytes:
+    """MP3 bytes for one dialogue line, from the TTS cache when the same line was synthesized before."""
+    # The response streams, so errors (e.g. 429 or a dropped connection) can surface while
+    # reading it - retry the whole line, without touching the lines already synthesized
+    return cached_synthesize(
+        line["voice_id"], TTS_MODEL_ID, TTS_OUTPUT_FORMAT, line["text"],
+        lambda: call_with_retries(
+            "elevenlabs",
+            lambda: b"".join(el_client.text_to_speech.convert(
+                voice_id=line["voice_id"],
+                model_id=TTS_MODEL_ID,
+                output_format=TTS_OUTPUT_FORMAT,
+                text=line["text"]
+            )),
+            cost=len(line["text"])
+        )
+    )
+
+
+def iter_dialogue_audio(dialogue_json, line_dir: str = None, on_line=None):
+    """Synthesize dialogue lines concurrently and yield each line's MP3 bytes in dialogue order.
 
-    For each line we call `text_to_speech.convert`, write a `line_XXXX.mp3`
-    file, then merge all line files into a single MP3 which is returned as
-    bytes and written to `output` when provided.
+    dialogue_json may be a list or any iterable of lines, such as stream_podcast_script():
+    each line is handed to the TTS pool (TTS_WORKERS at a time per process) as soon as
+    the iterable produces it, so synthesis overlaps with writing the script. A line is
+    yielded as soon as it and every line before it are done, so a consumer can start
+    playing after the first line. Closing the generator early stops dispatching and
+    cancels the lines that haven't started.
 
     Args:
-        dialogue_json: List of {"text","voice_id"} items
-        output: Path to write merged MP3 (if truthy)
-        cleanup: Remove intermediate `line_XXXX.mp3` files when True
+        dialogue_json: {"text","voice_id"} items
+        line_dir: Directory to also write each line to as `line_XXXX.mp3` (if truthy)
+        on_line: Optional callback called as on_line(completed, total) each time a line
+            finishes; total is None until the script has ended and the line count is
+            known, and on_line is called once more with the final count when it arrives
     """
     _init_eleven_client()
-    log("Starting ElevenLabs per-line TTS generation...")
-    overall_start = time.time()
-
-    part_files = []
-
-    for idx, line in enumerate(dialogue_json, start=1):
-        filename = f"line_{idx:04d}.mp3"
-        log(f"Generating line {idx}/{len(dialogue_json)} → {filename}")
+    executor = _get_tts_executor()
+    # Finished futures, then the dispatcher's line count (or the exception that stopped it)
+    finished = queue.Queue()
+    futures = []
+    stopped = threading.Event()
+
+    def synthesize(idx, line):
+        return idx, _synthesize_line(line)
+
+    def dispatch():
+        try:
+            for idx, line in enumerate(dialogue_json, start=1):
+                if stopped.is_set():
+                    return
+                future = executor.submit(synthesize, idx, line)
+                futures.append(future)
+                future.add_done_callback(finished.put)
+            finished.put(len(futures))
+        except Exception as e:
+            finished.put(e)
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(dispatch,), name="tts-dispatch", daemon=True).start()
+
+    total = None
+    completed = 0
+    # Lines finished ahead of an earlier one wait here until it is done
+    ready = {}
+    next_idx = 1
 
-        audio_stream = el_client.text_to_speech.convert(
-            voice_id=line["voice_id"],
-            model_id="eleven_turbo_v2_5",
-            output_format="mp3_44100_128",
-            text=line["text"]
-        )
-
-        with open(filename, "wb") as f:
-            for chunk in audio_stream:
-                f.write(chunk)
+    try:
+        while total is None or completed < total:
+            item = finished.get()
+            if isinstance(item, Exception):
+                raise item
+            if isinstance(item, int):
+                total = item
+                if on_line is not None and completed:
+                    on_line(completed, total)
+                continue
+
+            idx, audio = item.result()
+            ready[idx] = audio
+            completed += 1
+            known = total if total is not None else "?"
+            log(f"Generated line {idx}/{known} ({len(audio)} bytes, {completed}/{known} done)")
+
+            if line_dir:
+                with open(os.path.join(line_dir, f"line_{idx:04d}.mp3"), "wb") as f:
+                    f.write(audio)
+
+            if on_line is not None:
+                on_line(completed, total)
+
+            while next_idx in ready:
+                yield ready.pop(next_idx)
+                next_idx += 1
+    finally:
+        # Don't spend quota on the rest of a podcast that has failed or is no longer wanted
+        stopped.set()
+        for future in list(futures):
+            future.cancel()
+
+
+def generate_dialogue_audio(dialogue_json: list, output: str = None, line_dir: str = None,
+                            on_line=None) -> bytes:
+    """Generate audio from dialogue JSON using ElevenLabs per-line TTS.
 
-        part_files.append(filename)
+    The lines from iter_dialogue_audio are kept in memory and joined once into a
+    single MP3 which is returned as bytes. Nothing touches the disk unless asked
+    to, so concurrent podcasts in one worker can't overwrite each other's files.
 
-    log("Merging audio files...")
+    Args:
+        dialogue_json: List of {"text","voice_id"} items
+        output: Path to also write the merged MP3 to (if truthy)
+        line_dir, on_line: See iter_dialogue_audio
+    """
+    log("Starting ElevenLabs per-line TTS generation...")
+    overall_start = time.time()
 
-    final_audio = b""
-    for fpath in part_files:
-        with open(fpath, "rb") as infile:
-            final_audio += infile.read()
+    # MP3 frames can simply be concatenated; a single join copies each line once
+    final_audio = b"".join(iter_dialogue_audio(dialogue_json, line_dir=line_dir, on_line=on_line))
 
     # Write final file if requested
     if output:
@@ -269,21 +405,23 @@ def generate_dialogue_audio(dialogue_json: list, output: str = 'podcast_full.mp3
             outfile.write(final_audio)
         log(f"Final podcast saved → {output}")
 
-    # Optional cleanup of intermediate files
-    if cleanup:
-        for fpath in part_files:
-            try:
-                os.remove(fpath)
-            except OSError:
-                log(f"Warning: could not remove intermediate file {fpath}")
-
     log(f"TOTAL TTS time: {time.time() - overall_start:.2f} sec")
     log(f"Final podcast ready ({len(final_audio)} bytes)")
 
     return final_audio
 
 
-def generate_podcast_audio(text: str, host_voice_id: str = None, guest_voice_id: str = None) -> bytes:
+def _new_line_dir():
+    """A fresh directory under PODCAST_LINE_DIR for one podcast's line audio, or None."""
+    if not Config.PODCAST_LINE_DIR:
+        return None
+    os.makedirs(Config.PODCAST_LINE_DIR, exist_ok=True)
+    line_dir = tempfile.mkdtemp(prefix="podcast-", dir=Config.PODCAST_LINE_DIR)
+    log(f"Keeping line audio in {line_dir}")
+    return line_dir
+
+
+def generate_podcast_audio(text: str, host_voice_id: str = None, guest_voice_id: str = None, on_line=None) -> bytes:
     """
     Main entry point for podcast audio generation.
     
@@ -291,6 +429,7 @@ def generate_podcast_audio(text: str, host_voice_id: str = None, guest_voice_id:
         text: Text content to convert to podcast
         host_voice_id: ElevenLabs voice ID for host (defaults to config)
         guest_voice_id: ElevenLabs voice ID for guest (defaults to config)
+        on_line: Optional per-line progress callback, see generate_dialogue_audio
     
     Returns:
         bytes: MP3 audio file as bytes
@@ -308,11 +447,17 @@ def generate_podcast_audio(text: str, host_voice_id: str = None, guest_voice_id:
     total_start = time.time()
     
     try:
-        # 1. Convert text to dialogue JSON
-        podcast_json = text_to_podcast_json(text, host_voice_id, guest_voice_id)
+        # 1. Convert text to dialogue JSON (lines reach TTS as they stream in)
+        podcast_json = podcast_script(text, host_voice_id, guest_voice_id)
         
         # 2. Generate audio from dialogue (per-line TTS)
-        audio_bytes = generate_dialogue_audio(podcast_json, output='podcast_full.mp3')
+        try:
+            audio_bytes = generate_dialogue_audio(podcast_json, line_dir=_new_line_dir(), on_line=on_line)
+        except PodcastScriptInterrupted as e:
+            # The lines synthesized so far belong to the broken script - start over from one whole script
+            log(f"{e}; discarding the partial audio and regenerating from a blocking script")
+            podcast_json = text_to_podcast_json(text, host_voice_id, guest_voice_id)
+            audio_bytes = generate_dialogue_audio(podcast_json, line_dir=_new_line_dir(), on_line=on_line)
         
         log(f"🎧 FULL PROCESS COMPLETED IN {time.time()-total_start:.2f} sec")
         return audio_bytes
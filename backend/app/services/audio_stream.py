@@ -0,0 +1,77 @@
+"""
+Progressive podcast audio: MP3 frames are handed to the HTTP response line by line, in
+dialogue order, while the rest of the podcast is still being synthesized.
+
+Synthesis runs on its own thread and does not depend on the listener - if the client
+disconnects, the podcast is still finished and stored, so the URL returned up front
+(X-Audio-Url) always ends up pointing at the complete file.
+"""
+import time
+import queue
+import threading
+import contextvars
+import traceback
+from .audio_service import podcast_script, iter_dialogue_audio, log
+from .format_service import new_audio_filename, audio_public_url, upload_audio
+from .. import supabase
+
+# Marks the end of the audio in a stream's chunk queue
+_END = object()
+
+
+class PodcastStreamError(RuntimeError):
+    """Raised while streaming when synthesis fails after the response has started."""
+
+
+def start_podcast_stream(text_content, host_voice_id, guest_voice_id, dialogue=None):
+    """
+    Start generating a podcast on a background thread.
+
+    Returns (public_url, chunks): the URL the finished MP3 will be stored at (None
+    without storage) and an iterator of MP3 chunks in playback order. A dialogue
+    ([{"text", "voice_id"}]) can be given to skip script generation. Failures are
+    raised from the iterator: PodcastStreamError wrapping the original exception.
+    """
+    filename = new_audio_filename() if supabase is not None else None
+    public_url = audio_public_url(filename) if filename else None
+    chunks = queue.Queue()
+
+    def producer():
+        start = time.time()
+        parts = []
+        try:
+            # With PODCAST_SCRIPT_STREAMING the first line is synthesized while Gemini writes the rest
+            script = dialogue or podcast_script(text_content, host_voice_id, guest_voice_id)
+            for audio in iter_dialogue_audio(script):
+                parts.append(audio)
+                chunks.put(audio)
+        except Exception as e:
+            log(f"❌ Podcast stream failed: {e}")
+            traceback.print_exc()
+            chunks.put(e)
+            return
+        chunks.put(_END)
+        log(f"Podcast stream synthesized in {time.time() - start:.2f} sec")
+
+        # The listener already has every frame; storing the file doesn't hold up the response
+        if filename is None:
+            log("Warning: no storage configured, streamed podcast was not persisted")
+            return
+        try:
+            upload_audio(b"".join(parts), filename)
+        except Exception as e:
+            log(f"❌ Storing streamed podcast {filename} failed: {e}")
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(producer,), name="podcast-stream", daemon=True).start()
+
+    def iter_chunks():
+        while True:
+            item = chunks.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise PodcastStreamError(str(item)) from item
+            yield item
+
+    return public_url, iter_chunks()
@@ -0,0 +1,218 @@
+"""
+Content-addressed store for uploads, backed by a local SQLite file.
+
+Uploaded files are identified by the SHA-256 of their bytes. For each file hash we keep
+the extracted text and the generated format payloads, keyed by (file hash, format,
+generation parameters), so re-uploading the same document skips extraction, every
+Gemini prompt and the TTS run. Both keys include EXTRACT_MAX_CHARS, so changing the
+extraction budget never serves text (or formats built from it) cut at the old one.
+The text is stored as extracted, before normalization; formats are built from the
+normalized text, so artifact keys also carry the normalization setting (see
+normalization_key), ARTIFACT_VERSION and the Gemini model. The least recently used
+entries of either table are evicted once the store grows past CONTENT_CACHE_MAX_MB.
+"""
+import os
+import json
+import time
+import hashlib
+from ..utils.sqlite_store import get_connection
+from ..utils.text_normalizer import normalization_key
+from .llm_cache import is_bypassed
+from .llm_gateway import DEFAULT_MODEL
+from backend.config import Config
+
+# Bump when a format prompt or payload shape changes, so formats stored by the old code are never served
+ARTIFACT_VERSION = 1
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+_schema_ready = set()
+# Key column of each table, for eviction across both
+_KEY_COLUMNS = {"extracted_text": "file_hash", "artifacts": "artifact_key"}
+
+
+def _conn():
+    path = os.path.join(Config.DATA_DIR, 'content.sqlite3')
+    conn = get_connection(path)
+    if path not in _schema_ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS extracted_text (
+                file_hash TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                artifact_key TEXT PRIMARY KEY,
+                file_hash TEXT NOT NULL,
+                format TEXT NOT NULL,
+                params TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL DEFAULT 0
+            )
+        """)
+        for table in _KEY_COLUMNS:
+            _add_lru_columns(conn, table)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_last_used ON {table} (last_used_at)")
+        _schema_ready.add(path)
+    return conn
+
+
+def _add_lru_columns(conn, table):
+    """Stores created before eviction existed lack the size columns; their rows are evicted first."""
+    columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for column, definition in (("size", "INTEGER NOT NULL DEFAULT 0"), ("last_used_at", "REAL NOT NULL DEFAULT 0")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def hash_bytes(data):
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _text_key(file_hash):
+    return f"{file_hash}:{Config.EXTRACT_MAX_CHARS}"
+
+
+def _artifact_key(file_hash, format_name, params):
+    canonical_params = json.dumps(params or {}, sort_keys=True)
+    canonical = (f"{_text_key(file_hash)}:{normalization_key()}:{format_name}:{canonical_params}"
+                 f":v{ARTIFACT_VERSION}:{DEFAULT_MODEL}")
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def get_cached_text(file_hash):
+    if not Config.CONTENT_CACHE_ENABLED:
+        return None
+    try:
+        conn = _conn()
+        key = _text_key(file_hash)
+        row = conn.execute("SELECT text FROM extracted_text WHERE file_hash = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE extracted_text SET last_used_at = ? WHERE file_hash = ?", (time.time(), key))
+        return row["text"]
+    except Exception as e:
+        print(f"Content store read failed: {e}")
+        return None
+
+
+def cache_text(file_hash, text):
+    if not Config.CONTENT_CACHE_ENABLED or not text or not text.strip():
+        return
+    try:
+        conn = _conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO extracted_text (file_hash, text, size, created_at, last_used_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (_text_key(file_hash), text, len(text.encode('utf-8')), now, now)
+        )
+        _evict(conn)
+    except Exception as e:
+        print(f"Content store write failed: {e}")
+
+
+def get_or_extract_text(file_hash, extract):
+    """Return the cached text for file_hash, or call extract() and cache its result."""
+    text = get_cached_text(file_hash)
+    if text is not None:
+        print(f"Reusing extracted text for {file_hash[:12]}")
+        return text
+    text = extract()
+    cache_text(file_hash, text)
+    return text
+
+
+def get_artifact(file_hash, format_name, params=None):
+    """
+    Return a previously generated payload for (file_hash, format_name, params), or None.
+
+    Requests sent with the LLM cache bypass header always regenerate.
+    """
+    if not Config.CONTENT_CACHE_ENABLED or not file_hash or is_bypassed():
+        return None
+    try:
+        conn = _conn()
+        key = _artifact_key(file_hash, format_name, params)
+        row = conn.execute("SELECT payload FROM artifacts WHERE artifact_key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE artifacts SET last_used_at = ? WHERE artifact_key = ?", (time.time(), key))
+        return json.loads(row["payload"])
+    except Exception as e:
+        print(f"Content store read failed: {e}")
+        return None
+
+
+def put_artifact(file_hash, format_name, payload, params=None):
+    """Store a generated payload. Payloads that carry an error are never stored."""
+    if not Config.CONTENT_CACHE_ENABLED or not file_hash or not is_cacheable(payload):
+        return
+    try:
+        conn = _conn()
+        serialized = json.dumps(payload)
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO artifacts "
+            "(artifact_key, file_hash, format, params, payload, size, created_at, last_used_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                _artifact_key(file_hash, format_name, params),
+                file_hash,
+                format_name,
+                json.dumps(params or {}, sort_keys=True),
+                serialized,
+                len(serialized.encode('utf-8')),
+                now,
+                now
+            )
+        )
+        _evict(conn)
+    except Exception as e:
+        print(f"Content store write failed: {e}")
+
+
+def _evict(conn):
+    """Drop the least recently used texts and artifacts until the store fits CONTENT_CACHE_MAX_MB."""
+    max_bytes = Config.CONTENT_CACHE_MAX_MB * 1024 * 1024
+    total = conn.execute(
+        "SELECT (SELECT COALESCE(SUM(size), 0) FROM extracted_text) "
+        "+ (SELECT COALESCE(SUM(size), 0) FROM artifacts) AS total"
+    ).fetchone()["total"]
+    if total <= max_bytes:
+        return
+    rows = conn.execute(
+        "SELECT 'extracted_text' AS tbl, file_hash AS key, size, last_used_at FROM extracted_text "
+        "UNION ALL SELECT 'artifacts', artifact_key, size, last_used_at FROM artifacts "
+        "ORDER BY last_used_at"
+    ).fetchall()
+    evicted = 0
+    for row in rows:
+        if total <= max_bytes:
+            break
+        conn.execute(f"DELETE FROM {row['tbl']} WHERE {_KEY_COLUMNS[row['tbl']]} = ?", (row["key"],))
+        total -= row["size"]
+        evicted += 1
+    print(f"Content store over {Config.CONTENT_CACHE_MAX_MB} MB, evicted {evicted} least recently used entries")
+
+
+def is_cacheable(payload):
+    if not isinstance(payload, dict) or "error" in payload:
+        return False
+    data = payload.get("data")
+    return not (isinstance(data, dict) and "error" in data)
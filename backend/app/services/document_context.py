@@ -0,0 +1,106 @@
+"""
+Shared document context for the formats generated from one upload.
+
+Every format prompt (mind map, quiz, summary, infographic, flashcards, podcast script)
+is split into the document itself and the format's own instructions. The document part
+is identical for all of them and always comes first, so:
+
+- with Gemini context caching (DOCUMENT_CONTEXT_CACHE_ENABLED, documents of at least
+  DOCUMENT_CONTEXT_MIN_TOKENS), the document is uploaded once as cached content when a
+  second prompt asks for it, and from then on each format request only sends its
+  instructions. A document only one prompt uses is never cached - the extra call and
+  the billed storage would save nothing;
+- otherwise the prompt is sent as one piece, document first. Requests that share this
+  prefix can still be served from Gemini's implicit prefix cache.
+
+Contexts are keyed by the SHA-256 of the document text, so the formats of one upload -
+running on different threads - share the same context and the same cached content.
+"""
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from ..utils.text_normalizer import estimate_tokens
+from .llm_gateway import DEFAULT_MODEL, create_cached_content
+from backend.config import Config
+
+_DOCUMENT_PREFIX = """The document below is the source material for the task that follows it.
+Use ONLY information present in this document.
+
+================= DOCUMENT =================
+{document}
+================= END OF DOCUMENT =================
+"""
+
+# Stop using cached content this long before it expires on Gemini's side
+_EXPIRY_MARGIN_SECONDS = 30
+
+_contexts = OrderedDict()
+_contexts_lock = threading.Lock()
+_CONTEXT_CACHE_SIZE = 16
+
+
+class DocumentContext:
+    """The document part shared by every prompt for one upload."""
+
+    def __init__(self, text, model_name=DEFAULT_MODEL):
+        self.model_name = model_name
+        self.key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        self.prefix = _DOCUMENT_PREFIX.format(document=text)
+        self.tokens = estimate_tokens(text)
+        self._lock = threading.Lock()
+        self._cached = None
+        self._expires_at = 0
+        self._provider_failed = False
+        self._prompts = 0
+
+    def prompt(self, instructions):
+        """The full prompt for a format: the shared document prefix, then its instructions."""
+        return self.prefix + instructions
+
+    def cached_content(self):
+        """
+        Name of the Gemini cached content holding the document, created when the second
+        prompt asks for it; None for the first prompt, when context caching is disabled,
+        the document is too small for it or creation failed. Callers then send
+        prompt(instructions) in full.
+        """
+        if (not Config.DOCUMENT_CONTEXT_CACHE_ENABLED or self._provider_failed
+                or self.tokens < Config.DOCUMENT_CONTEXT_MIN_TOKENS):
+            return None
+        with self._lock:
+            self._prompts += 1
+            if self._prompts < 2:
+                return None
+            if self._cached is None or time.time() >= self._expires_at:
+                try:
+                    start = time.time()
+                    self._cached = create_cached_content(
+                        self.prefix,
+                        Config.DOCUMENT_CONTEXT_TTL_SECONDS,
+                        model=self.model_name,
+                        display_name=f"document-{self.key[:16]}"
+                    )
+                    self._expires_at = start + Config.DOCUMENT_CONTEXT_TTL_SECONDS - _EXPIRY_MARGIN_SECONDS
+                    print(f"Cached document context {self.key[:12]} (~{self.tokens} tokens) "
+                          f"in {time.time() - start:.2f}s")
+                except Exception as e:
+                    print(f"Gemini context caching unavailable, sending the document with each prompt: {e}")
+                    self._provider_failed = True
+                    self._cached = None
+            return self._cached
+
+
+def get_document_context(text, model_name=DEFAULT_MODEL):
+    """Return the shared DocumentContext for text, creating it on first use."""
+    key = (hashlib.sha256(text.encode('utf-8')).hexdigest(), model_name)
+    with _contexts_lock:
+        context = _contexts.get(key)
+        if context is None:
+            context = DocumentContext(text, model_name)
+            _contexts[key] = context
+            while len(_contexts) > _CONTEXT_CACHE_SIZE:
+                _contexts.popitem(last=False)
+        else:
+            _contexts.move_to_end(key)
+    return context
@@ -0,0 +1,291 @@
+import json
+import uuid
+import threading
+import contextvars
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from .ai_service import (
+    generate_mindmap_from_text, generate_summary_from_text, generate_quiz_from_text, generate_formats_from_text
+)
+from .audio_service import generate_podcast_audio
+from .content_store import get_artifact, put_artifact
+from .. import supabase
+from backend.config import Config
+
+
+# Display metadata for each requested format, keyed by the name the frontend sends.
+# "key" is the name the format is stored under in results_content["formats"].
+FORMAT_INFO = {
+    "mindmap": {"key": "visual", "type": "Mind Map", "icon": "🗺️", "error_description": "Error generating mind map"},
+    "audio": {"key": "audio", "type": "Podcast Audio", "icon": "🎙️", "error_description": "Error generating audio content"},
+    "quiz": {"key": "quiz", "type": "Interactive Quiz", "icon": "❓", "error_description": "Error generating quiz"},
+    "reports": {"key": "reports", "type": "Summary Report", "icon": "📄", "error_description": "Error generating summary"},
+}
+
+# Formats that can be generated together in one Gemini call, mapped to their ai_service name
+COMBINED_FORMAT_NAMES = {"mindmap": "mindmap", "quiz": "quiz", "reports": "summary"}
+
+# Process-wide executor shared by every request so the number of formats being
+# generated at once in a worker never exceeds FORMAT_GENERATION_WORKERS.
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, Config.FORMAT_GENERATION_WORKERS),
+                    thread_name_prefix="format-gen"
+                )
+    return _executor
+
+
+def build_mindmap_format(text_content):
+    mindmap_json_string = generate_mindmap_from_text(text_content)
+    print(f"Mind map JSON string: {mindmap_json_string[:200]}...")
+    return mindmap_payload(json.loads(mindmap_json_string))
+
+
+def mindmap_payload(mindmap_data):
+    return {
+        "type": "Mind Map",
+        "description": "Interactive mind map showing key concepts and relationships",
+        "data": mindmap_data,
+        "icon": "🗺️"
+    }
+
+
+AUDIO_BUCKET = "generated-content"
+
+
+def new_audio_filename():
+    return f"audio-{uuid.uuid4()}.mp3"
+
+
+def audio_public_url(filename):
+    return supabase.storage.from_(AUDIO_BUCKET).get_public_url(filename)
+
+
+def upload_audio(audio_bytes, filename):
+    """Store a podcast MP3 in Supabase Storage and return its public URL."""
+    print(f"Uploading audio to Supabase Storage: {filename}")
+    supabase.storage.from_(AUDIO_BUCKET).upload(
+        path=filename,
+        file=audio_bytes,
+        file_options={"content-type": "audio/mpeg"}
+    )
+    public_url = audio_public_url(filename)
+    print(f"Audio uploaded successfully: {public_url}")
+    return public_url
+
+
+def build_audio_format(text_content, host_voice_id, guest_voice_id, on_audio_line=None):
+    print(f"Generating podcast audio with Host: {host_voice_id}, Guest: {guest_voice_id}")
+
+    # Generate podcast audio
+    audio_bytes = generate_podcast_audio(text_content, host_voice_id, guest_voice_id, on_line=on_audio_line)
+
+    # Upload to Supabase Storage
+    public_url = upload_audio(audio_bytes, new_audio_filename())
+
+    # Calculate actual duration from audio bytes using mutagen
+    duration_str = "Unknown"
+    try:
+        from mutagen.mp3 import MP3
+        from io import BytesIO
+        audio_file = BytesIO(audio_bytes)
+        audio_info = MP3(audio_file)
+        actual_duration = audio_info.info.length  # Duration in seconds
+        minutes = int(actual_duration // 60)
+        seconds = int(actual_duration % 60)
+        duration_str = f"{minutes}:{seconds:02d}"
+        print(f"Actual audio duration: {duration_str}")
+    except Exception as duration_error:
+        print(f"Could not determine audio duration: {duration_error}")
+        # Fallback to rough estimate
+        estimated_duration = len(text_content.split()) * 0.5
+        minutes = int(estimated_duration // 60)
+        seconds = int(estimated_duration % 60)
+        duration_str = f"{minutes}:{seconds:02d}" if minutes > 0 else f"0:{seconds:02d}"
+
+    return {
+        "type": "Podcast Audio",
+        "description": "Two-speaker podcast conversation",
+        "url": public_url,
+        "duration": duration_str,
+        "host_voice_id": host_voice_id,
+        "guest_voice_id": guest_voice_id,
+        "icon": "🎙️"
+    }
+
+
+def build_quiz_format(text_content, num_questions=5):
+    return quiz_payload(generate_quiz_from_text(text_content, num_questions))
+
+
+def quiz_payload(quiz_data):
+    print(f"Quiz data generated: {json.dumps(quiz_data, indent=2)[:200]}...")
+    return {
+        "type": "Interactive Quiz",
+        "description": "Test your understanding with AI-generated questions",
+        "data": quiz_data,
+        "questionCount": len(quiz_data.get('questions', [])),
+        "icon": "❓"
+    }
+
+
+def build_reports_format(text_content):
+    return reports_payload(generate_summary_from_text(text_content))
+
+
+def reports_payload(summary_data):
+    print(f"Summary data generated successfully")
+    return {
+        "type": "Summary Report",
+        "description": "Comprehensive summary with key points and examples",
+        "data": summary_data,
+        "icon": "📄"
+    }
+
+
+def _run_combined(text_content, format_names, num_questions, params, file_hash=None, on_progress=None):
+    """
+    Generate several formats with one generate_formats_from_text call and return
+    {format_name: payload}.
+
+    The call and every format built from its result run in this one task, so the
+    combined formats take a single executor slot. If the call fails, each format gets
+    its error payload.
+    """
+    for name in format_names:
+        _report(on_progress, name, "running")
+    try:
+        results = generate_formats_from_text(
+            text_content, [COMBINED_FORMAT_NAMES[name] for name in format_names], num_questions
+        )
+        error = None
+    except Exception as e:
+        results, error = None, e
+
+    payloads = {"mindmap": mindmap_payload, "quiz": quiz_payload, "reports": reports_payload}
+
+    def build(name):
+        if error is not None:
+            raise error
+        return payloads[name](results[COMBINED_FORMAT_NAMES[name]])
+
+    return {
+        name: _run_format(name, build, (name,), params[name], file_hash, on_progress, report_running=False)
+        for name in format_names
+    }
+
+
+def _report(on_progress, format_name, status, payload=None):
+    if on_progress is None:
+        return
+    try:
+        on_progress(format_name, status, payload)
+    except Exception as e:
+        print(f"Progress callback failed for {format_name}: {e}")
+
+
+def _run_format(format_name, builder, args, params, file_hash=None, on_progress=None, report_running=True):
+    """
+    Run a single format builder, turning any failure into that format's error payload.
+
+    When file_hash is given, a payload previously generated for the same document and
+    params is reused instead of calling the builder.
+    """
+    info = FORMAT_INFO[format_name]
+    cached = get_artifact(file_hash, format_name, params)
+    if cached is not None:
+        print(f"=== Reusing cached {format_name.upper()} format ===")
+        _report(on_progress, format_name, "completed", cached)
+        return cached
+
+    print(f"=== Generating {format_name.upper()} format ===")
+    if report_running:
+        _report(on_progress, format_name, "running")
+    try:
+        payload = builder(*args)
+        put_artifact(file_hash, format_name, payload, params)
+        print(f"{format_name} format added to results")
+        _report(on_progress, format_name, "completed", payload)
+        return payload
+    except Exception as e:
+        print(f"Error generating {format_name}: {e}")
+        traceback.print_exc()
+        payload = {
+            "type": info["type"],
+            "description": info["error_description"],
+            "error": str(e),
+            "icon": info["icon"]
+        }
+        _report(on_progress, format_name, "failed", payload)
+        return payload
+
+
+def generate_formats(text_content, requested_formats, host_voice_id=None, guest_voice_id=None, num_questions=5,
+                     on_progress=None, on_audio_line=None, file_hash=None):
+    """
+    Generate every requested format concurrently and return the results_content["formats"] dict.
+
+    Each format runs on the shared format executor, so wall-clock time is bounded by the
+    slowest format rather than the sum of all of them. A failure in one format only
+    produces an error payload for that format.
+
+    on_progress, if given, is called as on_progress(format_name, status, payload) with status
+    "running", "completed" or "failed" from the executor threads; payload is the finished
+    format (or its error payload) once known. on_audio_line(index, total) is forwarded to
+    the podcast generator; total is None until the script's line count is known.
+
+    file_hash identifies the uploaded document in the content store; formats already
+    generated for it with the same parameters are reused. With COMBINED_GENERATION_ENABLED,
+    the remaining mind map, quiz and summary are requested in a single Gemini call.
+    """
+    jobs = {
+        "mindmap": (build_mindmap_format, (text_content,), {}),
+        "audio": (build_audio_format, (text_content, host_voice_id, guest_voice_id, on_audio_line),
+                  {"host_voice_id": host_voice_id, "guest_voice_id": guest_voice_id}),
+        "quiz": (build_quiz_format, (text_content, num_questions), {"num_questions": num_questions}),
+        "reports": (build_reports_format, (text_content,), {}),
+    }
+
+    # Text formats still to be generated are requested together when there are several
+    combined = [
+        name for name in COMBINED_FORMAT_NAMES
+        if name in requested_formats and get_artifact(file_hash, name, jobs[name][2]) is None
+    ]
+    if not (Config.COMBINED_GENERATION_ENABLED and len(combined) > 1):
+        combined = []
+
+    executor = _get_executor()
+    futures = {}
+    combined_future = None
+    if combined:
+        combined_future = executor.submit(
+            contextvars.copy_context().run, _run_combined, text_content, combined, num_questions,
+            {name: jobs[name][2] for name in combined}, file_hash, on_progress
+        )
+    for format_name, (builder, args, params) in jobs.items():
+        if format_name in combined:
+            continue
+        if format_name in requested_formats:
+            # Run in a copy of the caller's context so per-request settings (LLM cache bypass) apply
+            futures[format_name] = executor.submit(
+                contextvars.copy_context().run, _run_format, format_name, builder, args, params, file_hash, on_progress
+            )
+        else:
+            print(f"{format_name} NOT in requested formats: {requested_formats}")
+
+    combined_payloads = combined_future.result() if combined_future is not None else {}
+    formats = {}
+    for format_name in jobs:
+        if format_name in combined_payloads:
+            formats[FORMAT_INFO[format_name]["key"]] = combined_payloads[format_name]
+        elif format_name in futures:
+            formats[FORMAT_INFO[format_name]["key"]] = futures[format_name].result()
+    return formats
@@ -0,0 +1,251 @@
+"""
+Durable background job queue for uploads, backed by a local SQLite file.
+
+Every worker process on the host shares the same database, so a job enqueued by one
+gunicorn worker can be picked up by any other. Running jobs hold a lease, renewed by
+every stage and progress update; if a process dies mid-job the lease expires and another
+worker reclaims it. Updates and the final status are tied to the attempt that holds the
+lease, so a worker whose job was reclaimed can no longer touch it.
+"""
+import os
+import json
+import time
+import uuid
+import threading
+import traceback
+from ..utils.sqlite_store import get_connection
+from ..utils.uploads import remove_spooled
+from backend.config import Config
+
+_workers_started = False
+_workers_lock = threading.Lock()
+_wakeup = threading.Event()
+_schema_ready = set()
+
+
+class LeaseLostError(RuntimeError):
+    """Raised by a job handler whose job was reclaimed by another worker."""
+
+
+def _db_path():
+    return os.path.join(Config.DATA_DIR, 'jobs.sqlite3')
+
+
+def _conn():
+    path = _db_path()
+    conn = get_connection(path)
+    if path not in _schema_ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                progress TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_expires_at REAL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+        _schema_ready.add(path)
+    return conn
+
+
+def upload_spool_dir():
+    """Directory where uploaded files wait for their job to be processed."""
+    path = os.path.join(Config.DATA_DIR, 'uploads')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def enqueue_job(payload, progress=None, job_id=None):
+    """Persist a new queued job and wake a local worker. Returns the job id."""
+    job_id = job_id or str(uuid.uuid4())
+    now = time.time()
+    _conn().execute(
+        "INSERT INTO jobs (id, status, stage, payload, progress, created_at, updated_at) "
+        "VALUES (?, 'queued', 'queued', ?, ?, ?, ?)",
+        (job_id, json.dumps(payload), json.dumps(progress or {}), now, now)
+    )
+    _wakeup.set()
+    return job_id
+
+
+def get_job(job_id):
+    """Return the public view of a job, or None if it does not exist."""
+    row = _conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    return {
+        "id": row["id"],
+        "status": row["status"],
+        "stage": row["stage"],
+        "progress": json.loads(row["progress"]),
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "attempts": row["attempts"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"]
+    }
+
+
+def _update_running(conn, job_id, attempt, assignments, params=()):
+    """Apply assignments to a running job and renew its lease, if attempt still holds it. Returns whether it did."""
+    now = time.time()
+    cursor = conn.execute(
+        f"UPDATE jobs SET {assignments}lease_expires_at = ?, updated_at = ? "
+        "WHERE id = ? AND attempts = ? AND status = 'running'",
+        (*params, now + Config.JOB_LEASE_SECONDS, now, job_id, attempt)
+    )
+    return cursor.rowcount > 0
+
+
+def renew_lease(job_id, attempt):
+    """Heartbeat for long steps: extend attempt's lease. Returns False if the job was reclaimed."""
+    return _update_running(_conn(), job_id, attempt, "")
+
+
+def holds_lease(job_id, attempt):
+    row = _conn().execute(
+        "SELECT 1 FROM jobs WHERE id = ? AND attempts = ? AND status = 'running'", (job_id, attempt)
+    ).fetchone()
+    return row is not None
+
+
+def set_job_stage(job_id, attempt, stage):
+    """Record the stage a job has reached and renew its lease. Returns False if the job was reclaimed."""
+    return _update_running(_conn(), job_id, attempt, "stage = ?, ", (stage,))
+
+
+def set_format_progress(job_id, attempt, format_name, status):
+    """
+    Record the status of one format ("running", "completed", "failed") for a job and renew
+    its lease. Returns False if the job was reclaimed.
+    """
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT progress FROM jobs WHERE id = ? AND attempts = ? AND status = 'running'", (job_id, attempt)
+        ).fetchone()
+        if row is not None:
+            progress = json.loads(row["progress"])
+            progress[format_name] = status
+            _update_running(conn, job_id, attempt, "progress = ?, ", (json.dumps(progress),))
+        conn.execute("COMMIT")
+        return row is not None
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _finish_job(job_id, attempt, status, result=None, error=None):
+    """Store the outcome of attempt. Returns False (and changes nothing) if the job was reclaimed."""
+    cursor = _conn().execute(
+        "UPDATE jobs SET status = ?, stage = 'done', result = ?, error = ?, lease_expires_at = NULL, updated_at = ? "
+        "WHERE id = ? AND attempts = ? AND status = 'running'",
+        (status, json.dumps(result) if result is not None else None, error, time.time(), job_id, attempt)
+    )
+    return cursor.rowcount > 0
+
+
+def _claim_next_job():
+    """
+    Atomically take the oldest queued job (or one whose lease expired).
+    Returns (id, payload, attempt) or None; attempt identifies this claim's lease.
+
+    Jobs that already used up JOB_MAX_ATTEMPTS are marked failed, their spooled upload is
+    removed, and the next job is claimed instead.
+    """
+    conn = _conn()
+    while True:
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, payload, attempts FROM jobs "
+                "WHERE status = 'queued' OR (status = 'running' AND lease_expires_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            payload = json.loads(row["payload"])
+            exhausted = row["attempts"] >= Config.JOB_MAX_ATTEMPTS
+            if exhausted:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', stage = 'done', error = ?, lease_expires_at = NULL, updated_at = ? "
+                    "WHERE id = ?",
+                    ("Job did not finish after the maximum number of attempts", now, row["id"])
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_expires_at = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (now + Config.JOB_LEASE_SECONDS, now, row["id"])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if not exhausted:
+            return row["id"], payload, row["attempts"] + 1
+        print(f"Job {row['id']} failed after {row['attempts']} attempts")
+        if payload.get("file_path"):
+            remove_spooled(payload["file_path"])
+
+
+def _worker_loop(handler):
+    while True:
+        try:
+            claimed = _claim_next_job()
+        except Exception as e:
+            print(f"Job queue error while claiming job: {e}")
+            claimed = None
+
+        if claimed is None:
+            # Wake up early when this process enqueues; poll for jobs from other processes
+            _wakeup.wait(timeout=1.0)
+            _wakeup.clear()
+            continue
+
+        job_id, payload, attempt = claimed
+        print(f"=== JOB {job_id} STARTED (attempt {attempt}) ===")
+        try:
+            result = handler(job_id, payload, attempt)
+            if _finish_job(job_id, attempt, "completed", result=result):
+                print(f"=== JOB {job_id} COMPLETED ===")
+            else:
+                print(f"Job {job_id} attempt {attempt} finished after its lease was lost, result discarded")
+        except LeaseLostError as e:
+            print(f"Job {job_id} attempt {attempt} abandoned: {e}")
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            traceback.print_exc()
+            _finish_job(job_id, attempt, "failed", error=str(e))
+
+
+def start_job_workers(handler):
+    """
+    Start Config.JOB_WORKERS daemon threads in this process that run handler(job_id, payload, attempt).
+
+    The handler should report progress through set_job_stage / set_format_progress (or call
+    renew_lease) more often than every JOB_LEASE_SECONDS, and raise LeaseLostError once they
+    report the job was reclaimed.
+    """
+    global _workers_started
+    with _workers_lock:
+        if _workers_started or Config.JOB_WORKERS <= 0:
+            return
+        for i in range(Config.JOB_WORKERS):
+            thread = threading.Thread(target=_worker_loop, args=(handler,), name=f"job-worker-{i}", daemon=True)
+            thread.start()
+        _workers_started = True
+        print(f"Started {Config.JOB_WORKERS} background job workers")
@@ -0,0 +1,217 @@
+"""
+Persistent cache of Gemini responses, backed by a local SQLite file.
+
+Responses are keyed by (model, prompt hash, generation config), so an identical prompt -
+a re-upload, a frontend retry, /infographic/generate followed by /generate-data - is
+answered from disk instead of a 10-30 s model call. Entries expire after
+LLM_CACHE_TTL_SECONDS and the least recently used ones are evicted once the cache grows
+past LLM_CACHE_MAX_MB. Hit/miss counters are kept in the same file so they cover every
+worker process.
+
+Sending the X-LLM-Cache: bypass header skips the lookup for that request (a fresh
+response is still stored).
+"""
+import os
+import json
+import time
+import hashlib
+import contextvars
+from ..utils.sqlite_store import get_connection
+from backend.config import Config
+
+BYPASS_HEADER = "X-LLM-Cache"
+
+_bypass = contextvars.ContextVar("llm_cache_bypass", default=False)
+_schema_ready = set()
+
+
+def _conn():
+    path = os.path.join(Config.DATA_DIR, 'llm_cache.sqlite3')
+    conn = get_connection(path)
+    if path not in _schema_ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses (last_used_at)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        _schema_ready.add(path)
+    return conn
+
+
+def bypass_requested(headers):
+    return headers.get(BYPASS_HEADER, '').lower() in ('bypass', 'no-cache', 'off')
+
+
+def set_bypass(enabled):
+    """Set whether the current request (or job) skips cache lookups. Returns a reset token."""
+    return _bypass.set(bool(enabled))
+
+
+def is_bypassed():
+    return _bypass.get()
+
+
+def cache_key(model, prompt, config=None):
+    prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+    canonical = json.dumps({"model": model, "prompt": prompt_hash, "config": config}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _count(conn, name):
+    conn.execute(
+        "INSERT INTO llm_cache_counters (name, value) VALUES (?, 1) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+        (name,)
+    )
+
+
+def increment_counter(name):
+    """Bump a named counter shared by all worker processes (also used for structured-output stats)."""
+    try:
+        _count(_conn(), name)
+    except Exception as e:
+        print(f"Failed to update counter {name}: {e}")
+
+
+def get_counters():
+    return {row["name"]: row["value"] for row in _conn().execute("SELECT name, value FROM llm_cache_counters")}
+
+
+def get_cached_response(key):
+    conn = _conn()
+    now = time.time()
+    row = conn.execute("SELECT response, created_at FROM llm_responses WHERE cache_key = ?", (key,)).fetchone()
+    if row is not None and now - row["created_at"] > Config.LLM_CACHE_TTL_SECONDS:
+        conn.execute("DELETE FROM llm_responses WHERE cache_key = ?", (key,))
+        row = None
+    if row is None:
+        _count(conn, "misses")
+        return None
+    conn.execute("UPDATE llm_responses SET last_used_at = ? WHERE cache_key = ?", (now, key))
+    _count(conn, "hits")
+    return row["response"]
+
+
+def put_cached_response(key, model, response):
+    conn = _conn()
+    now = time.time()
+    conn.execute(
+        "INSERT OR REPLACE INTO llm_responses (cache_key, model, response, size, created_at, last_used_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (key, model, response, len(response.encode('utf-8')), now, now)
+    )
+    _evict(conn)
+
+
+def _evict(conn):
+    """Drop expired entries, then least recently used ones until the cache fits LLM_CACHE_MAX_MB."""
+    conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (time.time() - Config.LLM_CACHE_TTL_SECONDS,))
+    max_bytes = Config.LLM_CACHE_MAX_MB * 1024 * 1024
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) AS total FROM llm_responses").fetchone()["total"]
+    if total <= max_bytes:
+        return
+    evicted = 0
+    for row in conn.execute("SELECT cache_key, size FROM llm_responses ORDER BY last_used_at").fetchall():
+        if total <= max_bytes:
+            break
+        conn.execute("DELETE FROM llm_responses WHERE cache_key = ?", (row["cache_key"],))
+        total -= row["size"]
+        evicted += 1
+    print(f"LLM cache over {Config.LLM_CACHE_MAX_MB} MB, evicted {evicted} least recently used responses")
+
+
+def cached_generate(model, prompt, generate, config=None, is_valid=None):
+    """
+    Return the response text for prompt, calling generate() only on a cache miss.
+
+    config is whatever generation settings affect the output (it is part of the key).
+    A fresh response is stored only if it is non-empty and is_valid(text), when given,
+    returns True - malformed responses are never replayed.
+    """
+    if not Config.LLM_CACHE_ENABLED:
+        return generate()
+
+    key = cache_key(model, prompt, config)
+    if not is_bypassed():
+        try:
+            cached = get_cached_response(key)
+            if cached is not None:
+                print(f"LLM cache hit for {model} ({len(cached)} chars)")
+                return cached
+        except Exception as e:
+            print(f"LLM cache read failed: {e}")
+
+    text = generate()
+    if text and (is_valid is None or is_valid(text)):
+        try:
+            put_cached_response(key, model, text)
+        except Exception as e:
+            print(f"LLM cache write failed: {e}")
+    return text
+
+
+def cached_generate_stream(model, prompt, generate_stream, config=None, is_valid=None):
+    """
+    cached_generate() for a streamed response: yield the response text in pieces, as
+    generate_stream() produces them on a miss, or all at once on a hit.
+
+    The full response is stored (under the same rules) once the stream has been consumed
+    to the end, so a streamed and a blocking call for the same prompt share an entry.
+    """
+    if not Config.LLM_CACHE_ENABLED:
+        yield from generate_stream()
+        return
+
+    key = cache_key(model, prompt, config)
+    if not is_bypassed():
+        try:
+            cached = get_cached_response(key)
+        except Exception as e:
+            print(f"LLM cache read failed: {e}")
+            cached = None
+        if cached is not None:
+            print(f"LLM cache hit for {model} ({len(cached)} chars)")
+            yield cached
+            return
+
+    pieces = []
+    for piece in generate_stream():
+        pieces.append(piece)
+        yield piece
+    text = "".join(pieces)
+    if text and (is_valid is None or is_valid(text)):
+        try:
+            put_cached_response(key, model, text)
+        except Exception as e:
+            print(f"LLM cache write failed: {e}")
+
+
+def cache_stats():
+    """Hit/miss counters (across all worker processes) and the current cache size."""
+    conn = _conn()
+    counters = get_counters()
+    usage = conn.execute("SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes FROM llm_responses").fetchone()
+    hits = counters.get("hits", 0)
+    misses = counters.get("misses", 0)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "entries": usage["entries"],
+        "bytes": usage["bytes"],
+        "max_bytes": Config.LLM_CACHE_MAX_MB * 1024 * 1024,
+        "ttl_seconds": Config.LLM_CACHE_TTL_SECONDS,
+    }
@@ -0,0 +1,127 @@
+"""
+Process-wide gateway for every Gemini call.
+
+All generators (ai_service, the podcast script in audio_service, document context
+caching) go through this module instead of building their own SDK objects. It holds a
+single google.genai Client per worker process, created on first use, whose HTTP clients
+keep connections alive and pool them (LLM_MAX_CONNECTIONS), so consecutive calls skip the
+TCP/TLS handshake. Every request gets the LLM_TIMEOUT_SECONDS timeout.
+
+generate() is the blocking call used from request and executor threads; agenerate() is
+the same call for asyncio code and shares the client's async connection pool, and
+generate_stream() yields the response text as it is produced. All of them wait for the
+shared rate limiter and retry on 429/5xx (see rate_limiter).
+"""
+import copy
+import threading
+import httpx
+from google import genai
+from google.genai import types
+from .rate_limiter import call_with_retries, call_with_retries_async
+from ..fakes import fake_backend_enabled
+from ..utils.text_normalizer import estimate_tokens
+from backend.config import Config
+
+DEFAULT_MODEL = 'gemini-2.5-flash'
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _http_options():
+    limits = httpx.Limits(
+        max_connections=Config.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=Config.LLM_MAX_CONNECTIONS,
+        keepalive_expiry=Config.LLM_KEEPALIVE_SECONDS
+    )
+    return types.HttpOptions(
+        timeout=int(Config.LLM_TIMEOUT_SECONDS * 1000),  # milliseconds
+        client_args={"limits": limits},
+        async_client_args={"limits": limits}
+    )
+
+
+def get_client():
+    """The worker's shared google.genai Client."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if fake_backend_enabled("gemini"):
+                    from ..fakes.gemini import FakeGeminiClient
+                    print("Using the local fake Gemini backend")
+                    _client = FakeGeminiClient()
+                    return _client
+                if not Config.GEMINI_API_KEY:
+                    raise ValueError("GEMINI_API_KEY environment variable is not set")
+                _client = genai.Client(api_key=Config.GEMINI_API_KEY, http_options=_http_options())
+    return _client
+
+
+def _request_config(config, cached_content):
+    # The SDK normalizes the schema in place, so give it its own copy
+    config = copy.deepcopy(config) if config else {}
+    if cached_content:
+        config["cached_content"] = cached_content
+    return config or None
+
+
+def generate(contents, model=DEFAULT_MODEL, config=None, cached_content=None):
+    """
+    Call Gemini and return the response text ('' if there is none).
+
+    config is a GenerateContentConfig dict (e.g. from llm_schemas.json_generation_config);
+    cached_content is the name of cached content to prepend (see create_cached_content).
+    """
+    response = call_with_retries(
+        "gemini",
+        lambda: get_client().models.generate_content(
+            model=model, contents=contents, config=_request_config(config, cached_content)
+        ),
+        cost=estimate_tokens(contents)
+    )
+    return response.text or ''
+
+
+def generate_stream(contents, model=DEFAULT_MODEL, config=None, cached_content=None):
+    """
+    Call Gemini with a streamed response and yield the text as it arrives.
+
+    Retries like generate() until the first piece has arrived. A failure after that is
+    raised to the caller, who has already consumed part of the response.
+    """
+    def open_stream():
+        stream = iter(get_client().models.generate_content_stream(
+            model=model, contents=contents, config=_request_config(config, cached_content)
+        ))
+        return stream, next(stream, None)
+
+    stream, first = call_with_retries("gemini", open_stream, cost=estimate_tokens(contents))
+    if first is None:
+        return
+    if first.text:
+        yield first.text
+    for chunk in stream:
+        if chunk.text:
+            yield chunk.text
+
+
+async def agenerate(contents, model=DEFAULT_MODEL, config=None, cached_content=None):
+    """generate() for asyncio code."""
+    response = await call_with_retries_async(
+        "gemini",
+        lambda: get_client().aio.models.generate_content(
+            model=model, contents=contents, config=_request_config(config, cached_content)
+        ),
+        cost=estimate_tokens(contents)
+    )
+    return response.text or ''
+
+
+def create_cached_content(contents, ttl_seconds, model=DEFAULT_MODEL, display_name=None):
+    """Store contents in Gemini's context cache for ttl_seconds and return the cache name."""
+    config = {"contents": contents, "ttl": f"{int(ttl_seconds)}s", "display_name": display_name}
+    cached = call_with_retries(
+        "gemini", lambda: get_client().caches.create(model=model, config=config), cost=estimate_tokens(contents)
+    )
+    return cached.name
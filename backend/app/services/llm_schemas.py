@@ -0,0 +1,374 @@
+"""
+Response schemas for Gemini's JSON mode, and local validation/repair of the results.
+
+Each generator sends one of these schemas as response_schema, so the model returns
+JSON of the right shape in the first place. What comes back is still checked against
+the same schema: a field of the wrong type, a missing required field or an invalid
+list item is repaired (or dropped) on its own, so one bad sub-tree never costs a full
+re-prompt. The format-specific repair functions then fix what a schema can't express,
+such as a quiz answer that isn't one of its options.
+"""
+import copy
+from .llm_cache import increment_counter, get_counters
+
+INFOGRAPHIC_ICONS = [
+    "Lightbulb", "Target", "BookOpen", "Sparkles", "CheckCircle", "Brain", "Zap", "Award", "TrendingUp", "Users"
+]
+INFOGRAPHIC_BLOCK_TYPES = ["hero", "split-stat", "key-point", "comparison", "conclusion"]
+
+# Gemini schemas can't be recursive, so the mind map is spelled out to a fixed depth
+_MINDMAP_DEPTH = 4
+
+
+def _string():
+    return {"type": "STRING"}
+
+
+def _object(properties, required=None):
+    schema = {"type": "OBJECT", "properties": properties}
+    if required:
+        schema["required"] = required
+    return schema
+
+
+def _array(items):
+    return {"type": "ARRAY", "items": items}
+
+
+def _mindmap_node(depth):
+    properties = {"topic": _string(), "summary": _string(), "definition": _string()}
+    if depth > 1:
+        properties["children"] = _array(_mindmap_node(depth - 1))
+    return _object(properties, ["topic"])
+
+
+_STAT = _object({"label": _string(), "value": _string(), "description": _string()}, ["label", "value"])
+_SIDE = _object({"label": _string(), "points": _array(_string())}, ["label", "points"])
+
+MINDMAP_SCHEMA = _object({"root": _mindmap_node(_MINDMAP_DEPTH)}, ["root"])
+
+SUMMARY_SCHEMA = _object({
+    "title": _string(),
+    "summary": _string(),
+    "key_points": _array(_string()),
+    "detailed_explanation": _string(),
+    "example": _string(),
+    "conclusion": _string(),
+}, ["title", "summary", "key_points", "detailed_explanation", "example", "conclusion"])
+
+QUIZ_SCHEMA = _object({
+    "quiz_type": _string(),
+    "questions": _array(_object({
+        "question": _string(),
+        "options": _array(_string()),
+        "answer": _string(),
+    }, ["question", "options", "answer"])),
+}, ["quiz_type", "questions"])
+
+INFOGRAPHIC_SCHEMA = _object({
+    "theme": _string(),
+    "title": _string(),
+    "subtitle": _string(),
+    "progressSteps": _array(_string()),
+    "blocks": _array(_object({
+        "type": {"type": "STRING", "enum": INFOGRAPHIC_BLOCK_TYPES},
+        "title": _string(),
+        "content": _string(),
+        "description": _string(),
+        "icon": {"type": "STRING", "enum": INFOGRAPHIC_ICONS},
+        "stat1": _STAT,
+        "stat2": _STAT,
+        "left": _SIDE,
+        "right": _SIDE,
+    }, ["type"])),
+    "stats": _array(_object({"label": _string(), "value": _string()}, ["label", "value"])),
+    "key_points": _array(_object({"title": _string(), "description": _string()}, ["title", "description"])),
+    "conclusion": _string(),
+}, ["title", "subtitle", "progressSteps", "blocks", "stats", "key_points", "conclusion"])
+
+FLASHCARDS_SCHEMA = _object({
+    "flashcards": _array(_object({"term": _string(), "definition": _string()}, ["term", "definition"])),
+}, ["flashcards"])
+
+PODCAST_DIALOGUE_SCHEMA = _array(_object({"text": _string(), "voice_id": _string()}, ["text", "voice_id"]))
+
+
+def combined_schema(schemas):
+    """Schema for one response holding several formats, e.g. {"quiz": QUIZ_SCHEMA, ...}."""
+    return _object(dict(schemas), list(schemas))
+
+
+def json_generation_config(schema):
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+
+# --- Validation and local repair ---
+
+_DEFAULTS = {"STRING": "", "ARRAY": list, "OBJECT": dict, "INTEGER": 0, "NUMBER": 0, "BOOLEAN": False}
+
+
+class _Invalid(Exception):
+    """A value can't be made to fit its schema; the enclosing list drops it."""
+
+
+def _default(schema):
+    default = _DEFAULTS[schema["type"]]
+    if callable(default):
+        return conform(default(), schema, "", [])
+    return default
+
+
+def conform(value, schema, path="$", repairs=None):
+    """
+    Return value coerced to schema, recording a description of every fix in repairs.
+
+    Objects get missing required fields filled with empty values and wrong-typed fields
+    repaired; list items that can't be repaired are dropped. Raises _Invalid when value
+    itself is unusable (e.g. a string where an object is expected).
+    """
+    if repairs is None:
+        repairs = []
+    kind = schema["type"]
+
+    if kind == "OBJECT":
+        if not isinstance(value, dict):
+            raise _Invalid(f"{path}: expected object")
+        for name, field_schema in schema.get("properties", {}).items():
+            field_path = f"{path}.{name}"
+            if name not in value or value[name] is None:
+                if name in schema.get("required", []):
+                    value[name] = _default(field_schema)
+                    repairs.append(f"{field_path}: missing")
+                continue
+            try:
+                value[name] = conform(value[name], field_schema, field_path, repairs)
+            except _Invalid as e:
+                if name not in schema.get("required", []):
+                    del value[name]
+                elif "enum" in field_schema:
+                    # e.g. an infographic block of unknown type - the whole object is unusable
+                    raise
+                else:
+                    value[name] = _default(field_schema)
+                repairs.append(str(e))
+        return value
+
+    if kind == "ARRAY":
+        if isinstance(value, (str, dict)) and schema["items"]["type"] != "ARRAY":
+            value = [value]
+            repairs.append(f"{path}: wrapped single item in a list")
+        if not isinstance(value, list):
+            raise _Invalid(f"{path}: expected array")
+        items = []
+        for index, item in enumerate(value):
+            try:
+                items.append(conform(item, schema["items"], f"{path}[{index}]", repairs))
+            except _Invalid as e:
+                repairs.append(f"{e} (dropped)")
+        return items
+
+    if kind == "STRING":
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+            repairs.append(f"{path}: number converted to string")
+        if not isinstance(value, str):
+            raise _Invalid(f"{path}: expected string")
+        if "enum" in schema and value not in schema["enum"]:
+            matches = [option for option in schema["enum"] if option.lower() == value.strip().lower()]
+            if not matches:
+                raise _Invalid(f"{path}: {value!r} is not one of {', '.join(schema['enum'])}")
+            value = matches[0]
+            repairs.append(f"{path}: case of {value!r} corrected")
+        return value
+
+    return value
+
+
+def _repair_mindmap(data, repairs, **_):
+    # Also walks nodes nested deeper than the schema spells out, so types are checked here too
+    def fix_node(node, path):
+        topic = node.get("topic")
+        if not isinstance(topic, str) or not topic.strip():
+            fallback = node.get("summary") or node.get("definition")
+            node["topic"] = fallback.split(".")[0][:60] if isinstance(fallback, str) and fallback else "Untitled"
+            repairs.append(f"{path}.topic: empty")
+        children = node.get("children", [])
+        if not isinstance(children, list):
+            children = []
+            repairs.append(f"{path}.children: expected array")
+        node["children"] = [child for child in children if isinstance(child, dict)]
+        for index, child in enumerate(node["children"]):
+            fix_node(child, f"{path}.children[{index}]")
+    fix_node(data["root"], "$.root")
+    return data
+
+
+def _repair_quiz(data, repairs, num_questions=None, **_):
+    questions = []
+    for index, question in enumerate(data["questions"]):
+        path = f"$.questions[{index}]"
+        options = [option for option in question["options"] if option.strip()]
+        answer = question["answer"].strip()
+        if answer not in options:
+            # Answers given as a letter ("B"), an index or with different case/spacing
+            letters = {chr(ord("a") + i): option for i, option in enumerate(options)}
+            matches = [option for option in options if option.strip().lower() == answer.lower()]
+            if matches:
+                answer = matches[0]
+            elif answer.lower().rstrip(").") in letters:
+                answer = letters[answer.lower().rstrip(").")]
+            elif answer.isdigit() and 0 <= int(answer) < len(options):
+                answer = options[int(answer)]
+            else:
+                repairs.append(f"{path}: answer not among the options (dropped)")
+                continue
+            repairs.append(f"{path}.answer: matched to an option")
+        if not question["question"].strip() or len(options) < 2:
+            repairs.append(f"{path}: incomplete question (dropped)")
+            continue
+        questions.append({**question, "options": options, "answer": answer})
+    if num_questions and len(questions) > num_questions:
+        repairs.append(f"$.questions: {len(questions) - num_questions} extra questions (dropped)")
+        questions = questions[:num_questions]
+    data["questions"] = questions
+    data["quiz_type"] = "mcq"
+    if not questions:
+        raise _Invalid("$.questions: no usable questions")
+    if num_questions and len(questions) < num_questions:
+        raise _Invalid(f"$.questions: {len(questions)} usable questions, {num_questions} requested")
+    return data
+
+
+def _repair_summary(data, repairs, **_):
+    if not data["title"].strip() and not data["summary"].strip():
+        raise _Invalid("$: empty summary")
+    data["key_points"] = [point for point in data["key_points"] if point.strip()]
+    return data
+
+
+def _repair_infographic(data, repairs, **_):
+    if not data["blocks"]:
+        raise _Invalid("$.blocks: no blocks")
+    if not data["title"].strip():
+        data["title"] = "Infographic"
+        repairs.append("$.title: empty")
+    if not data["subtitle"].strip():
+        data["subtitle"] = "Generated Summary"
+    data.setdefault("theme", "modern_educational")
+    return data
+
+
+def _repair_flashcards(data, repairs, **_):
+    data["flashcards"] = [card for card in data["flashcards"] if card["term"].strip() and card["definition"].strip()]
+    return data
+
+
+def _repair_dialogue_line(line, index, previous_voice_id, voices, repairs):
+    """The line with its voice fixed, or None if it should be dropped."""
+    if not line["text"].strip():
+        repairs.append(f"$[{index}]: empty line (dropped)")
+        return None
+    if voices and line["voice_id"] not in voices:
+        # Keep the back-and-forth: give the line to whoever didn't speak last
+        previous = previous_voice_id or voices[-1]
+        line["voice_id"] = voices[0] if previous != voices[0] or len(voices) == 1 else voices[1]
+        repairs.append(f"$[{index}].voice_id: unknown voice")
+    return line
+
+
+def _repair_dialogue(lines, repairs, host_voice_id=None, guest_voice_id=None):
+    voices = [voice for voice in (host_voice_id, guest_voice_id) if voice]
+    dialogue = []
+    for index, line in enumerate(lines):
+        line = _repair_dialogue_line(line, index, dialogue[-1]["voice_id"] if dialogue else None, voices, repairs)
+        if line is not None:
+            dialogue.append(line)
+    if not dialogue:
+        raise _Invalid("$: empty dialogue")
+    return dialogue
+
+
+# kind -> (schema, format-specific repair)
+STRUCTURED_OUTPUTS = {
+    "mindmap": (MINDMAP_SCHEMA, _repair_mindmap),
+    "summary": (SUMMARY_SCHEMA, _repair_summary),
+    "quiz": (QUIZ_SCHEMA, _repair_quiz),
+    "infographic": (INFOGRAPHIC_SCHEMA, _repair_infographic),
+    "flashcards": (FLASHCARDS_SCHEMA, _repair_flashcards),
+    "podcast_dialogue": (PODCAST_DIALOGUE_SCHEMA, _repair_dialogue),
+}
+
+
+def validate_output(kind, data, **context):
+    """
+    Validate and locally repair a parsed response of the given kind.
+
+    Returns the repaired data, or None if nothing usable is left (the caller may then
+    fall back to another call). context is passed to the format-specific repair, e.g.
+    the podcast voice ids or the quiz's num_questions.
+    """
+    schema, repair = STRUCTURED_OUTPUTS[kind]
+    increment_counter("structured_responses")
+    repairs = []
+    try:
+        data = repair(conform(data, schema, "$", repairs), repairs, **context)
+    except _Invalid as e:
+        repairs.append(str(e))
+        data = None
+    if repairs:
+        increment_counter("structured_repairs")
+        print(f"Repaired {kind} response locally: {'; '.join(repairs[:5])}" + (" ..." if len(repairs) > 5 else ""))
+    return data
+
+
+def is_usable(kind, data, **context):
+    """Whether validate_output would return a result for data, without counting or logging it."""
+    schema, repair = STRUCTURED_OUTPUTS[kind]
+    try:
+        repair(conform(copy.deepcopy(data), schema, "$", []), [], **context)
+        return True
+    except _Invalid:
+        return False
+
+
+def iter_valid_dialogue(items, host_voice_id=None, guest_voice_id=None):
+    """
+    validate_output("podcast_dialogue", ...) for a dialogue decoded item by item from a
+    streamed response: yields each usable line, repaired, as soon as it arrives.
+    """
+    schema = PODCAST_DIALOGUE_SCHEMA["items"]
+    voices = [voice for voice in (host_voice_id, guest_voice_id) if voice]
+    increment_counter("structured_responses")
+    repairs = []
+    previous_voice_id = None
+    for index, item in enumerate(items):
+        try:
+            line = conform(item, schema, f"$[{index}]", repairs)
+        except _Invalid as e:
+            repairs.append(str(e))
+            continue
+        line = _repair_dialogue_line(line, index, previous_voice_id, voices, repairs)
+        if line is not None:
+            previous_voice_id = line["voice_id"]
+            yield line
+    if repairs:
+        increment_counter("structured_repairs")
+        print(f"Repaired podcast_dialogue response locally: {'; '.join(repairs[:5])}" + (" ..." if len(repairs) > 5 else ""))
+
+
+def record_retry(kind):
+    """Count a full re-prompt - only made when a response isn't parseable JSON at all."""
+    increment_counter("structured_retries")
+    print(f"Unparseable {kind} response, retrying once")
+
+
+def structured_output_stats():
+    counters = get_counters()
+    responses = counters.get("structured_responses", 0)
+    retries = counters.get("structured_retries", 0)
+    return {
+        "responses": responses,
+        "repaired": counters.get("structured_repairs", 0),
+        "retries": retries,
+        "retry_rate": round(retries / responses, 4) if responses else 0.0,
+    }
@@ -0,0 +1,222 @@
+"""
+Rate limiting and 429-aware retries for the external APIs (Gemini, ElevenLabs).
+
+Every gunicorn worker draws from the same token buckets, kept in a local SQLite file, so
+together they stay under the provider quota instead of each discovering it through 429s.
+Each service has two buckets refilled continuously over a minute: one for requests and
+one for tokens (Gemini) or characters (ElevenLabs). A call waits until both have room.
+
+A call that fails with 429 or a 5xx is retried with jittered exponential backoff. A
+Retry-After (or Gemini retryDelay) from the provider is honored, and after a 429 the
+whole service is paused for every worker, not just the thread that got it.
+"""
+import os
+import re
+import time
+import random
+import asyncio
+import email.utils
+from datetime import timezone
+import httpx
+from ..utils.sqlite_store import get_connection
+from backend.config import Config
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+_RETRY_DELAY = re.compile(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s")
+_schema_ready = set()
+
+
+class RateLimitTimeout(Exception):
+    """A call could not get through the limiter within RATE_LIMIT_MAX_WAIT_SECONDS."""
+
+
+def _limits():
+    # service -> ((bucket suffix, per-minute limit), ...); a limit of 0 disables that bucket
+    return {
+        "gemini": (("requests", Config.GEMINI_REQUESTS_PER_MINUTE), ("tokens", Config.GEMINI_TOKENS_PER_MINUTE)),
+        "elevenlabs": (("requests", Config.ELEVENLABS_REQUESTS_PER_MINUTE),
+                       ("characters", Config.ELEVENLABS_CHARACTERS_PER_MINUTE)),
+    }
+
+
+def _conn():
+    path = os.path.join(Config.DATA_DIR, 'rate_limits.sqlite3')
+    conn = get_connection(path)
+    if path not in _schema_ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_pauses (
+                service TEXT PRIMARY KEY,
+                until REAL NOT NULL
+            )
+        """)
+        _schema_ready.add(path)
+    return conn
+
+
+def _try_acquire(service, cost):
+    """
+    Take one request and `cost` tokens/characters from the service's buckets.
+
+    Returns 0 on success, otherwise the seconds to wait before trying again; nothing is
+    taken unless every bucket has room, so a waiting call never holds part of the quota.
+    """
+    buckets = [(f"{service}:{suffix}", limit, 1 if suffix == "requests" else cost)
+               for suffix, limit in _limits()[service] if limit > 0]
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        now = time.time()
+        pause = conn.execute("SELECT until FROM rate_pauses WHERE service = ?", (service,)).fetchone()
+        if pause is not None and pause["until"] > now:
+            return pause["until"] - now
+
+        levels = []
+        wait = 0.0
+        for name, limit, amount in buckets:
+            # Per-minute limit: a full minute's worth can be spent at once, refilled evenly
+            rate = limit / 60.0
+            amount = min(amount, limit)
+            row = conn.execute("SELECT tokens, updated_at FROM rate_buckets WHERE name = ?", (name,)).fetchone()
+            tokens = limit if row is None else min(limit, row["tokens"] + (now - row["updated_at"]) * rate)
+            if tokens < amount:
+                wait = max(wait, (amount - tokens) / rate)
+            levels.append((name, tokens - amount))
+        if wait:
+            return wait
+        conn.executemany(
+            "INSERT OR REPLACE INTO rate_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+            [(name, tokens, now) for name, tokens in levels]
+        )
+        return 0
+    finally:
+        conn.execute("COMMIT")
+
+
+def pause_service(service, seconds):
+    """Hold back every worker's calls to service for the given number of seconds."""
+    until = time.time() + seconds
+    _conn().execute(
+        "INSERT INTO rate_pauses (service, until) VALUES (?, ?) "
+        "ON CONFLICT(service) DO UPDATE SET until = MAX(until, excluded.until)",
+        (service, until)
+    )
+
+
+def _acquire_wait(service, cost, waited):
+    """Seconds to sleep before the next acquire attempt (0 once acquired)."""
+    if not Config.RATE_LIMIT_ENABLED:
+        return 0
+    wait = _try_acquire(service, cost)
+    if wait and waited + wait > Config.RATE_LIMIT_MAX_WAIT_SECONDS:
+        raise RateLimitTimeout(f"{service} rate limit: no capacity within {Config.RATE_LIMIT_MAX_WAIT_SECONDS}s")
+    # Re-check at least every few seconds so a freed-up pause is noticed
+    return min(wait, 5.0)
+
+
+def acquire(service, cost=1):
+    """Block until the service's request and token/character buckets allow one call of cost."""
+    waited = 0.0
+    while True:
+        wait = _acquire_wait(service, cost, waited)
+        if not wait:
+            if waited:
+                print(f"Rate limited {service} call waited {waited:.1f}s")
+            return
+        time.sleep(wait)
+        waited += wait
+
+
+async def acquire_async(service, cost=1):
+    waited = 0.0
+    while True:
+        wait = _acquire_wait(service, cost, waited)
+        if not wait:
+            return
+        await asyncio.sleep(wait)
+        waited += wait
+
+
+def _status(error):
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError)):
+        return 503  # network trouble - retry like an unavailable service
+    for attribute in ("code", "status_code", "status"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _retry_after(error):
+    """Seconds the provider asked us to wait, from a Retry-After header or Gemini's retryDelay."""
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            parsed = email.utils.parsedate_to_datetime(value)
+        except (ValueError, TypeError):
+            return None
+        if parsed.tzinfo is None:
+            # HTTP dates are always GMT; "-0000" parses as naive
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return max(0.0, parsed.timestamp() - time.time())
+    match = _RETRY_DELAY.search(str(getattr(error, "details", None) or error))
+    return float(match.group(1)) if match else None
+
+
+def _backoff(service, error, attempt):
+    """Seconds to wait before retrying after error, or None if it shouldn't be retried."""
+    status = _status(error)
+    if status not in RETRYABLE_STATUSES or attempt >= Config.RATE_LIMIT_MAX_RETRIES:
+        return None
+    delay = _retry_after(error)
+    if delay is None:
+        # Exponential backoff with full jitter, so workers that failed together don't retry together
+        delay = random.uniform(0, min(Config.RATE_LIMIT_BACKOFF_MAX_SECONDS,
+                                      Config.RATE_LIMIT_BACKOFF_BASE_SECONDS * 2 ** attempt))
+    if status == 429:
+        pause_service(service, delay)
+    print(f"{service} call failed with {status}, retry {attempt + 1}/{Config.RATE_LIMIT_MAX_RETRIES} in {delay:.1f}s")
+    return delay
+
+
+def call_with_retries(service, fn, cost=1):
+    """Run fn() once the rate limiter allows it, retrying on 429/5xx. Returns fn's result."""
+    attempt = 0
+    while True:
+        acquire(service, cost)
+        try:
+            return fn()
+        except Exception as e:
+            delay = _backoff(service, e, attempt)
+            if delay is None:
+                raise
+        time.sleep(delay)
+        attempt += 1
+
+
+async def call_with_retries_async(service, fn, cost=1):
+    """call_with_retries() for a coroutine function fn."""
+    attempt = 0
+    while True:
+        await acquire_async(service, cost)
+        try:
+            return await fn()
+        except Exception as e:
+            delay = _backoff(service, e, attempt)
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+        attempt += 1
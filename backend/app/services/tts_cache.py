@@ -0,0 +1,148 @@
+"""
+Persistent cache of synthesized podcast lines, backed by a local SQLite file.
+
+Segments are keyed by (voice_id, model_id, output_format, normalized text), so stock
+intros, outros and transitions - and every line of a podcast regenerated for the same
+document - are served from disk without an ElevenLabs call or any characters of quota.
+The least recently used segments are evicted once the cache grows past TTS_CACHE_MAX_MB.
+Hit/miss counters are kept in the same file so they cover every worker process.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import unicodedata
+from ..utils.sqlite_store import get_connection
+from backend.config import Config
+
+_WHITESPACE = re.compile(r"\s+")
+_schema_ready = set()
+
+
+def _conn():
+    path = os.path.join(Config.DATA_DIR, 'tts_cache.sqlite3')
+    conn = get_connection(path)
+    if path not in _schema_ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tts_segments (
+                cache_key TEXT PRIMARY KEY,
+                voice_id TEXT NOT NULL,
+                audio BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                characters INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tts_segments_last_used ON tts_segments (last_used_at)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tts_cache_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        _schema_ready.add(path)
+    return conn
+
+
+def normalize_line(text):
+    """Text as it affects the synthesized audio: Unicode NFC with runs of whitespace collapsed."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(voice_id, model_id, output_format, text):
+    canonical = json.dumps([voice_id, model_id, output_format, normalize_line(text)], ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _count(conn, name, amount=1):
+    conn.execute(
+        "INSERT INTO tts_cache_counters (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, amount)
+    )
+
+
+def get_cached_segment(key):
+    conn = _conn()
+    row = conn.execute("SELECT audio, characters FROM tts_segments WHERE cache_key = ?", (key,)).fetchone()
+    if row is None:
+        _count(conn, "misses")
+        return None
+    conn.execute("UPDATE tts_segments SET last_used_at = ? WHERE cache_key = ?", (time.time(), key))
+    _count(conn, "hits")
+    _count(conn, "characters_saved", row["characters"])
+    return bytes(row["audio"])
+
+
+def put_cached_segment(key, voice_id, text, audio):
+    conn = _conn()
+    now = time.time()
+    conn.execute(
+        "INSERT OR REPLACE INTO tts_segments (cache_key, voice_id, audio, size, characters, created_at, last_used_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (key, voice_id, audio, len(audio), len(text), now, now)
+    )
+    _evict(conn)
+
+
+def _evict(conn):
+    """Drop least recently used segments until the cache fits TTS_CACHE_MAX_MB."""
+    max_bytes = Config.TTS_CACHE_MAX_MB * 1024 * 1024
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) AS total FROM tts_segments").fetchone()["total"]
+    if total <= max_bytes:
+        return
+    evicted = 0
+    for row in conn.execute("SELECT cache_key, size FROM tts_segments ORDER BY last_used_at").fetchall():
+        if total <= max_bytes:
+            break
+        conn.execute("DELETE FROM tts_segments WHERE cache_key = ?", (row["cache_key"],))
+        total -= row["size"]
+        evicted += 1
+    print(f"TTS cache over {Config.TTS_CACHE_MAX_MB} MB, evicted {evicted} least recently used segments")
+
+
+def cached_synthesize(voice_id, model_id, output_format, text, synthesize):
+    """
+    Return the audio for one line, calling synthesize() only on a cache miss.
+
+    Empty results are never stored, so a failed synthesis is not replayed.
+    """
+    if not Config.TTS_CACHE_ENABLED:
+        return synthesize()
+
+    key = cache_key(voice_id, model_id, output_format, text)
+    try:
+        cached = get_cached_segment(key)
+        if cached is not None:
+            return cached
+    except Exception as e:
+        print(f"TTS cache read failed: {e}")
+
+    audio = synthesize()
+    if audio:
+        try:
+            put_cached_segment(key, voice_id, text, audio)
+        except Exception as e:
+            print(f"TTS cache write failed: {e}")
+    return audio
+
+
+def cache_stats():
+    """Hit/miss counters (across all worker processes), quota saved and the current cache size."""
+    conn = _conn()
+    counters = {row["name"]: row["value"] for row in conn.execute("SELECT name, value FROM tts_cache_counters")}
+    usage = conn.execute("SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes FROM tts_segments").fetchone()
+    hits = counters.get("hits", 0)
+    misses = counters.get("misses", 0)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "characters_saved": counters.get("characters_saved", 0),
+        "entries": usage["entries"],
+        "bytes": usage["bytes"],
+        "max_bytes": Config.TTS_CACHE_MAX_MB * 1024 * 1024,
+    }
@@ -0,0 +1,167 @@
+import queue
+import threading
+import contextvars
+import traceback
+from ..utils.text_extractor import extract_text_from_file
+from ..utils.text_normalizer import normalize_text
+from ..utils.uploads import remove_spooled
+from .format_service import generate_formats, FORMAT_INFO
+from .job_queue import set_job_stage, set_format_progress, renew_lease, holds_lease, LeaseLostError
+from .content_store import hash_file, get_or_extract_text
+from .llm_cache import set_bypass
+from .. import supabase
+
+
+UNSUPPORTED_FILE_MESSAGE = "This file type isn't supported yet. For best results, please convert your file to a PDF or DOCX before uploading."
+NO_TEXT_MESSAGE = "Could not extract text from the document. Please ensure your file contains readable text."
+
+
+def is_supported_upload(filename):
+    return filename.lower().endswith(('.pdf', '.docx'))
+
+
+class NoTextExtractedError(ValueError):
+    """Raised when an upload contains no readable text."""
+
+
+def store_results(title, results_content, folder_id=None, user_id=None):
+    """Insert a results row into Supabase and return the response object the frontend expects."""
+    data_to_insert = {
+        "title": title,
+        "content": results_content,
+        "folder_id": folder_id,
+        "user_id": user_id
+    }
+
+    print(f"Inserting into Supabase with folder_id: {folder_id}...")
+    response = supabase.table("results").insert(data_to_insert).execute()
+
+    if not response.data:
+        raise Exception("No data returned from Supabase insert")
+
+    inserted_record = response.data[0]
+    return {
+        "id": inserted_record['id'],
+        "title": inserted_record['title'],
+        "status": "completed",
+        "formats": inserted_record['content']['formats'],
+        "created_at": inserted_record['created_at']
+    }
+
+
+def initial_job_progress(requested_formats):
+    return {name: "pending" for name in FORMAT_INFO if name in requested_formats}
+
+
+def run_upload_pipeline(file_path, payload, on_event=None):
+    """
+    Extract → generate formats → store, for an upload saved at file_path.
+
+    payload carries filename, title, requested_formats, the generation options and
+    optionally the file_hash computed while spooling.
+    on_event, if given, is called as on_event(event, data) for each milestone:
+    "stage", "extracted", "format", "audio_line" and "stored". Returns the stored result.
+    """
+    def emit(event, data):
+        if on_event is not None:
+            on_event(event, data)
+
+    emit("stage", {"stage": "extracting"})
+    file_hash = payload.get("file_hash") or hash_file(file_path)
+    text_content = get_or_extract_text(file_hash, lambda: extract_text_from_file(file_path, payload["filename"]))
+    if not text_content or not text_content.strip():
+        raise NoTextExtractedError(NO_TEXT_MESSAGE)
+    text_content, normalization = normalize_text(text_content)
+    emit("extracted", {
+        "characters": normalization["characters"],
+        "characters_saved": normalization["characters_saved"],
+        "tokens_saved": normalization["tokens_saved"]
+    })
+
+    def on_format(format_name, status, format_payload):
+        data = {"format": format_name, "key": FORMAT_INFO[format_name]["key"], "status": status}
+        if format_payload is not None:
+            data["data"] = format_payload
+        emit("format", data)
+
+    emit("stage", {"stage": "generating"})
+    results_content = {
+        "formats": generate_formats(
+            text_content,
+            payload["requested_formats"],
+            host_voice_id=payload["host_voice_id"],
+            guest_voice_id=payload["guest_voice_id"],
+            num_questions=payload["num_questions"],
+            on_progress=on_format,
+            on_audio_line=lambda index, total: emit("audio_line", {"line": index, "total": total}),
+            file_hash=file_hash
+        )
+    }
+
+    emit("stage", {"stage": "storing"})
+    final_result = store_results(payload["title"], results_content, payload.get("folder_id"), payload.get("user_id"))
+    emit("stored", {"result": final_result})
+    return final_result
+
+
+def process_upload_job(job_id, payload, attempt):
+    """
+    Background job handler for asynchronous uploads.
+
+    Every event renews the job's lease. If the job was reclaimed by another worker, the
+    pipeline stops at its next stage (before storing a second results row) and the file
+    is left to the attempt that now owns it; otherwise the uploaded file is removed once
+    the job finishes, whether it succeeded or not.
+    """
+    def on_event(event, data):
+        if event == "stage":
+            if not set_job_stage(job_id, attempt, data["stage"]):
+                raise LeaseLostError(f"job was reclaimed before the {data['stage']} stage")
+        elif event == "format":
+            set_format_progress(job_id, attempt, data["format"], data["status"])
+        elif event == "audio_line":
+            renew_lease(job_id, attempt)
+
+    set_bypass(payload.get("cache_bypass", False))
+    try:
+        return run_upload_pipeline(payload["file_path"], payload, on_event)
+    finally:
+        if holds_lease(job_id, attempt):
+            remove_spooled(payload["file_path"])
+
+
+def stream_upload_events(file_path, payload):
+    """
+    Run the upload pipeline on a background thread and yield (event, data) tuples as it progresses.
+
+    Ends with a "done" event (or "error" if the pipeline raised). A "heartbeat" event is
+    yielded whenever nothing has happened for a while so proxies keep the connection open.
+    The uploaded file is removed once the pipeline finishes, even if the consumer stops
+    listening early.
+    """
+    events = queue.Queue()
+
+    def worker():
+        try:
+            run_upload_pipeline(file_path, payload, lambda event, data: events.put((event, data)))
+            final_event = ("done", {})
+        except Exception as e:
+            print(f"Streaming upload failed: {e}")
+            traceback.print_exc()
+            final_event = ("error", {"error": str(e)})
+        finally:
+            remove_spooled(file_path)
+        events.put(final_event)
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(worker,), name="upload-stream", daemon=True).start()
+
+    while True:
+        try:
+            event, data = events.get(timeout=15)
+        except queue.Empty:
+            yield "heartbeat", {}
+            continue
+        yield event, data
+        if event in ("done", "error"):
+            return
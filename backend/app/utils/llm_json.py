@@ -0,0 +1,210 @@
+"""
+Tolerant decoder for JSON produced by an LLM.
+
+Model output is usually JSON, but not always cleanly: it can be wrapped in markdown
+fences or prose, carry trailing commas, or stop mid-value when the response is cut off.
+JsonStreamDecoder handles all of these in a single string-aware pass. It jumps from one
+structural character to the next with a regex rather than looping over every character,
+so string contents are copied in bulk.
+
+The decoder accepts input in chunks, so a streamed response can be decoded as it
+arrives. For a top-level array, each element is returned as soon as it closes.
+"""
+import re
+import json
+
+_STRUCTURAL = re.compile(r'["{}\[\],:]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_CLOSERS = {"{": "}", "[": "]"}
+_DECODER = json.JSONDecoder()
+# Python-style literals models sometimes emit
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+class JsonStreamDecoder:
+    """
+    Incremental, repairing JSON decoder.
+
+    feed() text as it arrives; it returns the elements of a top-level array completed by
+    that chunk (always [] for a top-level object). Anything before the first opening
+    bracket in start_chars is skipped, and so is anything after the top-level value
+    closes. Trailing commas are dropped.
+
+    text() returns the repaired JSON so far. If the input stopped early, the last
+    incomplete value is cut off and the open brackets are closed.
+    """
+
+    def __init__(self, start_chars="{["):
+        self._start = re.compile("[" + re.escape(start_chars) + "]")
+        self._pieces = []
+        self._stack = []
+        self._carry = ""
+        self._started = False
+        self._in_string = False
+        self._string_is_key = False
+        self._expect_key = False
+        self._pending_comma = None
+        self._safe = (0, 0)
+        self._item_start = None
+        self._items = []
+        self.done = False
+
+    def feed(self, chunk):
+        text = self._carry + chunk
+        self._carry = ""
+        pos = 0
+        if not self._started:
+            match = self._start.search(text)
+            if match is None:
+                return []
+            pos = match.start()
+            self._started = True
+
+        pieces = self._pieces
+        stack = self._stack
+        length = len(text)
+        while pos < length and not self.done:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(text, pos)
+                if match is None:
+                    pieces.append(text[pos:])
+                    break
+                end = match.start()
+                if text[end] == "\\":
+                    if end + 1 == length:
+                        # Escape split across chunks - keep it for the next one
+                        pieces.append(text[pos:end])
+                        self._carry = text[end:]
+                        break
+                    pieces.append(text[pos:end + 2])
+                    pos = end + 2
+                    continue
+                pieces.append(text[pos:end + 1])
+                pos = end + 1
+                self._in_string = False
+                if not self._string_is_key:
+                    self._value_done()
+                continue
+
+            match = _STRUCTURAL.search(text, pos)
+            if match is None:
+                # A literal (number, true, ...) may continue in the next chunk
+                self._carry = text[pos:]
+                break
+            end = match.start()
+            char = text[end]
+            literal = text[pos:end].strip()
+            pos = end + 1
+            if literal:
+                self._value_start()
+                pieces.append(_LITERALS.get(literal, literal))
+                if char in ",}]":
+                    self._value_done()
+
+            if char == '"':
+                self._string_is_key = self._expect_key and stack[-1] == "{"
+                if not self._string_is_key:
+                    self._value_start()
+                self._pending_comma = None
+                self._in_string = True
+                pieces.append('"')
+            elif char == "{" or char == "[":
+                self._value_start()
+                self._pending_comma = None
+                stack.append(char)
+                pieces.append(char)
+                self._expect_key = char == "{"
+                self._safe = (len(pieces), len(stack))
+            elif char == "}" or char == "]":
+                if not stack:
+                    continue
+                if self._pending_comma is not None:
+                    pieces[self._pending_comma] = ""
+                    self._pending_comma = None
+                # Close whatever is actually open, even if the model used the wrong bracket
+                pieces.append(_CLOSERS[stack.pop()])
+                self._expect_key = False
+                if stack:
+                    self._value_done()
+                else:
+                    self._safe = (len(pieces), 0)
+                    self.done = True
+            elif char == ",":
+                if stack:
+                    self._pending_comma = len(pieces)
+                    pieces.append(",")
+                    self._expect_key = stack[-1] == "{"
+            else:
+                pieces.append(":")
+                self._expect_key = False
+
+        items, self._items = self._items, []
+        return items
+
+    def _value_start(self):
+        self._pending_comma = None
+        if len(self._stack) == 1 and self._stack[0] == "[":
+            self._item_start = len(self._pieces)
+
+    def _value_done(self):
+        self._safe = (len(self._pieces), len(self._stack))
+        if self._item_start is not None and len(self._stack) == 1:
+            try:
+                self._items.append(json.loads("".join(self._pieces[self._item_start:])))
+            except ValueError:
+                pass  # malformed element - skip it rather than stop the stream
+            self._item_start = None
+
+    def text(self):
+        """The repaired JSON text decoded so far, or None if no JSON value has started."""
+        if not self._started:
+            return None
+        if self.done:
+            return "".join(self._pieces)
+        count, depth = self._safe
+        closers = "".join(_CLOSERS[opener] for opener in reversed(self._stack[:depth]))
+        return "".join(self._pieces[:count]) + closers
+
+    def value(self):
+        text = self.text()
+        if text is None:
+            raise ValueError("No JSON value found")
+        return json.loads(text)
+
+
+def extract_json(response_text, start_chars="{["):
+    """
+    Return the repaired JSON text of the first object/array in response_text.
+
+    If there is no JSON value at all, the stripped input is returned unchanged (and will
+    fail to parse, as before).
+    """
+    if not response_text:
+        return ''
+    start = re.search("[" + re.escape(start_chars) + "]", response_text)
+    if start is not None:
+        # Well-formed JSON (the usual case in JSON mode) is located by the C decoder;
+        # only a response that needs repairing goes through the scanner
+        try:
+            _, end = _DECODER.raw_decode(response_text, start.start())
+            return response_text[start.start():end]
+        except ValueError:
+            pass
+    decoder = JsonStreamDecoder(start_chars)
+    decoder.feed(response_text)
+    text = decoder.text()
+    return text if text is not None else response_text.strip()
+
+
+def loads(response_text, start_chars="{["):
+    """Parse the first JSON object/array in an LLM response, repairing it as needed."""
+    return json.loads(extract_json(response_text, start_chars))
+
+
+def iter_array_items(chunks):
+    """Yield each element of a streamed top-level JSON array as soon as it is complete."""
+    decoder = JsonStreamDecoder("[")
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+        if decoder.done:
+            return
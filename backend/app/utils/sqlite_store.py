@@ -0,0 +1,41 @@
+import os
+import time
+import sqlite3
+import threading
+
+# One connection per (thread, database file). sqlite3 connections must not be
+# shared between threads, and opening a new one on every call is wasteful.
+_local = threading.local()
+_open_lock = threading.Lock()
+
+
+def _enable_wal(conn):
+    # Switching a new file to WAL needs an exclusive lock and the busy timeout doesn't apply,
+    # so threads opening the same fresh database take turns, and other processes are retried
+    with _open_lock:
+        for attempt in range(100):
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or attempt == 99:
+                    raise
+                time.sleep(0.05)
+
+
+def get_connection(db_path):
+    """Return this thread's autocommit connection to db_path, creating it on first use."""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        # WAL lets readers (status polling) run alongside the writer (workers)
+        _enable_wal(conn)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        connections[db_path] = conn
+    return conn
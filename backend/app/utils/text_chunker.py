@@ -0,0 +1,85 @@
+"""
+Split long document text into chunks that fit a token budget.
+
+Chunks follow the document's own structure: text is cut at section headings where
+possible, otherwise between paragraphs (lines, for extracted PDF/DOCX text), and only
+falls back to sentence - then hard character - boundaries for a single paragraph larger
+than the budget.
+"""
+import re
+from .text_normalizer import estimate_tokens, CHARS_PER_TOKEN
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_NUMBERED_HEADING = re.compile(
+    r"^(\d+(\.\d+)*\.?\s+\S|(chapter|section|part|unit|module|lesson)\s+(\d+|[ivxlc]+)\b)", re.IGNORECASE
+)
+_CAPS_HEADING = re.compile(r"^[A-Z][A-Z0-9 ,:&'()/-]{2,}$")
+_MAX_HEADING_CHARS = 80
+# Only start a new chunk at a heading once the current one is at least this full
+_MIN_FILL_BEFORE_SECTION_BREAK = 0.5
+
+
+def is_heading(block):
+    line = block.strip()
+    if not line or "\n" in line or len(line) > _MAX_HEADING_CHARS or line.endswith(('.', ',', ';')):
+        return False
+    return bool(_NUMBERED_HEADING.match(line) or _CAPS_HEADING.match(line))
+
+
+def _split_oversized(paragraph, max_chars):
+    """Break a paragraph larger than the budget at sentence ends, hard-wrapping overlong sentences."""
+    pieces = []
+    current = ""
+    for sentence in _SENTENCE_END.split(paragraph):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_chunks(text, max_tokens):
+    """
+    Split text into chunks of at most max_tokens (estimated) each, in document order.
+
+    Returns [text] unchanged when it already fits.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = []
+    current_chars = 0
+
+    def flush():
+        nonlocal current, current_chars
+        if current:
+            chunks.append("\n".join(current))
+        current = []
+        current_chars = 0
+
+    for paragraph in text.splitlines():
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        section_start = is_heading(paragraph) and current_chars >= max_chars * _MIN_FILL_BEFORE_SECTION_BREAK
+        if section_start or current_chars + len(paragraph) + 1 > max_chars:
+            flush()
+        if len(paragraph) > max_chars:
+            pieces = _split_oversized(paragraph, max_chars)
+            chunks.extend(pieces[:-1])
+            paragraph = pieces[-1]
+        current.append(paragraph)
+        current_chars += len(paragraph) + 1
+    flush()
+    return chunks
@@ -1,23 +1,236 @@
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import zipfile
 import fitz
-from docx import Document
+from lxml import etree
+from backend.config import Config
+from .text_normalizer import PAGE_BREAK
 
-def extract_text_from_pdf(file_stream):
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_P, _W_T, _W_TAB, _W_BR, _W_CR = _W + "p", _W + "t", _W + "tab", _W + "br", _W + "cr"
+_W_TC, _W_TR = _W + "tc", _W + "tr"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+_DOCX_RUN_TAGS = (_W_T, _W_TAB, _W_BR, _W_CR)
+_DOCX_TAGS = (_W_P, _W_TC, _W_TR, _MC_FALLBACK) + _DOCX_RUN_TAGS
+
+# Pages per task handed to a pool worker. Small enough to balance load across
+# workers, large enough that reopening the document per task stays cheap.
+PAGES_PER_TASK = 16
+
+_process_pool = None
+_process_pool_workers = 0
+_process_pool_lock = threading.Lock()
+
+def _open_pdf(source):
+    # A path lets PyMuPDF read pages from disk on demand instead of holding the whole file in memory
+    if isinstance(source, (str, os.PathLike)):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+def _get_process_pool(workers):
+    """Process pool shared by all requests in this worker process (spawned, so it is safe to use from threads)."""
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool_workers != workers:
+            if _process_pool is not None:
+                _process_pool.shutdown(wait=False)
+            _process_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _process_pool_workers = workers
+        return _process_pool
+
+def _discard_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+def _extract_page_range(path, start, stop):
+    """Pool task: open the PDF independently and return the text of pages [start, stop)."""
+    with fitz.open(path, filetype="pdf") as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
+
+def _iter_pages_parallel(path, page_count, workers):
+    """Yield page texts in order while keeping at most 2 * workers page ranges in flight."""
+    pool = _get_process_pool(workers)
+    ranges = deque(
+        (start, min(start + PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PAGES_PER_TASK)
+    )
+    pending = deque()
+    try:
+        while ranges or pending:
+            while ranges and len(pending) < workers * 2:
+                start, stop = ranges.popleft()
+                pending.append(pool.submit(_extract_page_range, os.fspath(path), start, stop))
+            for text in pending.popleft().result():
+                yield text
+    finally:
+        # The consumer stopped early (budget reached) - don't parse the remaining ranges
+        for future in pending:
+            future.cancel()
+
+def iter_pdf_pages(source, max_pages=None, workers=None):
+    """
+    Lazily yield the text of each page of a PDF given as a file path or raw bytes.
+
+    Pages are only parsed as they are consumed, so closing the generator early (or
+    passing max_pages) skips the rest of the document. PDFs given by path with at
+    least PDF_PARALLEL_MIN_PAGES pages are parsed ahead in page ranges on a process
+    pool of `workers` processes (default PDF_EXTRACT_WORKERS), still yielded in order.
+    """
+    if workers is None:
+        workers = Config.PDF_EXTRACT_WORKERS
+
+    with _open_pdf(source) as doc:
+        page_count = doc.page_count if max_pages is None else min(doc.page_count, max_pages)
+        parallel = (
+            workers > 1
+            and page_count >= Config.PDF_PARALLEL_MIN_PAGES
+            and isinstance(source, (str, os.PathLike))
+        )
+        if not parallel:
+            for index in range(page_count):
+                yield doc[index].get_text()
+            return
+
+    yielded = 0
+    try:
+        for text in _iter_pages_parallel(source, page_count, workers):
+            yielded += 1
+            yield text
+        return
+    except Exception as e:
+        print(f"Parallel PDF extraction failed, continuing in a single process: {e}")
+        # A crashed worker breaks the whole pool; start a fresh one next time
+        _discard_process_pool()
+
+    with _open_pdf(source) as doc:
+        for index in range(yielded, page_count):
+            yield doc[index].get_text()
+
+def _release(elem):
+    """Free a fully processed element and the already-processed siblings before it."""
+    elem.clear()
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
+
+def iter_docx_paragraphs(source):
+    """
+    Yield the text of a DOCX given as a file path or file-like object, in document order.
+
+    word/document.xml is read straight from the zip with an incremental parser and each
+    element is released once handled, so memory stays flat however large the document
+    (or its embedded media) is. Body paragraphs are yielded one by one; each table row
+    is yielded as its cell texts joined with " | ".
+    """
+    with zipfile.ZipFile(source) as archive, archive.open("word/document.xml") as xml:
+        paragraphs = []  # text runs of the paragraphs being parsed (text boxes nest them)
+        cells = []       # paragraph texts of the table cells being parsed
+        rows = []        # cell texts of the table rows being parsed
+        fallback_depth = 0
+
+        for event, elem in etree.iterparse(xml, events=("start", "end"), tag=_DOCX_TAGS, huge_tree=True):
+            tag = elem.tag
+            if tag == _MC_FALLBACK:
+                # Duplicate (legacy) rendering of the preceding mc:Choice - skip everything inside it
+                fallback_depth += 1 if event == "start" else -1
+                continue
+            if fallback_depth:
+                continue
+
+            if event == "start":
+                if tag == _W_P:
+                    paragraphs.append([])
+                elif tag == _W_TC:
+                    cells.append([])
+                elif tag == _W_TR:
+                    rows.append([])
+                continue
+
+            if tag in _DOCX_RUN_TAGS and not paragraphs:
+                continue
+            if tag == _W_T:
+                paragraphs[-1].append(elem.text or "")
+            elif tag == _W_TAB:
+                paragraphs[-1].append("\t")
+            elif tag in (_W_BR, _W_CR):
+                paragraphs[-1].append("\n")
+            elif tag == _W_P:
+                text = "".join(paragraphs.pop())
+                if cells:
+                    cells[-1].append(text)
+                else:
+                    yield text
+                _release(elem)
+            elif tag == _W_TC:
+                cell_text = " ".join(part for part in cells.pop() if part.strip())
+                if rows:
+                    rows[-1].append(cell_text)
+            elif tag == _W_TR:
+                row_text = " | ".join(rows.pop())
+                if cells:
+                    # Row of a table nested inside another table's cell
+                    cells[-1].append(row_text)
+                elif row_text.strip(" |"):
+                    yield row_text
+                _release(elem)
+
+def _join_within_budget(chunks, separator, max_chars):
+    """Join chunks until max_chars is reached, then close the generator so no more of the document is parsed."""
+    if max_chars is not None and max_chars <= 0:
+        max_chars = None
+    parts = []
+    total = 0
+    try:
+        for chunk in chunks:
+            if max_chars is not None and total + len(chunk) > max_chars:
+                # An earlier chunk may have ended exactly at the budget, leaving only its separator
+                if max_chars > total:
+                    parts.append(chunk[:max_chars - total])
+                print(f"Extracted text truncated at the {max_chars:,}-character budget, the rest of the document was not parsed")
+                break
+            parts.append(chunk)
+            total += len(chunk) + len(separator)
+    finally:
+        chunks.close()
+    return separator.join(parts)
+
+def extract_text_from_pdf(source, workers=None, max_chars=None, max_pages=None):
+    """
+    Extract text from a PDF given as a file path (preferred for large uploads) or raw bytes.
+
+    Pages are separated by PAGE_BREAK so the normalization stage can recognise running
+    headers and footers. Parsing stops as soon as max_chars characters or max_pages pages
+    have been read. See iter_pdf_pages for when pages are extracted in parallel.
+    """
     try:
-        text = ""
-        # Open the PDF directly from the byte stream
-        with fitz.open(stream=file_stream, filetype="pdf") as doc:
-            for page in doc:
-                text += page.get_text()
-        return text
+        return _join_within_budget(iter_pdf_pages(source, max_pages=max_pages, workers=workers), PAGE_BREAK, max_chars)
     except Exception as e:
         print(f"Error processing PDF: {e}")
         return ""
 
-def extract_text_from_docx(file_stream):
+def extract_text_from_docx(source, max_chars=None):
+    """Extract text from a DOCX given as a file path or file-like object, stopping at max_chars characters."""
     try:
-        doc = Document(file_stream)
-        text = "\n".join([para.text for para in doc.paragraphs])
-        return text
+        return _join_within_budget(iter_docx_paragraphs(source), "\n", max_chars)
     except Exception as e:
         print(f"Error processing DOCX: {e}")
-        return ""
\ No newline at end of file
+        return ""
+
+def extract_text_from_file(path, filename):
+    """
+    Extract text from an upload spooled to disk, choosing the extractor by file extension.
+
+    With EXTRACT_MAX_CHARS set, only that many characters are extracted and the rest of the
+    document is never parsed. The default (0) extracts everything - long documents are
+    condensed chunk by chunk before generation.
+    """
+    if filename.lower().endswith('.pdf'):
+        return extract_text_from_pdf(path, max_chars=Config.EXTRACT_MAX_CHARS)
+    return extract_text_from_docx(path, max_chars=Config.EXTRACT_MAX_CHARS)
@@ -0,0 +1,165 @@
+"""
+Normalization stage run on extracted text before it is sent to any prompt.
+
+PDF text carries running headers, footers, page numbers and disclaimers on every page,
+plus layout whitespace - all of which would otherwise be paid for in every Gemini call.
+Extractors separate PDF pages with a form feed ("\\f") so repeated lines can be detected
+per page; text without page breaks (DOCX, pasted text) only gets the whitespace and
+duplicate-paragraph passes.
+"""
+import re
+from collections import Counter
+from backend.config import Config
+
+PAGE_BREAK = "\f"
+# Bump when the rules or thresholds below change what normalize_text returns
+NORMALIZER_VERSION = 1
+
+# Lines at the top/bottom of a page that are checked for running headers and footers
+_EDGE_LINES = 2
+# A line is boilerplate when it repeats on at least this share of pages (and at least
+# _MIN_REPEAT_PAGES of them)
+_REPEAT_PAGE_RATIO = 0.5
+_MIN_REPEAT_PAGES = 3
+# Repeated lines outside the header/footer zone must be this long to be dropped, so
+# short recurring labels ("Example", "Answer:") survive
+_MIN_BODY_REPEAT_CHARS = 30
+# Paragraphs shorter than this are never de-duplicated
+_MIN_DEDUP_CHARS = 40
+# Rough characters-per-token ratio for English prose with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+_SPACES = re.compile(r"[ \t\u00a0\u2000-\u200b\u3000]+")
+_DIGITS = re.compile(r"\d+")
+_NON_WORD = re.compile(r"[\W_]+")
+_PAGE_NUMBER = re.compile(r"^[-–\s]*(page\s*)?(#|[ivx]{1,5})(\s*(of|/)\s*#)?[-–\s]*$", re.IGNORECASE)
+
+
+def estimate_tokens(text):
+    return estimate_tokens_for(len(text))
+
+
+def estimate_tokens_for(characters):
+    return (characters + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _clean_line(line):
+    return _SPACES.sub(" ", line).strip()
+
+
+def _edge_key(line):
+    # Page numbers and dates change from page to page - compare headers/footers without digits
+    return _DIGITS.sub("#", line.lower())
+
+
+def _paragraph_key(paragraph):
+    # Near-identical: same words, ignoring case, punctuation and spacing
+    return _NON_WORD.sub(" ", paragraph.lower()).strip()
+
+
+def _edge_indexes(lines):
+    non_empty = [i for i, line in enumerate(lines) if line]
+    return set(non_empty[:_EDGE_LINES] + non_empty[-_EDGE_LINES:])
+
+
+def _strip_repeated_lines(pages):
+    """Drop headers, footers, page numbers and disclaimers that repeat across pages."""
+    if len(pages) < _MIN_REPEAT_PAGES:
+        return pages, 0
+
+    edge_counts = Counter()
+    body_counts = Counter()
+    for lines in pages:
+        edges = _edge_indexes(lines)
+        edge_counts.update({_edge_key(lines[i]) for i in edges})
+        body_counts.update({line for line in lines if len(line) >= _MIN_BODY_REPEAT_CHARS})
+
+    threshold = max(_MIN_REPEAT_PAGES, int(len(pages) * _REPEAT_PAGE_RATIO + 0.5))
+    removed = 0
+    stripped = []
+    for lines in pages:
+        edges = _edge_indexes(lines)
+        kept = []
+        for i, line in enumerate(lines):
+            if i in edges:
+                key = _edge_key(line)
+                if edge_counts[key] >= threshold or _PAGE_NUMBER.match(key):
+                    removed += 1
+                    continue
+            if line and body_counts[line] >= threshold:
+                removed += 1
+                continue
+            kept.append(line)
+        stripped.append(kept)
+    return stripped, removed
+
+
+def _drop_duplicate_paragraphs(lines):
+    seen = set()
+    kept = []
+    removed = 0
+    for line in lines:
+        if len(line) >= _MIN_DEDUP_CHARS:
+            key = _paragraph_key(line)
+            if key in seen:
+                removed += 1
+                continue
+            seen.add(key)
+        kept.append(line)
+    return kept, removed
+
+
+def _collapse_blank_lines(lines):
+    collapsed = []
+    for line in lines:
+        if line or (collapsed and collapsed[-1]):
+            collapsed.append(line)
+    while collapsed and not collapsed[-1]:
+        collapsed.pop()
+    return collapsed
+
+
+def normalization_key():
+    """Identifies the current normalization settings, for keys of anything built from normalized text."""
+    return f"norm{NORMALIZER_VERSION}" if Config.TEXT_NORMALIZATION_ENABLED else "raw"
+
+
+def normalize_text(text):
+    """
+    Strip boilerplate from extracted document text.
+
+    Drops lines repeated across pages (headers, footers, page numbers, disclaimers),
+    collapses whitespace and removes near-identical duplicate paragraphs. Returns
+    (normalized_text, stats) where stats reports the characters and estimated tokens saved.
+    """
+    original_chars = len(text)
+    if not Config.TEXT_NORMALIZATION_ENABLED:
+        text = text.replace(PAGE_BREAK, "\n")
+        return text, _stats(original_chars, text, 0, 0)
+
+    pages = [[_clean_line(line) for line in page.splitlines()] for page in text.split(PAGE_BREAK)]
+    pages, repeated_removed = _strip_repeated_lines(pages)
+    lines = [line for page in pages for line in page]
+    lines, duplicates_removed = _drop_duplicate_paragraphs(lines)
+    normalized = "\n".join(_collapse_blank_lines(lines))
+
+    stats = _stats(original_chars, normalized, repeated_removed, duplicates_removed)
+    if stats["characters_saved"]:
+        print(
+            f"Normalized text: {original_chars} -> {len(normalized)} characters "
+            f"({stats['characters_saved']} characters, ~{stats['tokens_saved']} tokens saved; "
+            f"{repeated_removed} repeated lines, {duplicates_removed} duplicate paragraphs removed)"
+        )
+    return normalized, stats
+
+
+def _stats(original_chars, normalized, repeated_removed, duplicates_removed):
+    saved = max(0, original_chars - len(normalized))
+    return {
+        "original_characters": original_chars,
+        "characters": len(normalized),
+        "characters_saved": saved,
+        "tokens_saved": max(0, estimate_tokens_for(original_chars) - estimate_tokens(normalized)),
+        "repeated_lines_removed": repeated_removed,
+        "duplicate_paragraphs_removed": duplicates_removed,
+    }
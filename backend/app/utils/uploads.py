@@ -0,0 +1,34 @@
+import os
+import hashlib
+import tempfile
+
+_SPOOL_CHUNK_SIZE = 1024 * 1024
+
+
+def spool_upload(file, directory=None, prefix='upload-'):
+    """
+    Copy an uploaded file to disk in fixed-size chunks, hashing it on the way.
+
+    Only one chunk is held in memory at a time, so a large upload never has to be
+    read into a single byte string. Returns (path, sha256 hex digest); the caller
+    owns the file and must remove it (see remove_spooled).
+    """
+    extension = os.path.splitext(file.filename.lower())[1]
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=extension, dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: file.stream.read(_SPOOL_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                out.write(chunk)
+    except Exception:
+        remove_spooled(path)
+        raise
+    return path, digest.hexdigest()
+
+
+def remove_spooled(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,141 @@
+"""
+Micro-benchmarks for the pure-CPU code paths, reporting time and allocations.
+
+- extraction:   extract_text_from_pdf / extract_text_from_docx at 10, 100 and 1,000 pages
+- json:         clean_json_response and clean_json on large model responses
+- infographic:  wrap_text and create_infographic_image for every theme in THEME_PRESETS
+- donut:        create_donut_chart
+- assessment:   generate_recommendations over a grid of CAT4 scores
+
+Each case prints its median time and the peak and retained Python memory of one traced
+run (see common.measure). Pass --output to also save the numbers as JSON, so the effect
+of an optimization can be diffed between commits.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_hot_paths --pages 10 100 1000 --repeat 5
+"""
+import os
+import json
+import argparse
+import tempfile
+from PIL import Image, ImageDraw
+from backend.benchmarks.common import SAMPLE_PARAGRAPH, make_pdf, make_docx, make_llm_response, measure, git_commit
+
+GROUPS = ("extraction", "json", "infographic", "donut", "assessment")
+
+INFOGRAPHIC_DATA = {
+    "title": "Photosynthesis: How Plants Turn Light Into Food",
+    "subtitle": "The light-dependent reactions and the Calvin cycle at a glance",
+    "stats": [
+        {"label": "Of Earth's oxygen produced by ocean plankton", "value": "50%"},
+        {"label": "Energy captured from absorbed sunlight", "value": "3-6%"},
+        {"label": "Carbon fixed by plants every year", "value": "258 Billion Tonnes"},
+    ],
+    "key_points": [
+        {"title": f"Stage {i + 1}: {title}", "description": SAMPLE_PARAGRAPH}
+        for i, title in enumerate([
+            "Light absorption", "Water splitting", "Electron transport",
+            "ATP synthesis", "Carbon fixation", "Sugar production",
+        ])
+    ],
+    "conclusion": SAMPLE_PARAGRAPH,
+}
+
+
+def make_dialogue_response(size_bytes=100_000):
+    """A podcast script reply of roughly size_bytes: a fenced JSON array with a trailing comma."""
+    lines = []
+    while sum(len(line) for line in lines) < size_bytes:
+        speaker = "host" if len(lines) % 2 == 0 else "guest"
+        lines.append(json.dumps({"speaker": speaker, "voice_id": f"{speaker}-voice", "text": SAMPLE_PARAGRAPH}))
+    return "Here is the podcast script:\n```json\n[\n" + ",\n".join(lines) + ",\n]\n```"
+
+
+def _extraction_cases(page_counts):
+    from backend.app.utils.text_extractor import extract_text_from_pdf, extract_text_from_docx
+    cases = []
+    for pages in page_counts:
+        pdf = make_pdf(os.path.join(tempfile.gettempdir(), f"adapted-bench-{pages}p.pdf"), pages)
+        docx = make_docx(os.path.join(tempfile.gettempdir(), f"adapted-bench-{pages}p.docx"), pages)
+        # workers=1 keeps the measurement in this process, where tracemalloc can see it
+        cases.append((f"extract_text_from_pdf, {pages} pages", lambda path=pdf: extract_text_from_pdf(path, workers=1)))
+        cases.append((f"extract_text_from_docx, {pages} pages", lambda path=docx: extract_text_from_docx(path)))
+    return cases
+
+
+def _json_cases(size):
+    from backend.app.services.ai_service import clean_json_response
+    from backend.app.services.audio_service import clean_json
+    mind_map = make_llm_response(size)
+    dialogue = make_dialogue_response(size)
+    return [
+        (f"clean_json_response, {len(mind_map) // 1000} KB", lambda: clean_json_response(mind_map)),
+        (f"clean_json_response, {len(mind_map) // 1000} KB truncated",
+         lambda: clean_json_response(mind_map[:len(mind_map) * 2 // 3])),
+        (f"clean_json, {len(dialogue) // 1000} KB", lambda: clean_json(dialogue)),
+    ]
+
+
+def _infographic_cases():
+    from backend.app.api.infographic import THEME_PRESETS, wrap_text, create_infographic_image, get_font
+    draw = ImageDraw.Draw(Image.new("RGB", (800, 200)))
+    font = get_font("Regular", 16)
+    long_text = " ".join([SAMPLE_PARAGRAPH] * 20)
+    cases = [(f"wrap_text, {len(long_text):,} chars", lambda: wrap_text(long_text, font, 300, draw))]
+    for key, theme in THEME_PRESETS.items():
+        cases.append((f"create_infographic_image, {key}",
+                      lambda theme=theme: create_infographic_image(INFOGRAPHIC_DATA, theme)))
+    return cases
+
+
+def _donut_cases():
+    from backend.app.api.infographic import THEME_PRESETS, create_donut_chart
+    theme = next(iter(THEME_PRESETS.values()))
+    return [("create_donut_chart", lambda: create_donut_chart("42%", theme))]
+
+
+def _assessment_cases():
+    from backend.app.api.assessment import generate_recommendations
+    grid = [
+        ({"verbal": v, "quantitative": q, "nonVerbal": n, "spatial": s}, preferences)
+        for v in (90, 115, 130) for q in (90, 115, 130) for n in (90, 115, 130) for s in (90, 115, 130)
+        for preferences in ("", "I prefer visual and audio material")
+    ]
+    return [(f"generate_recommendations, {len(grid)} profiles",
+             lambda: [generate_recommendations(scores, preferences) for scores, preferences in grid])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=list(GROUPS))
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--size", type=int, default=100_000, help="size of the JSON responses in bytes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="also save the results to this JSON file")
+    args = parser.parse_args()
+
+    builders = {
+        "extraction": lambda: _extraction_cases(args.pages),
+        "json": lambda: _json_cases(args.size),
+        "infographic": _infographic_cases,
+        "donut": _donut_cases,
+        "assessment": _assessment_cases,
+    }
+    results = {}
+    print(f"{'case':<48} {'time':>11} {'peak':>12} {'retained':>12}")
+    for group in args.only:
+        for name, fn in builders[group]():
+            # Warm-up run so fonts, imports and caches are loaded before timing
+            fn()
+            stats, _ = measure(fn, args.repeat)
+            results[name] = stats
+            print(f"{name:<48} {stats['ms']:8.2f} ms {stats['peak_kb']:9.1f} KB {stats['retained_kb']:9.1f} KB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "repeat": args.repeat, "results": results}, f, indent=2)
+        print(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark the tolerant LLM JSON decoder on ~100 KB model responses.
+
+Compares app.utils.llm_json against the per-character scanner clean_json_response used
+before it, on a fenced response with trailing commas, the same response truncated
+mid-string, and the response decoded incrementally in small stream chunks.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_llm_json --size 100000 --repeat 20
+"""
+import re
+import json
+import argparse
+from backend.app.utils.llm_json import extract_json, JsonStreamDecoder
+from backend.benchmarks.common import make_llm_response, time_call
+
+
+def legacy_clean_json_response(response_text):
+    """The brace-counting clean_json_response that llm_json replaced, kept as the baseline."""
+    text = re.sub(r'```\s*json', '```', response_text.strip(), flags=re.IGNORECASE)
+    text = text.replace('```', '').strip()
+    start = text.find('{')
+    if start == -1:
+        return text
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == '{':
+            depth += 1
+        elif text[i] == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return text[start:]
+
+
+def _parses(fn, text):
+    try:
+        json.loads(fn(text))
+        return "ok"
+    except ValueError:
+        return "FAILS"
+
+
+def _stream_decode(text, chunk_size):
+    decoder = JsonStreamDecoder()
+    for start in range(0, len(text), chunk_size):
+        decoder.feed(text[start:start + chunk_size])
+    return decoder.text()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--chunk", type=int, default=64, help="stream chunk size in characters")
+    args = parser.parse_args()
+
+    response = make_llm_response(args.size)
+    truncated = response[:len(response) * 2 // 3]
+    clean = json.dumps(json.loads(extract_json(response)))
+    fenced = f"```json\n{clean}\n```"
+    print(f"Response: {len(response):,} chars ({len(truncated):,} when truncated)")
+
+    cases = [
+        ("json.loads, already clean JSON", lambda: json.loads(clean), None),
+        ("legacy clean_json_response, trailing commas", lambda: legacy_clean_json_response(response), legacy_clean_json_response),
+        ("legacy clean_json_response, valid JSON", lambda: legacy_clean_json_response(fenced), None),
+        ("llm_json.extract_json, valid JSON", lambda: extract_json(fenced), None),
+        ("llm_json.extract_json, trailing commas", lambda: extract_json(response), extract_json),
+        ("llm_json.extract_json, truncated", lambda: extract_json(truncated), None),
+        (f"JsonStreamDecoder, {args.chunk}-char chunks", lambda: _stream_decode(response, args.chunk), None),
+    ]
+    for name, fn, cleaner in cases:
+        seconds, _ = time_call(fn, args.repeat)
+        note = f"  parses: {_parses(cleaner, response)}" if cleaner else ""
+        print(f"{name:<46} {seconds * 1000:8.2f} ms{note}")
+    print(f"{'truncated response parses with llm_json':<46} {_parses(extract_json, truncated)}")
+
+
+if __name__ == "__main__":
+    main()
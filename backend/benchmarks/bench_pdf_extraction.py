@@ -0,0 +1,36 @@
+"""
+Benchmark parallel page-range PDF extraction against a single process.
+
+Run from the repository root:
+    python -m backend.benchmarks.bench_pdf_extraction --pages 500 --workers 1 2 4
+"""
+import os
+import argparse
+import tempfile
+from backend.app.utils import text_extractor
+from backend.benchmarks.common import make_pdf, time_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    path = make_pdf(os.path.join(tempfile.gettempdir(), f"adapted-bench-{args.pages}p.pdf"), args.pages)
+    # Always take the parallel path for worker counts > 1, whatever the configured threshold
+    text_extractor.Config.PDF_PARALLEL_MIN_PAGES = 1
+
+    print(f"PDF: {path} ({args.pages} pages), {os.cpu_count()} CPUs")
+    baseline = None
+    for workers in sorted(set(args.workers)):
+        # Warm the pool so process start-up is not counted
+        text_extractor.extract_text_from_pdf(path, workers=workers)
+        seconds, text = time_call(lambda: text_extractor.extract_text_from_pdf(path, workers=workers), args.repeat)
+        baseline = baseline or seconds
+        print(f"workers={workers:<3} {seconds * 1000:9.1f} ms  speedup x{baseline / seconds:4.2f}  ({len(text):,} chars)")
+
+
+if __name__ == "__main__":
+    main()
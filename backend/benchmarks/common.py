@@ -0,0 +1,122 @@
+"""Shared helpers for the benchmark scripts: fixture documents, timing, allocations and the commit measured."""
+import os
+import gc
+import json
+import time
+import statistics
+import subprocess
+import tracemalloc
+import fitz
+
+SAMPLE_PARAGRAPH = (
+    "Photosynthesis is the process by which green plants and some other organisms use sunlight "
+    "to synthesize foods from carbon dioxide and water. It generally involves the green pigment "
+    "chlorophyll and generates oxygen as a byproduct. The light-dependent reactions take place in "
+    "the thylakoid membranes, while the Calvin cycle runs in the stroma of the chloroplast."
+)
+
+
+def make_pdf(path, pages, paragraphs_per_page=6):
+    """Write a text-heavy PDF with `pages` pages to path (skipped if it already exists)."""
+    if os.path.exists(path):
+        return path
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        body = "\n\n".join(f"{number + 1}.{i + 1} {SAMPLE_PARAGRAPH}" for i in range(paragraphs_per_page))
+        page.insert_textbox(fitz.Rect(50, 50, 545, 790), body, fontsize=9)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def make_docx(path, pages, paragraphs_per_page=6):
+    """Write a DOCX with `pages` pages of make_pdf's text, separated by page breaks (skipped if it already exists)."""
+    if os.path.exists(path):
+        return path
+    import docx
+    from docx.enum.text import WD_BREAK
+    document = docx.Document()
+    for number in range(pages):
+        for i in range(paragraphs_per_page):
+            paragraph = document.add_paragraph(f"{number + 1}.{i + 1} {SAMPLE_PARAGRAPH}")
+        paragraph.add_run().add_break(WD_BREAK.PAGE)
+    document.save(path)
+    return path
+
+
+def pdf_bytes(pages, label="", paragraphs_per_page=6):
+    """An in-memory PDF like make_pdf's; label is printed on the first page so documents differ."""
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        body = "\n\n".join(f"{number + 1}.{i + 1} {SAMPLE_PARAGRAPH}" for i in range(paragraphs_per_page))
+        if number == 0 and label:
+            body = f"{label}\n\n{body}"
+        page.insert_textbox(fitz.Rect(50, 50, 545, 790), body, fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def time_call(fn, repeat=3):
+    """Run fn `repeat` times and return (median seconds, last result)."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def measure(fn, repeat=3):
+    """
+    Time fn like time_call, then run it once more under tracemalloc.
+
+    Returns a dict with the median time in ms, the peak traced memory during the call and
+    the memory still allocated after it (both in KB). tracemalloc only sees allocations
+    made through Python's allocator - pixel buffers inside Pillow or PyMuPDF are not
+    counted - and slows the traced run down, which is why it is kept out of the timings.
+    """
+    seconds, result = time_call(fn, repeat)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        fn()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "ms": round(seconds * 1000, 3),
+        "peak_kb": round((peak - before) / 1024, 1),
+        "retained_kb": round((after - before) / 1024, 1),
+    }, result
+
+
+def make_llm_response(size_bytes=100_000):
+    """
+    A Gemini-style reply of roughly size_bytes: a mind map wrapped in a markdown fence,
+    with prose around it, trailing commas and strings containing brackets and quotes.
+    """
+    children = []
+    index = 0
+    while len(json.dumps(children)) < size_bytes:
+        index += 1
+        children.append({
+            "topic": f"Concept {index} {{core}} [stage {index % 7}]",
+            "summary": f'{SAMPLE_PARAGRAPH} "Quoted", with commas, }} and ] inside.',
+            "children": [{"topic": f"Detail {index}.{i}", "children": []} for i in range(3)],
+        })
+    body = json.dumps({"root": {"topic": "Photosynthesis", "children": children}}, indent=2)
+    body = body.replace('"children": []', '"children": [],').replace("\n    }", ",\n    }")
+    return f"Here is the mind map you asked for:\n```json\n{body}\n```\nLet me know if you need changes."
+
+
+def git_commit():
+    """Short hash of the checked-out commit, recorded with saved results (None outside a git checkout)."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,257 @@
+"""
+End-to-end load test of the API with the external services replaced by local fakes.
+
+Starts backend/run.py's app under gunicorn (as the Dockerfile does) with
+FAKE_BACKENDS=all, then drives each endpoint in turn at the given concurrency:
+
+- upload:      POST /api/upload (mind map, quiz, summary and audio of a fresh PDF)
+- results:     GET /api/results/<id> for the stored uploads, and GET /api/results
+- infographic: POST /api/infographic/generate
+- mindmap:     POST /api/mindmap/generate
+
+Every request uploads a different document, so the content and LLM caches don't turn
+the run into a cache benchmark. Reports throughput, p50/p95/p99 latency, error rate and
+peak RSS of each gunicorn worker, and saves everything as JSON so runs from different
+commits can be diffed.
+
+Run from the repository root:
+    python -m backend.benchmarks.load_test --requests 40 --concurrency 8 --workers 2 --threads 4
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from backend.benchmarks.common import pdf_bytes, git_commit
+
+ENDPOINTS = ("upload", "results", "infographic", "mindmap")
+_RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+_session = threading.local()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _http():
+    # One keep-alive session per client thread
+    if not hasattr(_session, "value"):
+        _session.value = requests.Session()
+    return _session.value
+
+
+def start_server(args, port, data_dir):
+    env = {
+        **os.environ,
+        "FAKE_BACKENDS": "all",
+        "FAKE_GEMINI_LATENCY_MS": str(args.gemini_latency_ms),
+        "FAKE_ELEVENLABS_LATENCY_MS": str(args.tts_latency_ms),
+        "ADAPTED_DATA_DIR": data_dir,
+        "FLASK_ENV": "production",
+        "PYTHONPATH": os.getcwd(),
+    }
+    command = [
+        sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}",
+        "--workers", str(args.workers), "--threads", str(args.threads), "--timeout", "300",
+        "backend.run:app",
+    ]
+    log = open(os.path.join(data_dir, "server.log"), "w")
+    # Run from the data directory so any files the app writes to its working directory stay there
+    process = subprocess.Popen(command, env=env, cwd=data_dir, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited early, see {log.name}")
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).ok:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f"Server did not become healthy, see {log.name}")
+
+
+def worker_pids(master_pid):
+    """PIDs of the gunicorn workers forked by master_pid (Linux /proc)."""
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                # The command name is in parentheses and may contain spaces
+                ppid = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == master_pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def peak_rss_mb(pid):
+    """Peak resident set size of pid in MB (VmHWM), or None where /proc isn't available."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def run_phase(name, make_request, count, concurrency):
+    """Issue count requests (make_request(index) -> response) concurrency at a time."""
+    def timed(index):
+        start = time.perf_counter()
+        try:
+            response = make_request(index)
+            status = response.status_code
+        except requests.RequestException as e:
+            response, status = None, type(e).__name__
+        return time.perf_counter() - start, status, response
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, range(count)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(seconds * 1000 for seconds, _, _ in outcomes)
+    statuses = {}
+    for _, status, _ in outcomes:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(1 for _, status, _ in outcomes if not isinstance(status, int) or status >= 400)
+    stats = {
+        "requests": count,
+        "concurrency": concurrency,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "status_counts": statuses,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 3) if elapsed else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50), 1),
+            "p95": round(percentile(latencies, 0.95), 1),
+            "p99": round(percentile(latencies, 0.99), 1),
+            "mean": round(sum(latencies) / len(latencies), 1),
+            "max": round(latencies[-1], 1),
+        } if latencies else {},
+    }
+    print(
+        f"{name:<12} {count:>5} req  {stats['throughput_rps'] or 0:7.2f} req/s  "
+        f"p50 {stats['latency_ms'].get('p50', 0):8.1f}  p95 {stats['latency_ms'].get('p95', 0):8.1f}  "
+        f"p99 {stats['latency_ms'].get('p99', 0):8.1f} ms  errors {stats['error_rate']:.1%}"
+    )
+    return stats, outcomes
+
+
+def _documents(count, pages, run_id, label):
+    # Built before the phase starts so PDF generation isn't timed
+    return [pdf_bytes(pages, f"Load test {run_id} {label} {index}") for index in range(count)]
+
+
+def _upload_request(base_url, documents):
+    def request(index):
+        return _http().post(f"{base_url}/api/upload", files={"file": (f"doc-{index}.pdf", documents[index])}, data={
+            "title": f"Load test {index}",
+            "formats": json.dumps(["mindmap", "quiz", "reports", "audio"]),
+        }, timeout=600)
+    return request
+
+
+def _file_request(url, documents, label):
+    def request(index):
+        return _http().post(url, files={"file": (f"{label}-{index}.pdf", documents[index])}, timeout=600)
+    return request
+
+
+def _results_request(base_url, result_ids):
+    def request(index):
+        # Mostly single results, with a listing every tenth request
+        if not result_ids or index % 10 == 9:
+            return _http().get(f"{base_url}/api/results", timeout=120)
+        return _http().get(f"{base_url}/api/results/{result_ids[index % len(result_ids)]}", timeout=120)
+    return request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=40, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="threads per gunicorn worker")
+    parser.add_argument("--pages", type=int, default=5, help="pages per uploaded PDF")
+    parser.add_argument("--gemini-latency-ms", type=int, default=1500)
+    parser.add_argument("--tts-latency-ms", type=int, default=400)
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/load-<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="adapted-load-")
+    port = _free_port()
+    run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+    process, base_url = start_server(args, port, data_dir)
+    print(f"Server {base_url} (gunicorn {args.workers}x{args.threads}), data in {data_dir}")
+
+    endpoints = {}
+    try:
+        result_ids = []
+        for name in args.endpoints:
+            documents = _documents(args.requests, args.pages, run_id, name) if name != "results" else None
+            if name == "upload":
+                stats, outcomes = run_phase(name, _upload_request(base_url, documents), args.requests, args.concurrency)
+                for _, status, response in outcomes:
+                    if status == 200:
+                        result_ids.append(response.json()["id"])
+            elif name == "results":
+                stats, _ = run_phase(name, _results_request(base_url, result_ids), args.requests, args.concurrency)
+            elif name == "infographic":
+                stats, _ = run_phase(name, _file_request(f"{base_url}/api/infographic/generate", documents, name),
+                                     args.requests, args.concurrency)
+            else:
+                stats, _ = run_phase(name, _file_request(f"{base_url}/api/mindmap/generate", documents, name),
+                                     args.requests, args.concurrency)
+            endpoints[name] = stats
+
+        workers = {str(pid): peak_rss_mb(pid) for pid in worker_pids(process.pid)}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    print("Peak RSS per worker (MB): " + ", ".join(f"{pid}: {rss}" for pid, rss in workers.items()))
+    report = {
+        "commit": git_commit(),
+        "started_at": run_id,
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "endpoints": endpoints,
+        "workers_peak_rss_mb": workers,
+    }
+    output = args.output or os.path.join(_RESULTS_DIR, f"load-{report['commit'] or 'unknown'}-{run_id}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    main()
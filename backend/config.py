@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load from frontend .env file for local development
@@ -22,4 +23,88 @@ class Config:
     ELEVENLABS_API_KEY = os.environ.get('ELEVENLABS_API_KEY')
     ELEVENLABS_HOST_VOICE = os.environ.get('ELEVENLABS_HOST_VOICE', 'jqcCZkN6Knx8BJ5TBdYR')
     ELEVENLABS_GUEST_VOICE = os.environ.get('ELEVENLABS_GUEST_VOICE', 'EkK5I93UQWFDigLMpZcX')
+    # Podcast lines synthesized concurrently per worker process (each line is retried on
+    # its own, see RATE_LIMIT_MAX_RETRIES)
+    TTS_WORKERS = int(os.environ.get('TTS_WORKERS', 4))
+    # Stream the podcast script from Gemini and start synthesizing each line as it arrives
+    PODCAST_SCRIPT_STREAMING = os.environ.get('PODCAST_SCRIPT_STREAMING', 'true').lower() in ('1', 'true', 'yes')
+    # Podcasts are assembled in memory; set a directory to also keep each job's line MP3s
+    # in a subdirectory of it (for debugging)
+    PODCAST_LINE_DIR = os.environ.get('PODCAST_LINE_DIR') or None
 
+    # Format generation - max formats generated concurrently per worker process
+    FORMAT_GENERATION_WORKERS = int(os.environ.get('FORMAT_GENERATION_WORKERS', 4))
+
+    # Local state (job queue, caches) - shared by all worker processes on this host
+    DATA_DIR = os.environ.get('ADAPTED_DATA_DIR') or os.path.join(tempfile.gettempdir(), 'adapted')
+
+    # Background upload jobs - worker threads per process (0 disables async uploads)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    # Seconds a running job may go without reporting progress before another worker reclaims it
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 900))
+    # Claims per job (including reclaims after an expired lease) before it is marked failed
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 2))
+
+    # Reuse extracted text and generated formats for byte-identical uploads
+    CONTENT_CACHE_ENABLED = os.environ.get('CONTENT_CACHE', 'true').lower() in ('1', 'true', 'yes')
+    CONTENT_CACHE_MAX_MB = int(os.environ.get('CONTENT_CACHE_MAX_MB', 1024))
+
+    # PDF extraction - large PDFs are split into page ranges across a process pool
+    PDF_EXTRACT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS', min(4, os.cpu_count() or 1)))
+    PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 64))
+
+    # Characters of document text extracted per upload (0 = no limit); parsing stops once reached
+    EXTRACT_MAX_CHARS = int(os.environ.get('EXTRACT_MAX_CHARS', 0))
+
+    # Strip repeated headers/footers, page numbers and duplicate paragraphs before prompting
+    TEXT_NORMALIZATION_ENABLED = os.environ.get('TEXT_NORMALIZATION', 'true').lower() in ('1', 'true', 'yes')
+
+    # Long documents - above LLM_SINGLE_PASS_TOKENS the text is condensed chunk by chunk
+    # (LLM_CHUNK_TOKENS each, LLM_CHUNK_WORKERS at a time) before the format prompt runs
+    LLM_SINGLE_PASS_TOKENS = int(os.environ.get('LLM_SINGLE_PASS_TOKENS', 32000))
+    LLM_CHUNK_TOKENS = int(os.environ.get('LLM_CHUNK_TOKENS', 16000))
+    LLM_CHUNK_WORKERS = int(os.environ.get('LLM_CHUNK_WORKERS', 4))
+
+    # Generate the mind map, quiz and summary of an upload with one Gemini call
+    COMBINED_GENERATION_ENABLED = os.environ.get('COMBINED_GENERATION', 'true').lower() in ('1', 'true', 'yes')
+
+    # Persistent Gemini response cache (send "X-LLM-Cache: bypass" to skip it for a request)
+    LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE', 'true').lower() in ('1', 'true', 'yes')
+    LLM_CACHE_MAX_MB = int(os.environ.get('LLM_CACHE_MAX_MB', 256))
+    LLM_CACHE_TTL_SECONDS = int(os.environ.get('LLM_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+
+    # Persistent cache of synthesized podcast lines, keyed by voice, model, format and text
+    TTS_CACHE_ENABLED = os.environ.get('TTS_CACHE', 'true').lower() in ('1', 'true', 'yes')
+    TTS_CACHE_MAX_MB = int(os.environ.get('TTS_CACHE_MAX_MB', 512))
+
+    # Send each upload's document to Gemini once, as cached content shared by its format
+    # prompts from the second one on (documents below DOCUMENT_CONTEXT_MIN_TOKENS, or used
+    # by a single prompt, are sent inline, first)
+    DOCUMENT_CONTEXT_CACHE_ENABLED = os.environ.get('DOCUMENT_CONTEXT_CACHE', 'true').lower() in ('1', 'true', 'yes')
+    DOCUMENT_CONTEXT_MIN_TOKENS = int(os.environ.get('DOCUMENT_CONTEXT_MIN_TOKENS', 1024))
+    DOCUMENT_CONTEXT_TTL_SECONDS = int(os.environ.get('DOCUMENT_CONTEXT_TTL_SECONDS', 900))
+
+    # Gemini client (one per worker process) - request timeout and keep-alive connection pool
+    LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', 120))
+    LLM_MAX_CONNECTIONS = int(os.environ.get('LLM_MAX_CONNECTIONS', 20))
+    LLM_KEEPALIVE_SECONDS = float(os.environ.get('LLM_KEEPALIVE_SECONDS', 60))
+
+    # Request and token/character budgets shared by all workers on this host (0 = no limit);
+    # 429 and 5xx responses are retried with jittered exponential backoff
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT', 'true').lower() in ('1', 'true', 'yes')
+    GEMINI_REQUESTS_PER_MINUTE = int(os.environ.get('GEMINI_REQUESTS_PER_MINUTE', 1000))
+    GEMINI_TOKENS_PER_MINUTE = int(os.environ.get('GEMINI_TOKENS_PER_MINUTE', 1000000))
+    ELEVENLABS_REQUESTS_PER_MINUTE = int(os.environ.get('ELEVENLABS_REQUESTS_PER_MINUTE', 300))
+    ELEVENLABS_CHARACTERS_PER_MINUTE = int(os.environ.get('ELEVENLABS_CHARACTERS_PER_MINUTE', 100000))
+    RATE_LIMIT_MAX_RETRIES = int(os.environ.get('RATE_LIMIT_MAX_RETRIES', 5))
+    RATE_LIMIT_BACKOFF_BASE_SECONDS = float(os.environ.get('RATE_LIMIT_BACKOFF_BASE_SECONDS', 1))
+    RATE_LIMIT_BACKOFF_MAX_SECONDS = float(os.environ.get('RATE_LIMIT_BACKOFF_MAX_SECONDS', 60))
+    # Longest a call waits for limiter capacity before failing
+    RATE_LIMIT_MAX_WAIT_SECONDS = float(os.environ.get('RATE_LIMIT_MAX_WAIT_SECONDS', 300))
+
+    # Local stand-ins for load testing: any of gemini, elevenlabs, supabase (or all)
+    FAKE_BACKENDS = {name.strip().lower() for name in os.environ.get('FAKE_BACKENDS', '').split(',') if name.strip()}
+    FAKE_GEMINI_LATENCY_MS = int(os.environ.get('FAKE_GEMINI_LATENCY_MS', 1500))
+    FAKE_ELEVENLABS_LATENCY_MS = int(os.environ.get('FAKE_ELEVENLABS_LATENCY_MS', 400))
+    # Fraction each fake latency varies by (deterministically, per input)
+    FAKE_LATENCY_JITTER = float(os.environ.get('FAKE_LATENCY_JITTER', 0.25))
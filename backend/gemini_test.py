@@ -2,7 +2,7 @@ import os
 import requests
 import json
 from dotenv import load_dotenv
-import google.generativeai as genai
+from google import genai
 
 # Load environment variables
 load_dotenv()
@@ -46,10 +46,10 @@ def test_gemini_key():
     # 3. Test via Python SDK (as used in the app)
     print("\n🐍 Testing via Google GenAI Python SDK...")
     try:
-        genai.configure(api_key=api_key)
-        # Using gemini-1.5-flash as a safe default for testing
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content("Reply with 'SDK is working!'")
+        client = genai.Client(api_key=api_key)
+        response = client.models.generate_content(
+            model='gemini-2.5-flash', contents="Reply with 'SDK is working!'"
+        )
         
         if response and response.text:
             print("✅ SDK Request Successful!")
@@ -59,7 +59,7 @@ def test_gemini_key():
             
     except Exception as e:
         print(f"❌ SDK Error: {e}")
-        print("   Note: If HTTP checked passed but SDK failed, check your 'google-generativeai' package version.")
+        print("   Note: If HTTP checked passed but SDK failed, check your 'google-genai' package version.")
 
 if __name__ == "__main__":
     test_gemini_key()